@@ -0,0 +1,24 @@
+'use strict';
+
+const { execFileSync } = require('child_process');
+
+// Builds the matplotlib config and font cache in mplconfig/ before the functions are packaged
+class MatplotlibCachePlugin {
+  constructor(serverless) {
+    this.serverless = serverless;
+    this.hooks = {
+      'before:package:createDeploymentArtifacts': this.buildCache.bind(this),
+      'before:deploy:function:packageFunction': this.buildCache.bind(this),
+    };
+  }
+
+  buildCache() {
+    const config = (this.serverless.service.custom || {}).matplotlibCache || {};
+    const python = config.pythonBin || 'python3.6';
+    this.serverless.cli.log(`Building the matplotlib cache with ${python}`);
+    // Fails the deployment when the cache cannot be built, so it never ships without one
+    execFileSync(python, ['matplotlib_cache.py'], { cwd: this.serverless.config.servicePath, stdio: 'inherit' });
+  }
+}
+
+module.exports = MatplotlibCachePlugin;
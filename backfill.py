@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import datetime
+import pytz
+from concurrent.futures import ThreadPoolExecutor
+from card_counts import COUNT_UNIT, POINTS_UNIT, count_cards, weighted_cards
+
+
+# Setting Time Zone to CST
+cst_timezone = pytz.timezone('US/Central')
+
+# Actions replayed by the backfill, card creations are undone by removing the card
+CREATE_ACTION_TYPES = ('createCard', 'copyCard', 'moveCardToBoard', 'convertToCardFromCheckItem')
+BACKFILL_ACTION_TYPES = ('updateCard',) + CREATE_ACTION_TYPES
+
+BACKFILL_PAGE_SIZE = int(os.getenv('BACKFILL_PAGE_SIZE', '1000'))
+BACKFILL_MAX_WORKERS = int(os.getenv('BACKFILL_MAX_WORKERS', '8'))
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+# Get the dates of the Sprint running on a date
+def current_sprint_dates(start_day, total_sprint_days, today):
+    """
+    Gets the dates of the Sprint that is running on a date
+    :param start_day: Start day of the Sprint. Eg: Monday
+    :param total_sprint_days: Total business days of a Sprint. Eg: 10
+    :param today: datetime.date within the Sprint
+    :return: returns list of Sprint date strings
+    """
+    start_date = today - datetime.timedelta(days=(today.weekday() - WEEKDAYS.index(start_day)) % 7)
+    sprint_dates = [start_date.isoformat()]
+    current_date = start_date
+    while len(sprint_dates) < total_sprint_days:
+        current_date += datetime.timedelta(days=1)
+        if current_date.weekday() >= 5:
+            continue
+        sprint_dates.append(current_date.isoformat())
+    return sprint_dates
+
+
+# Page through Board Actions
+def iter_board_actions(client, board_id, since, page_size=BACKFILL_PAGE_SIZE):
+    """
+    Streams the card Actions of a Board newest first, one page in memory at a time
+    :param client: Trello client Object
+    :param board_id: The ID of the Board
+    :param since: ISO date string, Actions before it are not fetched
+    :param page_size: Actions per request, Trello allows up to 1000
+    :return: returns generator of Action dicts
+    """
+    before = None
+    while True:
+        query_params = {
+            'filter': ','.join(BACKFILL_ACTION_TYPES),
+            'since': since,
+            'limit': page_size,
+            'fields': 'type,date,data'
+        }
+        if before:
+            query_params['before'] = before
+
+        actions = client.fetch_json(
+            f"boards/{board_id}/actions",
+            http_method="GET",
+            headers={
+                "Accept": "application/json"
+            },
+            query_params=query_params
+        )
+
+        for action in actions:
+            yield action
+
+        if len(actions) < page_size:
+            break
+        before = actions[-1]['id']
+
+
+# Local date of a Trello Action
+def action_date(action):
+    """
+    Converts the UTC timestamp of an Action to the local date
+    :param action: Trello Action dict
+    :return: returns date string. Eg: 2020-05-04
+    """
+    action_datetime = datetime.datetime.strptime(action['date'], "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=pytz.utc)
+    return action_datetime.astimezone(cst_timezone).strftime("%Y-%m-%d")
+
+
+# Undo an Action on the Card state
+def undo_action(cards, action):
+    """
+    Reverts the Card state to just before the Action
+    :param cards: dict of Card ID to [list ID, name, closed]
+    :param action: Trello Action dict
+    :return: returns nothing
+    """
+    card_id = action['data'].get('card', {}).get('id')
+    if card_id is None:
+        return
+
+    if action['type'] in CREATE_ACTION_TYPES:
+        cards.pop(card_id, None)
+        return
+
+    card = cards.get(card_id)
+    if card is None:
+        return
+    old = action['data'].get('old', {})
+    if 'idList' in old:
+        card[0] = old['idList']
+    if 'name' in old:
+        card[1] = old['name']
+    if 'closed' in old:
+        card[2] = old['closed']
+
+
+# Count the Card state
+def count_state(cards, monitor_lists, done_list, unit=COUNT_UNIT, story_points_field=None):
+    """
+    Counts the open cards of the Card state
+    :param cards: dict of Card ID to [list ID, name, closed, customFieldItems]
+    :param monitor_lists: Trello monitor lists from PowerUp Data
+    :param done_list: Trello done list from PowerUp Data
+    :param unit: Burndown unit, 'count' or 'points'
+    :param story_points_field: ID of the story points custom field
+    :return: returns tuple of (stories_defects_remaining, stories_defects_done, tasks_remaining, tasks_done)
+    """
+    open_cards = ({'idList': card[0], 'name': card[1], 'customFieldItems': card[3]} for card in cards.values() if not card[2])
+    return count_cards(weighted_cards(open_cards, unit, story_points_field), monitor_lists, done_list)
+
+
+# Rebuild the counts of missing dates for a Board
+def backfill_board(client, board_id, monitor_lists, done_list, sprint_dates, missing_dates, today, unit=COUNT_UNIT, story_points_field=None):
+    """
+    Rebuilds end-of-day counts of missing dates in one streaming pass over the Board Actions.
+    Starting from the current cards, Actions are undone newest first, and the state is counted
+    each time the replay crosses the end of a missing date. Story points are taken from the
+    current custom field values, estimate changes are not replayed.
+    :param client: Trello client Object
+    :param board_id: The ID of the Board
+    :param monitor_lists: Trello monitor lists from PowerUp Data
+    :param done_list: Trello done list from PowerUp Data
+    :param sprint_dates: List of current Sprint date strings
+    :param missing_dates: List of Sprint date strings to rebuild
+    :param today: Current date string, its counts are not rebuilt
+    :param unit: Burndown unit, 'count' or 'points'
+    :param story_points_field: ID of the story points custom field
+    :return: returns dict of date string to (stories_defects_remaining, stories_defects_done, tasks_remaining, tasks_done)
+    """
+    pending_dates = sorted((date for date in set(missing_dates) if sprint_dates[0] <= date < today), reverse=True)
+    if not pending_dates:
+        return {}
+
+    board_cards = client.fetch_json(
+        f"boards/{board_id}/cards/all",
+        http_method="GET",
+        headers={
+            "Accept": "application/json"
+        },
+        query_params={
+            'fields': 'idList,name,closed',
+            'customFieldItems': 'true' if unit == POINTS_UNIT else 'false'
+        }
+    )
+    cards = {board_card['id']: [board_card['idList'], board_card['name'], board_card['closed'], board_card.get('customFieldItems')] for board_card in board_cards}
+    del board_cards
+
+    counts = {}
+
+    # Walk the Actions newest first, a pending date is counted right before undoing its newest Action
+    for action in iter_board_actions(client, board_id, sprint_dates[0]):
+        date = action_date(action)
+        while pending_dates and date <= pending_dates[0]:
+            counts[pending_dates.pop(0)] = count_state(cards, monitor_lists, done_list, unit, story_points_field)
+        if not pending_dates:
+            break
+        undo_action(cards, action)
+
+    # Dates older than every remaining Action share the state at the start of the replay window
+    for pending_date in pending_dates:
+        counts[pending_date] = count_state(cards, monitor_lists, done_list, unit, story_points_field)
+
+    return counts
+
+
+# Backfill many Boards in parallel
+def backfill_boards(client, boards, today, max_workers=BACKFILL_MAX_WORKERS):
+    """
+    Runs backfill_board for many Boards concurrently
+    :param client: Trello client Object
+    :param boards: list of dicts with board_id, monitor_lists, done_list, sprint_dates, missing_dates and optional unit and story_points_field
+    :param today: Current date string
+    :param max_workers: Boards replayed at the same time
+    :return: returns dict of Board ID to the counts from backfill_board, failed Boards are left out
+    """
+    def backfill(board):
+        try:
+            return board['board_id'], backfill_board(client, board['board_id'], board['monitor_lists'], board['done_list'], board['sprint_dates'], board['missing_dates'], today, board.get('unit', COUNT_UNIT), board.get('story_points_field'))
+        except Exception as error:
+            print(f'{error}: Error backfilling the Trello Board - {board["board_id"]}')
+            return board['board_id'], None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(backfill, boards)
+        return {board_id: counts for board_id, counts in results if counts is not None}
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""
+Load test of the chart data endpoint, requests per second of full responses and conditional GETs
+
+Against the handler in process, with the Sprint History held in a fake S3:
+
+    python benchmarks/chart_data_load_test.py [boards] [seconds] [threads]
+
+Against a deployment, for a list of Board IDs:
+
+    python benchmarks/chart_data_load_test.py --url https://<api-id>.execute-api.<region>.amazonaws.com/<stage> --token <Trello token> <board id>... [--seconds 10] [--threads 8]
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import tempfile
+import datetime
+import argparse
+import threading
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sprint_history import SprintHistory, upload_history
+from chart_data import ChartDataStore, chart_data_response
+from local_backends import FakeS3
+
+DEPLOYMENT_BUCKET = 'deployment-bucket'
+
+
+# Build a Sprint History with a half recorded Sprint per Board
+def synthetic_history(boards, sprint_days=10):
+    random = np.random.default_rng(0)
+    history = SprintHistory()
+    start = datetime.date(2020, 1, 6)
+    sprint_dates = [(start + datetime.timedelta(days=day + 2 * (day // 5))).isoformat() for day in range(sprint_days)]
+    for board_index in range(boards):
+        board_id = '%024x' % board_index
+        history.start_sprint(board_id, sprint_dates, 60)
+        history.set_days_ooo(board_id, [0.5] * sprint_days)
+        for day, sprint_date in enumerate(sprint_dates[:sprint_days // 2]):
+            history.record(board_id, sprint_date, *random.integers(0, 20, 2).tolist(), 60 - 6 * day, 5)
+    return history
+
+
+# Send requests from several threads for a while
+def load(request, board_ids, seconds, threads):
+    """
+    Calls request(board_id, etag) round robin from every thread until the time is up
+    :param request: Function sending one request, returns (status, etag)
+    :param board_ids: Board IDs requested
+    :param seconds: Duration of the load
+    :param threads: Concurrent clients
+    :return: returns tuple of (requests per second, status counts, p99 latency ms)
+    """
+    etags = {}
+    statuses = {}
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(offset):
+        index = offset
+        while time.perf_counter() < deadline:
+            board_id = board_ids[index % len(board_ids)]
+            started = time.perf_counter()
+            status, etag = request(board_id, etags.get(board_id))
+            elapsed = time.perf_counter() - started
+            with lock:
+                etags[board_id] = etag
+                statuses[status] = statuses.get(status, 0) + 1
+                latencies.append(elapsed)
+            index += threads
+
+    workers = [threading.Thread(target=client, args=(offset,)) for offset in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return len(latencies) / (time.perf_counter() - started), statuses, np.percentile(latencies, 99) * 1000 if latencies else 0
+
+
+def local_load_test(boards, seconds, threads):
+    s3 = FakeS3()
+    upload_history(s3, DEPLOYMENT_BUCKET, synthetic_history(boards), tempfile.mkdtemp() + '/')
+    store = ChartDataStore(DEPLOYMENT_BUCKET)
+    board_ids = ['%024x' % board_index for board_index in range(boards)]
+
+    def request(board_id, etag):
+        response = chart_data_response(store, s3, board_id, etag)
+        return response['statusCode'], response['headers'].get('ETag')
+
+    def unconditional(board_id, etag):
+        return request(board_id, None)
+
+    print(f'Boards: {boards} Seconds: {seconds} Threads: {threads}')
+    for name, function in (('Full responses', unconditional), ('Conditional GETs', request)):
+        requests_per_second, statuses, p99 = load(function, board_ids, seconds, threads)
+        print(f'{name}: {requests_per_second:,.0f} requests/s statuses {statuses} p99 {p99:.3f} ms')
+    print(f'Sprint History checks: {store.stats["history_checks"]} downloads: {store.stats["history_downloads"]}')
+
+
+def remote_load_test(url, token, board_ids, seconds, threads):
+    import requests
+    session = requests.Session()
+    session.headers['Authorization'] = f'Bearer {token}'
+
+    def request(board_id, etag):
+        response = session.get(f'{url.rstrip("/")}/boards/{board_id}/chart-data', headers={'If-None-Match': etag} if etag else {})
+        return response.status_code, response.headers.get('ETag', etag)
+
+    print(f'URL: {url} Boards: {len(board_ids)} Seconds: {seconds} Threads: {threads}')
+    requests_per_second, statuses, p99 = load(request, board_ids, seconds, threads)
+    print(f'Conditional GETs: {requests_per_second:,.1f} requests/s statuses {statuses} p99 {p99:.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('boards', nargs='*')
+    parser.add_argument('--url')
+    parser.add_argument('--token', help='Trello token of a member who can read the Boards')
+    parser.add_argument('--seconds', type=float)
+    parser.add_argument('--threads', type=int)
+    arguments = parser.parse_args()
+
+    if arguments.url:
+        remote_load_test(arguments.url, arguments.token, arguments.boards, arguments.seconds or 10, arguments.threads or 8)
+    else:
+        positional = [float(value) for value in arguments.boards]
+        local_load_test(int(positional[0]) if positional else 500,
+                        arguments.seconds or (positional[1] if len(positional) > 1 else 3),
+                        arguments.threads or (int(positional[2]) if len(positional) > 2 else 4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Counts Trello round trips per render of re-uploading attachments against publishing to a stable S3 URL
+
+Usage: python benchmarks/chart_publish_benchmark.py [boards] [renders per board]
+"""
+from __future__ import print_function
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+os.environ['CHART_BASE_URL'] = 'https://charts.example.cloudfront.net'
+
+import burndown_engine
+from burndown_engine import publish_chart
+from chart_publisher import ATTACHMENT_MODE, S3_MODE, CHART_KEY_SECRET_SSM_PARAMETER_KEY, chart_key
+from local_backends import FakeTrelloClient, FakeS3, FakeSSM
+
+CHART_BUCKET = 'chart-bucket'
+CHART_KEY_SECRET = 'chart-key-secret'
+
+
+def render(board_id):
+    # publish_chart only needs the rendered file, its content is irrelevant here
+    with open('/tmp/' + burndown_engine.current_date + '_Sprint_Burndown_Chart_' + board_id + '.png', 'wb') as image_file:
+        image_file.write(b'\x89PNG\r\n\x1a\n' + board_id.encode())
+
+
+def publish(client, s3, board_ids, renders, publish_mode):
+    client.calls.clear()
+    requests_per_render = []
+    for _ in range(renders):
+        before = sum(client.calls.values())
+        for board_id in board_ids:
+            render(board_id)
+            publish_chart(client, board_id, {'attachment_card_id': f'{board_id}-card'}, publish_mode, s3)
+        requests_per_render.append((sum(client.calls.values()) - before) / len(board_ids))
+    return requests_per_render
+
+
+def main():
+    board_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    renders = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    burndown_engine.CHART_BUCKET = CHART_BUCKET
+    ssm = FakeSSM({CHART_KEY_SECRET_SSM_PARAMETER_KEY: CHART_KEY_SECRET})
+    burndown_engine.clients.aws_clients[('client', 'ssm')] = ssm
+
+    client = FakeTrelloClient()
+    s3 = FakeS3()
+    board_ids = ['%024x' % board_index for board_index in range(board_count)]
+
+    attachment_requests = publish(client, s3, board_ids, renders, ATTACHMENT_MODE)
+    s3_requests = publish(client, s3, board_ids, renders, S3_MODE)
+
+    print(f'Boards: {board_count} Renders per Board: {renders}')
+    print(f'Attachment mode Trello requests per render: {attachment_requests}')
+    print(f'S3 mode Trello requests per render:         {s3_requests}')
+    print(f'S3 requests: {dict(s3.calls)}')
+    print(f'SSM requests for the Chart key secret: {ssm.calls["get_parameters"]}')
+    print(f'Chart versions kept per Board: {len(s3.objects[(CHART_BUCKET, chart_key(board_ids[0], CHART_KEY_SECRET))])}')
+    assert s3_requests[0] == 1, 'The Chart link is attached on the first publish'
+    assert all(requests == 0 for requests in s3_requests[1:]), 'Later publishes must not call Trello'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Benchmark of the Sprint History export
+
+Builds a Sprint History of Boards with a year of Sprints, then writes the full export in every format. A day of the
+current Sprint of every Board is backfilled afterwards, and an incremental export from the watermark of the full
+export has to pick it up. Reports rows per second and the memory allocated while exporting on top of the loaded
+Sprint History, which stays at about one Board of rows for every format.
+
+Usage: python benchmarks/export_benchmark.py [boards] [sprints per Board]
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import tempfile
+import datetime
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sprint_history import SprintHistory, to_date_strings
+from history_export import EXPORT_FORMATS, COLUMNAR_FORMAT, COLUMNAR_DTYPE, write_export, incremental_since
+
+
+# Unix time of noon on a date, the time the synthetic days are recorded at
+def noon(date):
+    return int(datetime.datetime.combine(date, datetime.time(12)).timestamp())
+
+
+# Build a Sprint History with every Sprint of a year recorded
+def synthetic_history(boards, sprints, sprint_days=10):
+    random = np.random.default_rng(0)
+    history = SprintHistory()
+    start = datetime.date(2020, 1, 6)
+    for board_index in range(boards):
+        board_id = '%024x' % board_index
+        for sprint in range(sprints):
+            sprint_start = start + datetime.timedelta(weeks=2 * sprint)
+            sprint_dates = [(sprint_start + datetime.timedelta(days=day + 2 * (day // 5))).isoformat() for day in range(sprint_days)]
+            history.start_sprint(board_id, sprint_dates, 60)
+            for day, sprint_date in enumerate(sprint_dates):
+                history.record(board_id, sprint_date, *random.integers(0, 20, 2).tolist(), 60 - 6 * day, 5, noon(datetime.date.fromisoformat(sprint_date)))
+    return history
+
+
+def export(history, export_format, path, since_recorded_at=None):
+    def write():
+        with (open(path, 'wb') if export_format == COLUMNAR_FORMAT else open(path, 'w', newline='')) as output:
+            return write_export(history, output, export_format, since_recorded_at=since_recorded_at, directory=os.path.dirname(path))
+
+    started = time.perf_counter()
+    result = write()
+    seconds = time.perf_counter() - started
+
+    # tracemalloc slows allocations down, memory is measured on a second run
+    tracemalloc.start()
+    write()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    boards = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    sprints = int(sys.argv[2]) if len(sys.argv) > 2 else 26
+    history = synthetic_history(boards, sprints)
+    history_bytes = sum(sprints.nbytes + days.nbytes for sprints, days in history.boards.values())
+    print(f'Boards: {boards} Sprints per Board: {sprints} Sprint History in memory: {history_bytes / 1e6:.1f} MB')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for export_format in EXPORT_FORMATS:
+            path = os.path.join(directory, f'export.{export_format}')
+            result, seconds, peak = export(history, export_format, path)
+            print(f'{export_format:7s} {result["rows"]:9d} rows {result["rows"] / seconds:10.0f} rows/s  File: {os.path.getsize(path) / 1e6:7.1f} MB  Export memory peak: {peak / 1e6:6.2f} MB')
+            if export_format == COLUMNAR_FORMAT:
+                with np.load(path) as columns:
+                    assert len(columns['board_ids']) == boards and all(len(columns[name]) == result['rows'] for name in COLUMNAR_DTYPE.names)
+
+        # A day before the latest exported date is recorded again after the export, eg: by a backfill
+        watermark = result['latest_recorded_at']
+        for board_id in history.board_ids():
+            sprint, days = history.current_sprint(board_id)
+            history.record(board_id, to_date_strings(days['date'][:1])[0], 1, 1, 1, 5, watermark + 3600)
+
+        # The nightly export only reads the days recorded since the last one, and the overlap before its watermark
+        path = os.path.join(directory, 'incremental.csv')
+        incremental, seconds, peak = export(history, 'csv', path, incremental_since(watermark))
+        assert incremental['rows'] == 2 * boards, 'The backfilled day and the latest day of every Board are exported'
+        assert incremental['latest_recorded_at'] == watermark + 3600
+        print(f'csv since {watermark} {incremental["rows"]:6d} rows {seconds * 1000:8.1f} ms  Export memory peak: {peak / 1e6:6.2f} MB')
+
+
+if __name__ == '__main__':
+    main()
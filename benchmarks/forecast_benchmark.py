@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Benchmark of the Sprint completion forecast
+
+Builds Boards with past Sprints and a half recorded current Sprint, then times forecast.sprint_forecast per Board.
+A Board burning the same number of Tasks every day checks that the forecast lands on the day its Tasks run out.
+
+Usage: python benchmarks/forecast_benchmark.py [boards] [--render]
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import datetime
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sprint_history import SprintHistory
+from forecast import FORECAST_TRIALS, sprint_forecast
+
+SPRINT_DAYS = 10
+PAST_SPRINTS = 6
+
+
+def sprint_dates(sprint):
+    start = datetime.date(2020, 1, 6) + datetime.timedelta(weeks=2 * sprint)
+    return [(start + datetime.timedelta(days=day + 2 * (day // 5))).isoformat() for day in range(SPRINT_DAYS)]
+
+
+# Build a Sprint History with past Sprints and a current Sprint recorded up to its middle
+def synthetic_history(boards, burn=None):
+    random = np.random.default_rng(0)
+    history = SprintHistory()
+    for board_index in range(boards):
+        board_id = '%024x' % board_index
+        for sprint in range(PAST_SPRINTS + 1):
+            dates = sprint_dates(sprint)
+            tasks = 60
+            history.start_sprint(board_id, dates, tasks)
+            for day, sprint_date in enumerate(dates[:SPRINT_DAYS // 2 if sprint == PAST_SPRINTS else SPRINT_DAYS]):
+                tasks = max(tasks - (burn if burn is not None else int(random.integers(-1, 10))), 0)
+                history.record(board_id, sprint_date, 10, 5, tasks, 5)
+    return history
+
+
+def main():
+    boards = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 500
+    history = synthetic_history(boards)
+    board_ids = history.board_ids()
+
+    sprint_forecast(history, board_ids[0])
+    started = time.perf_counter()
+    forecasts = [sprint_forecast(history, board_id) for board_id in board_ids]
+    seconds = time.perf_counter() - started
+    completion_dates = [forecast['completion_date'] for forecast in forecasts if forecast is not None]
+
+    print(f'Boards: {boards} Trials: {FORECAST_TRIALS} Forecast: {seconds * 1000 / boards:.2f} ms per Board')
+    print(f'Completion dates: {min(completion_dates)} to {max(completion_dates)}  Example: {forecasts[0]["completion_date_early"]} / {forecasts[0]["completion_date"]} / {forecasts[0]["completion_date_late"]} on time {forecasts[0]["on_time_probability"]:.0%}')
+
+    # 5 Tasks a day leaves 35 after the 5th day of the current Sprint, Friday 2020-04-03, 7 business days more
+    steady = sprint_forecast(synthetic_history(1, burn=5), '%024x' % 0)
+    assert steady['completion_date'] == steady['completion_date_late'] == '2020-04-14', steady
+    assert steady['velocity'] == steady['burn_rate'] == 5, steady
+    print(f'Steady burn: {steady["tasks_remaining"]:g} Tasks at 5 a day done {steady["completion_date"]} as expected')
+
+    assert seconds / boards < 0.01, 'Forecast took more than 10 ms per Board'
+
+    if '--render' in sys.argv:
+        import burndown_engine
+        burndown_engine.create_chart(history, SPRINT_DAYS, board_ids[0], ['Alice', 'Bob'], False, is_show_forecast=True)
+        print(f'Chart: /tmp/{burndown_engine.current_date}_Sprint_Burndown_Chart_{board_ids[0]}.png')
+
+
+if __name__ == '__main__':
+    main()
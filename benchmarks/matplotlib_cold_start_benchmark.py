@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Measures the time from a cold interpreter to the first rendered Sprint Burndown Chart, with and without the prebuilt matplotlib cache
+
+Usage: python benchmarks/matplotlib_cold_start_benchmark.py [runs]
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Runs in a fresh interpreter, like a new Lambda container
+COLD_START = """
+import time
+started = time.perf_counter()
+import burndown_engine
+from sprint_history import SprintHistory
+imported = time.perf_counter()
+sprint_history = SprintHistory()
+sprint_history.start_sprint('board', [burndown_engine.current_date], 10)
+sprint_history.record('board', burndown_engine.current_date, 5, 3, 7, 4)
+burndown_engine.create_chart(sprint_history, 1, 'board', ['Member'], True)
+rendered = time.perf_counter()
+print(json.dumps({'import': imported - started, 'first_chart': rendered - imported, 'total': rendered - started}))
+"""
+
+
+def cold_start(environment):
+    output = subprocess.check_output([sys.executable, '-W', 'ignore', '-c', 'import json, sys; sys.path.insert(0, %r)\n' % ROOT + COLD_START], env=environment, cwd=ROOT)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def median(values):
+    return sorted(values)[len(values) // 2]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    work_dir = tempfile.mkdtemp()
+
+    # The bundled cache is built once, like at package time
+    bundled_dir = os.path.join(work_dir, 'mplconfig')
+    subprocess.check_call([sys.executable, '-c', 'import sys; sys.path.insert(0, %r)\nfrom matplotlib_cache import build_cache; build_cache(%r)' % (ROOT, bundled_dir)], stdout=subprocess.DEVNULL)
+
+    results = {'without_cache': [], 'with_cache': []}
+    for run in range(runs):
+        # Without the prebuilt cache every container starts from an empty config directory
+        environment = dict(os.environ, MPLCONFIGDIR=os.path.join(work_dir, f'empty-{run}'))
+        os.makedirs(environment['MPLCONFIGDIR'])
+        environment.pop('MATPLOTLIB_WARM_UP', None)
+        results['without_cache'].append(cold_start(environment))
+
+        # With it the bundled directory is copied to a fresh writable directory and the backend is warmed on import
+        environment = dict(os.environ, MPLCONFIGDIR=os.path.join(work_dir, f'cached-{run}'), MATPLOTLIB_WARM_UP='True')
+        subprocess.check_call(['cp', '-r', bundled_dir, environment['MPLCONFIGDIR']])
+        results['with_cache'].append(cold_start(environment))
+
+    for mode, timings in results.items():
+        print(f"{mode}: import {median([timing['import'] for timing in timings]) * 1000:.0f} ms, "
+              f"first chart {median([timing['first_chart'] for timing in timings]) * 1000:.0f} ms, "
+              f"time to first chart {median([timing['total'] for timing in timings]) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
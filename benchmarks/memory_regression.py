@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Processes synthetic boards in one process the way a warm container does and fails when memory keeps growing
+
+Usage: python benchmarks/memory_regression.py [boards] [cards per board] [max growth MB]
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import random
+import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ['MEMORY_PROFILING'] = 'True'
+
+import burndown_engine
+from local_backends import FakeTrelloClient
+from sprint_history import SprintHistory
+from memory_instrumentation import MB, MemoryProfiler
+
+MONITOR_LISTS = ['todo', 'doing']
+DONE_LIST = 'done'
+TOTAL_SPRINT_DAYS = 10
+WARM_UP_BOARDS = 20
+
+# tracemalloc slows rendering several times, allocations are only traced for the last boards
+TRACED_BOARDS = 10
+
+
+def main():
+    board_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    card_count = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    max_growth_mb = float(sys.argv[3]) if len(sys.argv) > 3 else 16
+    random_generator = random.Random(0)
+
+    client = FakeTrelloClient()
+    for board_index in range(board_count):
+        board_id = '%024x' % board_index
+        client.add_board(board_id)
+        for card_index in range(card_count):
+            client.add_card(board_id, f'{board_id}-{card_index}', random_generator.choice(MONITOR_LISTS + [DONE_LIST]),
+                            f'{random_generator.choice(["U", "D", "T"])} Card {card_index} ({random_generator.choice([1, 2, 3, 5, 8])})')
+
+    today = datetime.datetime.strptime(burndown_engine.current_date, '%Y-%m-%d')
+    sprint_dates = [(today - datetime.timedelta(days=day)).strftime('%Y-%m-%d') for day in reversed(range(TOTAL_SPRINT_DAYS))]
+
+    memory = MemoryProfiler(enabled=True)
+    sprint_history = SprintHistory()
+    warm_up_boards = min(WARM_UP_BOARDS, board_count // 2)
+    rss_after_warm_up = None
+    traced_before = None
+
+    for board_index, board_id in enumerate(client.boards):
+        if board_index == max(board_count - TRACED_BOARDS, warm_up_boards):
+            # RSS is compared before tracemalloc adds its own bookkeeping
+            rss_before_tracing = memory.measure()['rss'] / MB
+            memory.start()
+            traced_before = memory.measure()['traced']
+
+        with memory.board(board_id):
+            sprint_history.start_sprint(board_id, sprint_dates, 0)
+            with memory.stage('counts', board_id):
+                stories_defects_remaining, stories_defects_done, tasks_remaining, ideal_tasks_remaining = burndown_engine.get_counts(
+                    client, board_id, MONITOR_LISTS, DONE_LIST, None, 'points')
+            burndown_engine.update_sprint_data(None, board_id, sprint_dates, stories_defects_remaining, stories_defects_done, tasks_remaining, ideal_tasks_remaining, 5, [0] * TOTAL_SPRINT_DAYS, sprint_history)
+            with memory.stage('render', board_id):
+                burndown_engine.create_chart(sprint_history, TOTAL_SPRINT_DAYS, board_id, ['Member'] * 5, True)
+            os.remove('/tmp/' + burndown_engine.current_date + '_Sprint_Burndown_Chart_' + board_id + '.png')
+
+        if board_index + 1 == warm_up_boards:
+            rss_after_warm_up = memory.boards[-1]['rss_mb']
+
+    report = memory.report()
+    growth_mb = rss_before_tracing - rss_after_warm_up
+    traced_growth_mb = (memory.measure()['traced'] - traced_before) / MB
+    print(json.dumps({
+        'boards': board_count,
+        'rss_after_warm_up_mb': rss_after_warm_up,
+        'rss_before_tracing_mb': round(rss_before_tracing, 3),
+        'rss_mb': report['rss_mb'],
+        'peak_rss_mb': report['peak_rss_mb'],
+        'growth_mb': round(growth_mb, 3),
+        'traced_growth_mb': round(traced_growth_mb, 3),
+        'top_allocation_sites': report['top_allocation_sites'][:5]
+    }, indent=2))
+
+    assert growth_mb <= max_growth_mb, f'RSS grew {growth_mb:.1f} MB over {board_count - warm_up_boards} boards, budget {max_growth_mb} MB'
+    assert traced_growth_mb <= max_growth_mb / 4, f'Traced memory grew {traced_growth_mb:.1f} MB over the last {TRACED_BOARDS} boards'
+
+
+if __name__ == '__main__':
+    main()
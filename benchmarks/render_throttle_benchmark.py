@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Benchmark of the render throttle
+
+Replays a storm of card moves on a simulated clock: every move records new counts and enqueues a Render Job on a
+local Render Queue, and a render worker drains the queue every few seconds through burndown_engine.is_publish_due.
+Reports the charts published and the renders suppressed per throttle window, and checks that no Board publishes
+twice within its window and that the last publish of every Board shows its final counts. The 30 minute window is
+longer than the 15 minute SQS delay, so its trailing Render Jobs are delayed again.
+
+Usage: python benchmarks/render_throttle_benchmark.py [boards] [moves] [storm minutes]
+"""
+from __future__ import print_function
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import burndown_engine
+from render_queue import LocalRenderQueue, render_job, drain_render_queue
+from render_throttle import LocalThrottleStore, RenderThrottle
+
+THROTTLE_MINUTES = [0, 5, 15, 30]
+START_TIME = 1.6e9
+WORKER_INTERVAL_SECONDS = 5
+
+
+class Clock(object):
+    """
+    Simulated Unix time shared by the throttle store and the Render Queue
+    """
+
+    def __init__(self):
+        self.now = START_TIME
+
+    def __call__(self):
+        return self.now
+
+
+def replay(moves, throttle_minutes):
+    """
+    Fires the card moves, draining the Render Queue between them and until nothing is left after the storm
+    :param moves: list of (seconds since the start of the storm, Board ID), sorted by time
+    :param throttle_minutes: Minutes between publishes of every Board
+    :return: returns tuple of (publishes per Board as (time, counts version), final counts version per Board, throttle report)
+    """
+    clock = Clock()
+    burndown_engine.throttle = RenderThrottle(LocalThrottleStore(clock), clock)
+    queue = LocalRenderQueue(clock=clock)
+    settings = {'render_throttle_minutes': throttle_minutes}
+    versions = {}
+    publishes = {}
+
+    def render(job):
+        if burndown_engine.is_publish_due(job, settings, queue):
+            # The render reads the stored Sprint History, so it shows the counts recorded so far
+            publishes.setdefault(job['board_id'], []).append((clock.now, versions[job['board_id']]))
+
+    for at, board_id in moves:
+        while clock.now + WORKER_INTERVAL_SECONDS <= START_TIME + at:
+            clock.now += WORKER_INTERVAL_SECONDS
+            drain_render_queue(queue, render)
+        clock.now = START_TIME + at
+        versions[board_id] = versions.get(board_id, 0) + 1
+        queue.enqueue(render_job(board_id, '{}', burndown_engine.current_date))
+
+    while len(queue) or queue.delayed:
+        clock.now += WORKER_INTERVAL_SECONDS
+        drain_render_queue(queue, render)
+
+    return publishes, versions, burndown_engine.throttle.report()
+
+
+def main():
+    boards = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    move_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    storm_minutes = int(sys.argv[3]) if len(sys.argv) > 3 else 60
+
+    # A few Boards get most of the moves, like a sprint planning session
+    random_generator = random.Random(0)
+    board_ids = ['%024x' % board_index for board_index in range(boards)]
+    weights = [1 / (rank + 1) for rank in range(boards)]
+    moves = sorted((random_generator.uniform(0, storm_minutes * 60), random_generator.choices(board_ids, weights)[0]) for _ in range(move_count))
+    print(f'Boards: {boards} Card moves: {move_count} over {storm_minutes} minutes')
+
+    for throttle_minutes in THROTTLE_MINUTES:
+        publishes, versions, report = replay(moves, throttle_minutes)
+        published = sum(len(board_publishes) for board_publishes in publishes.values())
+        gaps = [later[0] - earlier[0] for board_publishes in publishes.values() for earlier, later in zip(board_publishes, board_publishes[1:])]
+
+        stale = [board_id for board_id in versions if publishes[board_id][-1][1] != versions[board_id]]
+        assert not stale, f'{len(stale)} Boards did not publish their final counts'
+        assert not throttle_minutes or min(gaps or [throttle_minutes * 60]) >= throttle_minutes * 60, 'A Board published twice within its throttle window'
+
+        last_moves = {}
+        for at, board_id in moves:
+            last_moves[board_id] = at
+        final_delay = max(publishes[board_id][-1][0] - START_TIME - last_moves[board_id] for board_id in versions)
+        print(f'Throttle {throttle_minutes:2d} min  Published: {published:5d}  Suppressed: {report["suppressed"]:5d}  Trailing scheduled: {report["trailing_scheduled"]:4d}  '
+              f'Min gap: {min(gaps or [0]) / 60:5.1f} min  Final counts published within: {final_delay / 60:5.1f} min')
+
+
+if __name__ == '__main__':
+    main()
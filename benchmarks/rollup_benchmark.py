@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Benchmark of the Organization rollup aggregation
+
+Builds a Sprint History of Boards whose Sprints start on different weekdays and weeks, have 5 to 15 days and
+skipped recordings, then times rollup.rollup_series and checks its totals against a per Board, per day reference.
+
+Usage: python benchmarks/rollup_benchmark.py [boards] [--render]
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import datetime
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sprint_history import SprintHistory, NOT_RECORDED, to_day, to_date_strings
+from rollup import rollup_series, business_days
+
+AS_OF_DATE = '2020-02-05'
+
+
+# Business day dates from a start date
+def sprint_dates(start, sprint_days):
+    return to_date_strings(business_days(to_day(start), to_day(start) + sprint_days * 2)[:sprint_days])
+
+
+# Build a Sprint History with Sprints starting on different days
+def synthetic_history(boards):
+    random = np.random.default_rng(0)
+    history = SprintHistory()
+    first_start = to_day('2020-01-20')
+    for board_index in range(boards):
+        board_id = '%024x' % board_index
+        sprint_days = int(random.choice([5, 10, 15]))
+        start = to_date_strings(business_days(first_start, first_start + 30))[int(random.integers(0, 12))]
+        dates = sprint_dates(start, sprint_days)
+        if dates[-1] < AS_OF_DATE:
+            dates = sprint_dates(to_date_strings([to_day(AS_OF_DATE) - 4])[0], sprint_days)
+        tasks = int(random.integers(20, 100))
+        history.start_sprint(board_id, dates, tasks)
+        history.set_days_ooo(board_id, random.integers(0, 3, sprint_days).tolist())
+        for day, sprint_date in enumerate(dates):
+            # Some days are not recorded, their counts are carried from the day before
+            if sprint_date <= AS_OF_DATE and random.random() > 0.2:
+                history.record(board_id, sprint_date, *random.integers(0, 20, 2).tolist(), max(tasks - 5 * day, 0), int(random.integers(3, 8)))
+    return history
+
+
+# Straightforward rollup, one Board and one day at a time
+def reference_rollup(history, board_ids, as_of_date):
+    as_of_day = to_day(as_of_date)
+    totals = {}
+    for board_id in board_ids:
+        sprint, days = history.current_sprint(board_id)
+        if sprint is None or days['date'][-1] < as_of_day:
+            continue
+        last = None
+        for day in business_days(int(days['date'][0]), int(days['date'][-1])):
+            if day in days['date']:
+                row = days[days['date'] == day][0]
+                if row['tasks_remaining'] != NOT_RECORDED:
+                    last = row
+            if last is not None and day <= as_of_day:
+                totals[int(day)] = totals.get(int(day), 0) + float(last['tasks_remaining'])
+    return totals
+
+
+def main():
+    boards = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 500
+    history = synthetic_history(boards)
+    board_ids = history.board_ids()
+
+    rollup_series(history, board_ids, AS_OF_DATE)
+    runs = 20
+    started = time.perf_counter()
+    for run in range(runs):
+        series = rollup_series(history, board_ids, AS_OF_DATE)
+    seconds = (time.perf_counter() - started) / runs
+
+    started = time.perf_counter()
+    reference = reference_rollup(history, board_ids, AS_OF_DATE)
+    reference_seconds = time.perf_counter() - started
+
+    tasks_remaining = {to_day(date): value for date, value in zip(series['dates'], series['tasks_remaining']) if value is not None}
+    assert tasks_remaining.keys() == reference.keys(), 'Rollup days differ from the reference'
+    assert all(abs(tasks_remaining[day] - reference[day]) < 1e-6 for day in reference), 'Rollup totals differ from the reference'
+
+    print(f'Boards: {series["boards"]} Days: {len(series["dates"])} ({series["dates"][0]} to {series["dates"][-1]})')
+    print(f'Rollup: {seconds * 1000:8.2f} ms  Reference: {reference_seconds * 1000:8.2f} ms  Totals match the reference')
+    assert seconds < 1, 'Rollup took more than a second'
+
+    if '--render' in sys.argv:
+        from burndown_engine import create_rollup_chart
+        image_path = '/tmp/rollup_benchmark_chart.png'
+        started = time.perf_counter()
+        create_rollup_chart(series, image_path)
+        print(f'Render: {(time.perf_counter() - started) * 1000:8.2f} ms  {image_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Compares size and load time of the columnar Sprint History against the legacy Sprint Data json
+
+Usage: python benchmarks/sprint_history_benchmark.py [boards] [years]
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import tempfile
+import datetime
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sprint_history import SprintHistory
+
+
+# Build synthetic Sprint History
+def synthetic_history(boards, years, sprint_days=10):
+    """
+    Builds a Sprint History with two week Sprints for every Board
+    :param boards: Number of Boards
+    :param years: Number of years of Sprints per Board
+    :param sprint_days: Business days per Sprint
+    :return: returns tuple of (SprintHistory, legacy Sprint Data dict holding the same days)
+    """
+    random = np.random.default_rng(0)
+    history = SprintHistory()
+    legacy = {}
+    start = datetime.date(2020, 1, 6)
+    for board_index in range(boards):
+        board_id = '%024x' % board_index
+        legacy[board_id] = {'ideal_tasks_remaining': 60}
+        for sprint_index in range(years * 26):
+            sprint_start = start + datetime.timedelta(weeks=2 * sprint_index)
+            sprint_dates = [(sprint_start + datetime.timedelta(days=day + 2 * (day // 5))).isoformat() for day in range(sprint_days)]
+            history.start_sprint(board_id, sprint_dates, 60)
+            for day, sprint_date in enumerate(sprint_dates):
+                counts = (int(random.integers(0, 20)), int(random.integers(0, 20)), 60 - 6 * day, 7)
+                history.record(board_id, sprint_date, *counts)
+                legacy[board_id][sprint_date] = dict(zip(('stories_defects_remaining', 'stories_defects_done', 'tasks_remaining', 'team_size'), counts))
+    return history, legacy
+
+
+def main():
+    boards = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    years = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    history, legacy = synthetic_history(boards, years)
+
+    directory = tempfile.mkdtemp()
+    history_path = os.path.join(directory, 'sprint_history.npz')
+    legacy_path = os.path.join(directory, 'sprint_data.json')
+    history.save(history_path)
+    with open(legacy_path, 'w') as legacy_file:
+        json.dump(legacy, legacy_file)
+
+    started = time.perf_counter()
+    with open(legacy_path, 'r') as legacy_file:
+        json.load(legacy_file)
+    legacy_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    loaded = SprintHistory.load(history_path)
+    for board_id in loaded.board_ids():
+        loaded.current_sprint(board_id)
+    history_seconds = time.perf_counter() - started
+
+    print(f'Boards: {boards} Years: {years}')
+    print(f'Legacy json: {os.path.getsize(legacy_path)} bytes, load {legacy_seconds * 1000:.1f} ms')
+    print(f'Sprint History: {os.path.getsize(history_path)} bytes, load {history_seconds * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
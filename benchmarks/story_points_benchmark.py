@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+Counts Trello round trips and time of count and story points burndowns over a fake Organization
+
+Usage: python benchmarks/story_points_benchmark.py [boards] [cards per board]
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from local_backends import FakeTrelloClient
+from card_counts import COUNT_UNIT, POINTS_UNIT, count_cards, fetch_cards, weighted_cards
+
+STORY_POINTS_FIELD = 'story-points-field'
+MONITOR_LISTS = ['todo', 'doing']
+DONE_LIST = 'done'
+
+
+def burndown(client, board_ids, unit):
+    client.calls.clear()
+    started = time.perf_counter()
+    for board_id in board_ids:
+        count_cards(weighted_cards(fetch_cards(client, board_id, unit), unit, STORY_POINTS_FIELD), MONITOR_LISTS, DONE_LIST)
+    return sum(client.calls.values()), time.perf_counter() - started
+
+
+def main():
+    board_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    card_count = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    random_generator = random.Random(0)
+
+    client = FakeTrelloClient()
+    for board_index in range(board_count):
+        board_id = '%024x' % board_index
+        client.add_board(board_id)
+        for card_index in range(card_count):
+            points = random_generator.choice([1, 2, 3, 5, 8])
+            # Half of the cards carry the custom field, the others only the name pattern
+            custom_field_items = [{'idCustomField': STORY_POINTS_FIELD, 'value': {'number': str(points)}}] if card_index % 2 else []
+            client.add_card(board_id, f'{board_id}-{card_index}', random_generator.choice(MONITOR_LISTS + [DONE_LIST]),
+                            f'{random_generator.choice(["U", "D", "T"])} Card {card_index} ({points})', custom_field_items)
+
+    board_ids = list(client.boards)
+    count_requests, count_seconds = burndown(client, board_ids, COUNT_UNIT)
+    points_requests, points_seconds = burndown(client, board_ids, POINTS_UNIT)
+
+    print(f'Boards: {board_count} Cards per Board: {card_count}')
+    print(f'Count mode:  {count_requests} requests {count_seconds * 1000:.1f} ms')
+    print(f'Points mode: {points_requests} requests {points_seconds * 1000:.1f} ms')
+    # Reading the custom field through the Card objects costs one request per card
+    print(f'Per-card custom field requests avoided: {board_count * card_count}')
+    assert points_requests == count_requests, 'Points mode must not add Trello round trips'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+Compares one invocation processing every Board against the sweep fanned out to shard workers
+
+Workers run in this process through LocalShardInvoker, Trello round trips are modelled by the fake client
+latency. Charts are not rendered: pyplot is serialised within one process, while shard workers on Lambda
+render in parallel. While the sweep runs, webhooks keep recording Boards outside of it, and every one of them must
+still be in the Sprint History once the shards are merged.
+
+Usage: python benchmarks/sweep_fan_out_benchmark.py [shard size] [Trello latency ms]
+"""
+from __future__ import print_function
+import io
+import os
+import sys
+import json
+import time
+import random
+import threading
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import burndown_engine
+from burndown_engine import process_boards
+from local_backends import FakeTrelloClient, FakeS3
+from sprint_history import download_history
+from sweep_coordinator import LocalShardInvoker, sweep
+from webhook_reconciler import RateLimiter
+
+DEPLOYMENT_BUCKET = 'deployment-bucket'
+MONITOR_LISTS = ['todo', 'doing']
+DONE_LIST = 'done'
+
+# The fake Trello has no rate limit, the Trello token limit is not what is measured here
+UNLIMITED = 10 ** 9
+
+# Boards recorded by webhooks while the sweep runs
+WEBHOOK_BOARDS = 10
+
+
+def powerup_data():
+    return json.dumps({
+        'sprint_start_day': burndown_engine.current_day,
+        'total_sprint_days': '10',
+        'selected_list': MONITOR_LISTS,
+        'selected_done_list': DONE_LIST,
+        'team_member_list': ['Alice', 'Bob'],
+        'team_members_days_ooo': '1-0,2-0,3-0,4-0,5-0,6-0,7-0,8-0,9-0,10-0',
+        'selected_card_for_attachment': 'card'
+    })
+
+
+class StartBudget(object):
+    """
+    Deadline with time for a fixed number of shard starts
+    """
+
+    def __init__(self, starts):
+        self.starts = starts
+
+    def has_time_for(self, estimate_ms):
+        self.starts -= 1
+        return self.starts >= 0
+
+
+def fake_organization(board_count, latency, failing_shards=()):
+    random_generator = random.Random(0)
+    client = FakeTrelloClient(latency=latency)
+    for board_index in range(board_count):
+        board_id = '%024x' % board_index
+        client.add_board(board_id)
+        for card_index in range(20):
+            client.add_card(board_id, f'{board_id}-{card_index}', random_generator.choice(MONITOR_LISTS + [DONE_LIST]), f'{random_generator.choice(["U", "T"])} Card {card_index}')
+
+    attempts = {}
+
+    # Mirrors scheduled_handler.sweepShardSprintBurndown with the fake clients
+    def worker(event, context):
+        attempts[event['shard']] = attempts.get(event['shard'], 0) + 1
+        if event['shard'] in failing_shards and attempts[event['shard']] == 1:
+            raise RuntimeError('Task timed out')
+        report = process_boards(event['board_ids'], {
+            'client': client,
+            's3': s3,
+            'powerup_data': event['powerup_data'],
+            'history_key': event['history_key'],
+            'render': 'none',
+            'rate_limiter': RateLimiter(UNLIMITED)
+        })
+        return {'shard': event['shard'], 'history_key': event['history_key'], 'report': report}
+
+    s3 = FakeS3()
+    return client, s3, worker
+
+
+def webhooks(client, s3, board_ids, stopped):
+    """
+    Records Boards one at a time like webhook invocations, until the sweep is over and every Board was recorded once
+    :return: returns number of webhook invocations
+    """
+    invocations = 0
+    while invocations < len(board_ids) or not stopped.is_set():
+        board_id = board_ids[invocations % len(board_ids)]
+        process_boards([board_id], {'client': client, 's3': s3, 'powerup_data': {board_id: powerup_data()}, 'render': 'none', 'rate_limiter': RateLimiter(UNLIMITED), 'raise_errors': True})
+        invocations += 1
+    return invocations
+
+
+def main():
+    shard_size = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02
+    burndown_engine.DEPLOYMENT_BUCKET = DEPLOYMENT_BUCKET
+
+    print(f'Shard size: {shard_size} Trello latency: {latency * 1000:.0f} ms')
+    for board_count in (100, 200, 400, 800):
+        board_ids = ['%024x' % board_index for board_index in range(board_count)]
+        board_powerup_data = {board_id: powerup_data() for board_id in board_ids}
+
+        webhook_board_ids = ['%024x' % board_index for board_index in range(board_count, board_count + WEBHOOK_BOARDS)]
+
+        client, s3, worker = fake_organization(board_count, latency)
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            process_boards(board_ids, {'client': client, 's3': s3, 'powerup_data': board_powerup_data, 'render': 'none', 'rate_limiter': RateLimiter(UNLIMITED)})
+        single_seconds = time.perf_counter() - started
+
+        # The first attempt of shard 1 fails and is retried, webhooks write the Sprint History while shards are merged
+        client, s3, worker = fake_organization(board_count + WEBHOOK_BOARDS, latency, failing_shards=(1,))
+        stopped = threading.Event()
+        webhook_invocations = []
+        webhook_thread = threading.Thread(target=lambda: webhook_invocations.append(webhooks(client, s3, webhook_board_ids, stopped)))
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            webhook_thread.start()
+            report = sweep(board_ids, board_powerup_data, LocalShardInvoker(worker), s3, DEPLOYMENT_BUCKET, shard_size, max_concurrency=board_count)
+            sweep_seconds = time.perf_counter() - started
+            stopped.set()
+            webhook_thread.join()
+
+        recorded = download_history(s3, DEPLOYMENT_BUCKET).board_ids()
+        print(f'Boards: {board_count:4d} One invocation: {board_count / single_seconds:7.1f} boards/s '
+              f'Sweep: {board_count / sweep_seconds:7.1f} boards/s over {report["shards"]} shards '
+              f'({report["invocations"]} invocations, {len(report["failed"])} failed) '
+              f'Webhooks: {webhook_invocations[0]} ({s3.calls["put_object_conflicts"]} writes merged on conflict)')
+        assert len(report['processed']) == board_count and not report['failed'] and not report['failed_shards'], report
+        assert recorded == sorted(board_ids + webhook_board_ids), 'Every shard Sprint History is merged, and no webhook write is lost'
+        assert not [key for bucket, key in s3.objects if key.startswith('sprint_history_shards/')], 'Shard files are removed'
+
+    # A coordinator running out of time merges the shards it ran and leaves the rest for a continuation
+    client, s3, worker = fake_organization(board_count, latency)
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = sweep(board_ids, board_powerup_data, LocalShardInvoker(worker), s3, DEPLOYMENT_BUCKET, shard_size, max_concurrency=2, deadline=StartBudget(3))
+    recorded = download_history(s3, DEPLOYMENT_BUCKET).board_ids()
+    assert len(report['processed']) == 3 * shard_size and report['invocations'] == 3 and not report['failed'], report
+    assert recorded == sorted(report['processed']) and sorted(report['remaining']) == sorted(set(board_ids) - set(recorded))
+    print(f'Deadline after 3 shards: {len(recorded)} Boards merged, {len(report["remaining"])} left for a continuation')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""
+Runs scheduled_handler.trelloSprintBurndown over several Organizations served by one deployment
+
+One large and two small tenants, each with its own fake Trello, credentials and S3 prefix. Reports when the last
+Board of every tenant was processed when the tenants take turns in the sweep, compared to sweeping the Organizations
+one after another, and checks that the Registry and Sprint History of every tenant hold only its own Boards.
+Charts are not rendered: pyplot is serialised within one process and is not what is measured here.
+
+Usage: python benchmarks/tenant_sweep_benchmark.py [Boards of the large tenant] [Boards of a small tenant] [Trello latency ms]
+"""
+from __future__ import print_function
+import io
+import os
+import sys
+import json
+import time
+import random
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+DEPLOYMENT_BUCKET = 'deployment-bucket'
+POWERUP_NAME = 'Sprint Burndown Chart'
+PLUGIN_ID = 'sprint-burndown-plugin'
+TENANTS_PARAMETER = '/Serverless/Trello/Tenants'
+MONITOR_LISTS = ['todo', 'doing']
+DONE_LIST = 'done'
+ORGANIZATION_IDS = ['%024x' % (index + 1) for index in range(3)]
+
+# The fake Trello has no rate limit, the Trello token limit is not what is measured here
+UNLIMITED = 10 ** 9
+
+# The handlers read their configuration from the environment when they are imported
+os.environ.update({
+    'TRELLO_API_KEY_SSM_PARAMETER_KEY': '/Serverless/Trello/ApiKey',
+    'TRELLO_TOKEN_SSM_PARAMETER_KEY': '/Serverless/Trello/Token',
+    'TENANTS_SSM_PARAMETER_KEY': TENANTS_PARAMETER,
+    'TRELLO_ORGANIZATION_ID': ORGANIZATION_IDS[0],
+    'POWERUP_NAME': POWERUP_NAME,
+    'DEPLOYMENT_BUCKET': DEPLOYMENT_BUCKET,
+    'TRELLO_RATE_LIMIT_REQUESTS': str(UNLIMITED)
+})
+os.environ.pop('SWEEP_WORKER_FUNCTION', None)
+
+import burndown_engine
+import scheduled_handler
+from board_registry import download_registry
+from local_backends import FakeTrelloClient, FakeS3, FakeSSM
+from sprint_history import download_history
+
+
+def powerup_data():
+    return json.dumps({
+        'sprint_start_day': burndown_engine.current_day,
+        'total_sprint_days': '10',
+        'selected_list': MONITOR_LISTS,
+        'selected_done_list': DONE_LIST,
+        'team_member_list': ['Alice', 'Bob'],
+        'team_members_days_ooo': '1-0,2-0,3-0,4-0,5-0,6-0,7-0,8-0,9-0,10-0',
+        'selected_card_for_attachment': 'card'
+    })
+
+
+def fake_organization(organization_index, board_count, latency):
+    random_generator = random.Random(organization_index)
+    client = FakeTrelloClient(ORGANIZATION_IDS[organization_index], latency=latency)
+    for board_index in range(board_count):
+        board_id = '%08x%016x' % (organization_index + 1, board_index)
+        client.add_board(board_id)
+        client.enable_powerup(board_id, PLUGIN_ID, POWERUP_NAME, powerup_data())
+        for card_index in range(20):
+            client.add_card(board_id, f'{board_id}-{card_index}', random_generator.choice(MONITOR_LISTS + [DONE_LIST]), f'{random_generator.choice(["U", "T"])} Card {card_index}')
+    return client
+
+
+def install(board_counts, latency):
+    """
+    Installs a fake Trello per tenant and fresh S3 in the client registries of the deployment
+    :return: returns tuple of (FakeTrelloClient by Organization ID, FakeS3)
+    """
+    parameters = {'/Serverless/Trello/ApiKey': 'api-key', '/Serverless/Trello/Token': 'token'}
+    config = []
+    for organization_id in ORGANIZATION_IDS[1:]:
+        parameters[f'/Serverless/Trello/{organization_id}/ApiKey'] = f'api-key-{organization_id}'
+        parameters[f'/Serverless/Trello/{organization_id}/Token'] = f'token-{organization_id}'
+        config.append({
+            'organization_id': organization_id,
+            'api_key_parameter': f'/Serverless/Trello/{organization_id}/ApiKey',
+            'token_parameter': f'/Serverless/Trello/{organization_id}/Token',
+            'rate_limit_requests': UNLIMITED
+        })
+    parameters[TENANTS_PARAMETER] = json.dumps(config)
+
+    s3 = FakeS3()
+    clients = burndown_engine.clients
+    clients.aws_clients[('resource', 's3')] = s3
+    clients.aws_clients[('client', 'ssm')] = FakeSSM(parameters)
+
+    trello_clients = {}
+    for organization_index, tenant in enumerate(burndown_engine.tenants.all()):
+        trello_clients[tenant.organization_id] = fake_organization(organization_index, board_counts[organization_index], latency)
+        tenant.clients.get_credentials()
+        tenant.clients.trello_client = trello_clients[tenant.organization_id]
+    return trello_clients, s3
+
+
+def process_boards_without_charts(board_ids, options=None):
+    return burndown_engine.process_boards(board_ids, dict(options or {}, render='none'))
+
+
+def run(board_counts, latency, interleave):
+    trello_clients, s3 = install(board_counts, latency)
+    scheduled_handler.interleave = interleave
+
+    # The first sweep scans every Organization to build the Registries, the second one is measured
+    with contextlib.redirect_stdout(io.StringIO()):
+        scheduled_handler.trelloSprintBurndown({}, None)
+        for client in trello_clients.values():
+            client.request_times = []
+        started = time.monotonic()
+        scheduled_handler.trelloSprintBurndown({}, None)
+        seconds = time.monotonic() - started
+
+    # Every tenant sees only its own Boards
+    for tenant in burndown_engine.tenants.all():
+        board_ids = set(trello_clients[tenant.organization_id].boards)
+        assert set(download_registry(s3, DEPLOYMENT_BUCKET, tenant.prefix).boards) == board_ids, tenant.organization_id
+        assert set(download_history(s3, DEPLOYMENT_BUCKET, prefix=tenant.prefix).board_ids()) == board_ids, tenant.organization_id
+
+    # The last counts request of a tenant is its last Board
+    finished = {organization_id: max(client.request_times) - started for organization_id, client in trello_clients.items()}
+    return seconds, finished
+
+
+def main():
+    large = int(sys.argv[1]) if len(sys.argv) > 1 else 120
+    small = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.02
+    board_counts = [large, small, small]
+
+    if burndown_engine.current_day in ('Saturday', 'Sunday'):
+        # The scheduled run skips weekends
+        scheduled_handler.set_current_date = lambda: ('Monday', burndown_engine.set_current_date()[1])
+    scheduled_handler.process_boards = process_boards_without_charts
+
+    print(f'Tenants: {len(board_counts)} Boards: {board_counts} Trello latency: {latency * 1000:.0f} ms')
+    interleaved = scheduled_handler.interleave
+    for name, interleave in (('One after another', lambda queues: [entry for queue in queues for entry in queue]), ('Tenants take turns', interleaved)):
+        seconds, finished = run(board_counts, latency, interleave)
+        print(f'{name:18s} Sweep: {seconds:6.2f} s  Last Board per tenant: ' + '  '.join(f'{board_count:4d} Boards {finished[organization_id]:6.2f} s' for organization_id, board_count in zip(ORGANIZATION_IDS, board_counts)))
+
+
+if __name__ == '__main__':
+    main()
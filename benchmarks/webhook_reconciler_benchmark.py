@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Reconciles webhooks of a fake Trello Organization with thousands of boards
+
+Usage: python benchmarks/webhook_reconciler_benchmark.py [boards]
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from local_backends import FakeTrelloClient
+from webhook_reconciler import RateLimiter, reconcile_webhooks
+
+CALLBACK_URL = 'https://api.example.com/prod/trello'
+OLD_STAGE_CALLBACK_URL = 'https://api.example.com/dev/trello'
+OLD_CALLBACK_URL = 'https://old-api.example.com/prod/trello'
+OTHER_SERVICE_CALLBACK_URL = 'https://other.example.com/prod/trello'
+
+
+def main():
+    board_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    client = FakeTrelloClient()
+    for board_index in range(board_count):
+        client.add_board('%024x' % board_index, f'Board {board_index}')
+
+    # A third of the boards already have a webhook, some duplicated, some on an old stage or old API URL, and another
+    # service on the same token has webhooks of its own
+    board_ids = list(client.boards)
+    for board_id in board_ids[:board_count // 3]:
+        client.create_hook(CALLBACK_URL, board_id, 'existing', 'token')
+    for board_id in board_ids[:board_count // 20]:
+        client.add_webhook('dup' + board_id, 'duplicate', board_id, CALLBACK_URL)
+    for board_id in board_ids[board_count // 3:board_count * 5 // 12]:
+        client.create_hook(OLD_STAGE_CALLBACK_URL, board_id, 'old stage', 'token')
+    for board_id in board_ids[board_count * 5 // 12:board_count // 2]:
+        client.create_hook(OLD_CALLBACK_URL, board_id, 'old api', 'token')
+    for board_id in board_ids[:board_count // 10]:
+        client.create_hook(OTHER_SERVICE_CALLBACK_URL, board_id, 'other service', 'token')
+
+    boards = [(board['id'], board['name']) for board in client.boards.values()]
+    rate_limiter = RateLimiter(requests=10 ** 9, seconds=1)
+
+    started = time.perf_counter()
+    report = reconcile_webhooks(client, boards, CALLBACK_URL, 'token', rate_limiter=rate_limiter, delete_stale=True, stale_callback_urls=[OLD_CALLBACK_URL])
+    seconds = time.perf_counter() - started
+
+    print(f'Boards: {board_count} in {seconds * 1000:.0f} ms')
+    print(f'Unchanged: {report["unchanged"]} Created: {len(report["created"])} Stale deleted: {len(report["deleted_stale"])} Duplicates deleted: {len(report["deleted_duplicate"])} Failed: {len(report["failed"])}')
+
+    second_report = reconcile_webhooks(client, boards, CALLBACK_URL, 'token', dry_run=True, delete_stale=True, stale_callback_urls=[OLD_CALLBACK_URL])
+    assert second_report['unchanged'] == board_count and not second_report['created']
+    assert not second_report['deleted_stale'] and not second_report['deleted_duplicate']
+    assert sum(webhook.callback_url == OTHER_SERVICE_CALLBACK_URL for webhook in client.list_hooks('token')) == board_count // 10, 'Webhooks of another service were deleted'
+    print(f'Second pass: all {board_count} boards unchanged, {dict(client.calls)}')
+
+
+if __name__ == '__main__':
+    main()
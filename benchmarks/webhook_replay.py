@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+"""
+Replays Trello webhook deliveries at handler.trelloSprintBurndown against local fake Trello, S3, SSM and SQS backends
+
+The stream is a json lines file of API Gateway envelopes, {"payload": "<Trello webhook json>"}, or a synthetic
+sprint planning storm. Every event is fired at its arrival time by one of the concurrent workers, each worker
+stands in for a Lambda container. Boards seen in a recorded stream are created in the fake Trello on the fly.
+
+Reports throughput, latency percentiles from arrival to response, Trello calls per event, the busiest Trello rate
+limit window of the tenant budget the workers share, and lost updates: Boards whose recorded remaining counts differ
+from their cards once the replay is over, because concurrent invocations overwrote each other's Sprint History.
+Cards created in the done list are not recorded until the next Action on a monitor list, so the done counts are not
+compared.
+
+Usage: python benchmarks/webhook_replay.py [--events 500] [--boards 20] [--rate 50] [--concurrency 16]
+                                           [--trello-latency-ms 80] [--duplicates 0.05] [--render queue]
+                                           [--stream events.jsonl] [--record events.jsonl]
+"""
+from __future__ import print_function
+import os
+import io
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import contextlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+DEPLOYMENT_BUCKET = 'deployment-bucket'
+RENDER_QUEUE_URL = 'https://sqs.local/render-queue'
+POWERUP_NAME = 'Sprint Burndown Chart'
+PLUGIN_ID = 'sprint-burndown-plugin'
+API_KEY_PARAMETER = '/Serverless/Trello/ApiKey'
+TOKEN_PARAMETER = '/Serverless/Trello/Token'
+LISTS = ['todo', 'doing', 'done']
+MONITOR_LISTS = ['todo', 'doing']
+DONE_LIST = 'done'
+CARDS_PER_BOARD = 40
+
+# The handler reads its configuration from the environment when it is imported
+os.environ.update({
+    'TRELLO_API_KEY_SSM_PARAMETER_KEY': API_KEY_PARAMETER,
+    'TRELLO_TOKEN_SSM_PARAMETER_KEY': TOKEN_PARAMETER,
+    'POWERUP_NAME': POWERUP_NAME,
+    'DEPLOYMENT_BUCKET': DEPLOYMENT_BUCKET,
+    'TRELLO_ORGANIZATION_ID': 'organization',
+    'CALLBACK_URL': 'https://api.local/trello'
+})
+os.environ.pop('WEBHOOK_DEDUP_TABLE', None)
+
+import handler
+import burndown_engine
+from card_counts import count_cards, weighted_cards
+from local_backends import FakeTrelloClient, FakeS3, FakeSSM, FakeSQS
+from sprint_history import to_day, download_history
+from webhook_reconciler import TRELLO_RATE_LIMIT_REQUESTS, TRELLO_RATE_LIMIT_SECONDS
+from trello_budget import SharedRateLimiter, LocalBudgetStore
+
+
+def powerup_data():
+    return json.dumps({
+        'sprint_start_day': burndown_engine.current_day,
+        'total_sprint_days': '10',
+        'selected_list': MONITOR_LISTS,
+        'selected_done_list': DONE_LIST,
+        'team_member_list': ['Alice', 'Bob', 'Carol'],
+        'team_members_days_ooo': '1-0,2-0,3-0,4-0,5-0,6-0,7-0,8-0,9-0,10-0',
+        'selected_card_for_attachment': 'chart-card'
+    })
+
+
+# Synthetic sprint planning storm
+def synthetic_stream(event_count, board_count, duplicates, random_generator):
+    """
+    Builds webhook envelopes of cards created and moved across the lists, a few Boards get most of the events
+    :param event_count: Number of deliveries
+    :param board_count: Number of Boards
+    :param duplicates: Share of deliveries repeating an earlier Action, like Trello retries
+    :param random_generator: random.Random
+    :return: returns list of API Gateway envelopes
+    """
+    board_ids = ['%024x' % board_index for board_index in range(board_count)]
+    weights = [1 / (rank + 1) for rank in range(board_count)]
+    card_counts = Counter()
+    stream = []
+    for _ in range(event_count):
+        if stream and random_generator.random() < duplicates:
+            stream.append(random_generator.choice(stream))
+            continue
+        board_id = random_generator.choices(board_ids, weights)[0]
+        name = f'{random_generator.choice(["U", "D", "T", "T"])} Story {card_counts[board_id]} ({random_generator.choice([1, 2, 3, 5, 8])})'
+        if random_generator.random() < 0.2 or card_counts[board_id] < CARDS_PER_BOARD:
+            card_id = f'{board_id}-{card_counts[board_id]}'
+            card_counts[board_id] += 1
+            action = {'type': 'createCard', 'display': {'translationKey': 'action_create_card'},
+                      'data': {'list': {'id': random_generator.choice(LISTS)}}}
+        else:
+            card_id = f'{board_id}-{random_generator.randrange(card_counts[board_id])}'
+            list_before, list_after = random_generator.sample(LISTS, 2)
+            action = {'type': 'updateCard', 'display': {'translationKey': 'action_move_card_from_list_to_list'},
+                      'data': {'listBefore': {'id': list_before}, 'listAfter': {'id': list_after}}}
+        action['id'] = uuid.uuid4().hex[:24]
+        action['data'].update({'board': {'id': board_id, 'name': board_id}, 'card': {'id': card_id, 'name': name}})
+        stream.append({'payload': json.dumps({'action': action})})
+    return stream
+
+
+class Replay(object):
+    """
+    Fake backends installed in the handler's client registry, and the Trello side effects of every delivery
+    """
+
+    def __init__(self, trello_latency):
+        self.trello = FakeTrelloClient(latency=trello_latency)
+        self.s3 = FakeS3()
+        self.sqs = FakeSQS()
+        self.ssm = FakeSSM({API_KEY_PARAMETER: 'api-key', TOKEN_PARAMETER: 'token'})
+        self.lock = threading.Lock()
+        # Redelivered Actions do not change Trello again
+        self.applied = set()
+
+        clients = burndown_engine.clients
+        clients.aws_clients[('resource', 's3')] = self.s3
+        clients.aws_clients[('client', 'sqs')] = self.sqs
+        clients.aws_clients[('client', 'ssm')] = self.ssm
+        clients.get_credentials()
+        clients.trello_client = self.trello
+
+        # The workers share the tenant budget like containers sharing the TrelloBudgetTable
+        self.budget = SharedRateLimiter(burndown_engine.tenants.default_tenant.organization_id, LocalBudgetStore())
+        burndown_engine.tenants.default_tenant.rate_limiter = self.budget
+
+    def ensure_board(self, board_id):
+        if board_id not in self.trello.boards:
+            self.trello.add_board(board_id)
+            self.trello.enable_powerup(board_id, PLUGIN_ID, POWERUP_NAME, powerup_data())
+
+    def apply(self, payload):
+        """
+        Changes the fake Trello the way the delivered Action did, before the handler sees it
+        :param payload: Trello webhook payload
+        :return: returns True when the Action touches a monitor list and is recorded by the handler
+        """
+        action = payload['action']
+        board_id = action['data']['board']['id']
+        card = action['data'].get('card')
+        with self.lock:
+            self.ensure_board(board_id)
+            if card is None:
+                return False
+            if action['id'] in self.applied:
+                return False
+            self.applied.add(action['id'])
+            id_list = (action['data'].get('listAfter') or action['data'].get('list') or {}).get('id')
+            if card['id'] not in self.trello.cards.get(board_id, {}):
+                self.trello.add_card(board_id, card['id'], id_list or LISTS[0], card['name'])
+            elif id_list:
+                self.trello.move_card(board_id, card['id'], id_list)
+        lists = [(action['data'].get(key) or {}).get('id') for key in ('list', 'listBefore', 'listAfter')]
+        return action['type'] in ('createCard', 'updateCard') and any(id_list in MONITOR_LISTS for id_list in lists)
+
+    def lost_updates(self, board_ids):
+        """
+        Compares the counts recorded today with the cards of every Board
+        :param board_ids: Boards a recorded Action was delivered for
+        :return: returns list of Board IDs whose recorded counts are missing or stale
+        """
+        history = download_history(self.s3, DEPLOYMENT_BUCKET)
+        today = to_day(burndown_engine.current_date)
+        lost = []
+        for board_id in sorted(board_ids):
+            cards = self.trello.cards.get(board_id, {}).values()
+            stories_defects_remaining, stories_defects_done, tasks_remaining = count_cards(weighted_cards([card for card in cards if not card['closed']]), MONITOR_LISTS, DONE_LIST)[:3]
+            sprint, days = history.current_sprint(board_id)
+            recorded_days = days[days['date'] == today] if sprint is not None else []
+            if not len(recorded_days) or tuple(recorded_days[['stories_defects_remaining', 'tasks_remaining']][0].tolist()) != (float(stories_defects_remaining), float(tasks_remaining)):
+                lost.append(board_id)
+        return lost
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))] * 1000 if values else 0
+
+
+# Busiest Trello rate limit window
+def peak_window(request_times, seconds=TRELLO_RATE_LIMIT_SECONDS):
+    """
+    Finds the most Trello requests sent within any window of the rate limit
+    :param request_times: Monotonic time of every request
+    :param seconds: Rate limit window
+    :return: returns request count
+    """
+    request_times = sorted(request_times)
+    peak = start = 0
+    for end in range(len(request_times)):
+        while request_times[end] - request_times[start] >= seconds:
+            start += 1
+        peak = max(peak, end - start + 1)
+    return peak
+
+
+def replay(stream, rate, concurrency, trello_latency):
+    """
+    Fires the stream at the handler at the arrival rate from concurrent workers
+    :param stream: list of API Gateway envelopes
+    :param rate: Deliveries per second, 0 fires them all at once
+    :param concurrency: Concurrent invocations, like warm Lambda containers
+    :param trello_latency: Seconds every Trello request takes
+    :return: returns report dict
+    """
+    backends = Replay(trello_latency)
+    latencies = []
+    service_times = []
+    errors = Counter()
+    recorded_boards = set()
+
+    def deliver(index, envelope):
+        arrival = started + (index / rate if rate else 0)
+        delay = arrival - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        payload = json.loads(envelope['payload'])
+        is_recorded = backends.apply(payload)
+        begun = time.monotonic()
+        try:
+            handler.trelloSprintBurndown(envelope, None)
+            if is_recorded:
+                recorded_boards.add(payload['action']['data']['board']['id'])
+        except Exception as error:
+            errors[type(error).__name__] += 1
+        finished = time.monotonic()
+        service_times.append(finished - begun)
+        latencies.append(finished - max(arrival, started))
+
+    # The handler prints every payload and count, only the report is of interest here
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(lambda item: deliver(*item), enumerate(stream)))
+        elapsed = time.monotonic() - started
+
+    trello_requests = sum(backends.trello.calls.values())
+    lost = backends.lost_updates(recorded_boards)
+    return {
+        'events': len(stream),
+        'seconds': round(elapsed, 3),
+        'throughput_per_second': round(len(stream) / elapsed, 1),
+        'latency_ms': {'p50': round(percentile(latencies, 0.5), 1), 'p90': round(percentile(latencies, 0.9), 1), 'p99': round(percentile(latencies, 0.99), 1), 'max': round(percentile(latencies, 1), 1)},
+        'service_ms': {'p50': round(percentile(service_times, 0.5), 1), 'p99': round(percentile(service_times, 0.99), 1)},
+        'trello_calls_per_event': round(trello_requests / len(stream), 2),
+        'trello_calls': dict(backends.trello.calls),
+        'trello_peak_window': {'requests': peak_window(backends.trello.request_times), 'limit': TRELLO_RATE_LIMIT_REQUESTS, 'seconds': TRELLO_RATE_LIMIT_SECONDS},
+        'trello_budget': backends.budget.report(),
+        's3_calls_per_event': round(sum(backends.s3.calls.values()) / len(stream), 2),
+        's3_calls': dict(backends.s3.calls),
+        'render_jobs_enqueued': backends.sqs.calls['send_message'],
+        'dedup': handler.deduplicator.report(),
+        'errors': dict(errors),
+        'recorded_boards': len(recorded_boards),
+        'lost_updates': len(lost),
+        'lost_update_boards': lost[:10]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replays Trello webhook deliveries at the webhook handler')
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--boards', type=int, default=20)
+    parser.add_argument('--rate', type=float, default=50, help='deliveries per second, 0 for all at once')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--trello-latency-ms', type=float, default=80)
+    parser.add_argument('--duplicates', type=float, default=0.05, help='share of repeated deliveries')
+    parser.add_argument('--render', choices=['queue', 'inline'], default='queue', help='enqueue Render Jobs like the deployment, or render in the handler')
+    parser.add_argument('--stream', help='json lines file of API Gateway envelopes to replay')
+    parser.add_argument('--record', help='write the replayed stream to this json lines file')
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args()
+
+    if burndown_engine.current_day in ('Saturday', 'Sunday'):
+        # The handler ignores deliveries on weekends
+        handler.set_current_date = lambda: ('Monday', burndown_engine.set_current_date()[1])
+
+    handler.RENDER_QUEUE_URL = burndown_engine.RENDER_QUEUE_URL = RENDER_QUEUE_URL if arguments.render == 'queue' else None
+
+    if arguments.stream:
+        with open(arguments.stream) as stream_file:
+            stream = [json.loads(line) for line in stream_file if line.strip()]
+    else:
+        stream = synthetic_stream(arguments.events, arguments.boards, arguments.duplicates, random.Random(arguments.seed))
+
+    if arguments.record:
+        with open(arguments.record, 'w') as record_file:
+            record_file.writelines(json.dumps(envelope) + '\n' for envelope in stream)
+
+    print(json.dumps(replay(stream, arguments.rate, arguments.concurrency, arguments.trello_latency_ms / 1000), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import json
+import time
+import hashlib
+from botocore.exceptions import ClientError
+from sprint_history import CONDITIONAL_WRITE_ATTEMPTS, is_not_found, is_write_conflict, write_conditions, write_conflict_backoff
+
+
+# Setting Board Registry file name
+board_registry_file_name = 'enabled_boards.json'
+
+# Hours between full Organization scans reconciling the Board Registry
+BOARD_REGISTRY_RECONCILE_HOURS = float(os.getenv('BOARD_REGISTRY_RECONCILE_HOURS', '24'))
+
+# Webhook Actions that can enable, disable or reconfigure the PowerUp on a Board
+REGISTRY_ACTION_TYPES = ('enablePlugin', 'disablePlugin', 'addToOrganizationBoard', 'updatePluginData', 'createPluginData')
+
+
+# Version of a PowerUp configuration
+def config_version(powerup_data):
+    """
+    Gets a short version hash of PowerUp Data
+    :param powerup_data: PowerUp Data json string
+    :return: returns version string
+    """
+    return hashlib.sha1(powerup_data.encode('utf-8')).hexdigest()[:12]
+
+
+class BoardRegistry(object):
+    """
+    Index of the Boards that have the PowerUp enabled, with their PowerUp Data and config version
+    """
+
+    def __init__(self, boards=None, plugin_id=None, reconciled_at=0):
+        self.boards = boards or {}
+        self.plugin_id = plugin_id
+        self.reconciled_at = reconciled_at
+        # ETag of the stored Registry it was downloaded from, None when it was not stored yet
+        self.e_tag = None
+        # Boards enabled or disabled since it was downloaded, Board ID -> entry, None when disabled
+        self.changes = {}
+
+    def enable(self, board_id, powerup_data):
+        """
+        Adds or updates a Board with the PowerUp enabled
+        :param board_id: The ID of the Board
+        :param powerup_data: PowerUp Data json string
+        :return: returns True when the entry changed
+        """
+        version = config_version(powerup_data)
+        if self.boards.get(board_id, {}).get('config_version') == version:
+            return False
+        self.boards[board_id] = self.changes[board_id] = {
+            'config_version': version,
+            'powerup_data': powerup_data,
+            'updated_at': time.time()
+        }
+        return True
+
+    def disable(self, board_id):
+        """
+        Removes a Board from the Registry
+        :param board_id: The ID of the Board
+        :return: returns True when the Board was registered
+        """
+        self.changes[board_id] = None
+        return self.boards.pop(board_id, None) is not None
+
+    def rebase(self, stored):
+        """
+        Applies the Boards enabled and disabled since the download over the Registry stored by another invocation
+        :param stored: BoardRegistry downloaded again
+        :return: returns nothing
+        """
+        boards = dict(stored.boards)
+        for board_id, entry in self.changes.items():
+            if entry is None:
+                boards.pop(board_id, None)
+            else:
+                boards[board_id] = entry
+        self.boards = boards
+        self.plugin_id = self.plugin_id or stored.plugin_id
+        self.reconciled_at = max(self.reconciled_at, stored.reconciled_at)
+        self.e_tag = stored.e_tag
+
+    def enabled_boards(self):
+        """
+        Lists the registered Boards
+        :return: returns list of (board_id, powerup_data) tuples
+        """
+        return [(board_id, entry['powerup_data']) for board_id, entry in self.boards.items()]
+
+    def needs_reconcile(self, now=None):
+        """
+        Checks if the periodic full scan is due
+        :param now: Unix time, defaults to the current time
+        :return: returns True when the last scan is older than BOARD_REGISTRY_RECONCILE_HOURS
+        """
+        now = time.time() if now is None else now
+        return now - self.reconciled_at >= BOARD_REGISTRY_RECONCILE_HOURS * 3600
+
+    def to_json(self):
+        return {
+            'plugin_id': self.plugin_id,
+            'reconciled_at': self.reconciled_at,
+            'boards': self.boards
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data.get('boards'), data.get('plugin_id'), data.get('reconciled_at', 0))
+
+
+# Find our PowerUp ID
+def find_plugin_id(client, board_id, powerup_name):
+    """
+    Gets the ID of our PowerUp from the plugins available to a Board
+    :param client: Trello client Object
+    :param board_id: The ID of the Board
+    :param powerup_name: PowerUp name
+    :return: returns Plugin/PowerUp ID or None
+    """
+    plugins = client.fetch_json(
+        f"boards/{board_id}/plugins",
+        http_method="GET",
+        headers={
+            "Accept": "application/json"
+        }
+    )
+    for plugin in plugins:
+        if plugin['name'] == powerup_name:
+            return plugin['id']
+
+
+# Get PowerUp Data of a Board in one request
+def fetch_board_powerup_data(client, board_id, plugin_id):
+    """
+    Gets PowerUp Data of a Board with the enabled PowerUps and plugin data nested in one request
+    :param client: Trello client Object
+    :param board_id: The ID of the Board
+    :param plugin_id: ID of our PowerUp
+    :return: returns PowerUp Data json string, None when the PowerUp is not enabled
+    """
+    board = client.fetch_json(
+        f"boards/{board_id}",
+        http_method="GET",
+        headers={
+            "Accept": "application/json"
+        },
+        query_params={
+            'fields': 'id',
+            'boardPlugins': 'true',
+            'pluginData': 'true'
+        }
+    )
+    if not any(board_plugin['idPlugin'] == plugin_id for board_plugin in board.get('boardPlugins', [])):
+        return None
+    for plugin_data in board.get('pluginData', []):
+        if plugin_data['idPlugin'] == plugin_id:
+            return plugin_data['value']
+
+
+# Refresh one Board in the Registry
+def refresh_board(client, registry, board_id, powerup_name):
+    """
+    Re-reads the PowerUp state of a Board after a webhook event and updates the Registry
+    :param client: Trello client Object
+    :param registry: BoardRegistry
+    :param board_id: The ID of the Board
+    :param powerup_name: PowerUp name
+    :return: returns True when the Registry changed
+    """
+    if registry.plugin_id is None:
+        registry.plugin_id = find_plugin_id(client, board_id, powerup_name)
+    powerup_data = fetch_board_powerup_data(client, board_id, registry.plugin_id)
+    if powerup_data is None:
+        return registry.disable(board_id)
+    return registry.enable(board_id, powerup_data)
+
+
+# Full scan of the Organization Boards
+def reconcile_registry(client, registry, organization_id, powerup_name):
+    """
+    Rebuilds the Registry from a scan of every open Organization Board, one request per Board
+    :param client: Trello client Object
+    :param registry: BoardRegistry
+    :param organization_id: Trello Organization ID
+    :param powerup_name: PowerUp name
+    :return: returns BoardRegistry
+    """
+    boards = client.fetch_json(
+        f"organizations/{organization_id}/boards",
+        http_method="GET",
+        headers={
+            "Accept": "application/json"
+        },
+        query_params={
+            'filter': 'open',
+            'fields': 'id'
+        }
+    )
+
+    enabled_board_ids = set()
+    for board in boards:
+        try:
+            if registry.plugin_id is None:
+                registry.plugin_id = find_plugin_id(client, board['id'], powerup_name)
+            powerup_data = fetch_board_powerup_data(client, board['id'], registry.plugin_id)
+            if powerup_data is not None:
+                registry.enable(board['id'], powerup_data)
+                enabled_board_ids.add(board['id'])
+        except Exception as error:
+            print(f'{error}: Error reconciling the Trello Board - {board["id"]}')
+            # Keep what we knew about a Board we could not read
+            if board['id'] in registry.boards:
+                enabled_board_ids.add(board['id'])
+            continue
+
+    for board_id in set(registry.boards) - enabled_board_ids:
+        registry.disable(board_id)
+
+    registry.reconciled_at = time.time()
+    return registry
+
+
+# Download Board Registry from S3
+def download_registry(s3, bucket, prefix=''):
+    """
+    Downloads the Board Registry, an empty Registry is due for a full scan
+    :param s3: Boto3 S3 resource
+    :param bucket: S3 Bucket name
+    :param prefix: S3 prefix of the tenant, see tenants.tenant_prefix
+    :return: returns BoardRegistry
+    """
+    try:
+        response = s3.Object(bucket, prefix + board_registry_file_name).get()
+        registry = BoardRegistry.from_json(json.loads(response['Body'].read()))
+        registry.e_tag = response['ETag']
+        return registry
+    except ClientError as error:
+        # Only a missing Registry is rebuilt, an empty one uploaded over the stored one would disable every Board
+        if not is_not_found(error):
+            raise
+        print(error)
+        return BoardRegistry()
+
+
+# Upload Board Registry to S3
+def upload_registry(s3, bucket, registry, prefix='', attempts=CONDITIONAL_WRITE_ATTEMPTS):
+    """
+    Uploads the Board Registry over the Registry it was downloaded from. When another invocation wrote the Registry
+    since, its changes are applied over the stored Registry and the upload is tried again
+    :param s3: Boto3 S3 resource
+    :param bucket: S3 Bucket name
+    :param registry: BoardRegistry
+    :param prefix: S3 prefix of the tenant, see tenants.tenant_prefix
+    :param attempts: Conditional writes before the conflict is raised
+    :return: returns BoardRegistry as uploaded
+    """
+    for attempt in range(attempts):
+        try:
+            response = s3.Object(bucket, prefix + board_registry_file_name).put(Body=json.dumps(registry.to_json()), **write_conditions(registry.e_tag))
+            registry.e_tag = response['ETag']
+            registry.changes = {}
+            return registry
+        except ClientError as error:
+            if not is_write_conflict(error) or attempt == attempts - 1:
+                raise
+        print(f'Board Registry {prefix + board_registry_file_name} changed since it was downloaded, applying the changes to it again')
+        write_conflict_backoff(attempt)
+        registry.rebase(download_registry(s3, bucket, prefix))
@@ -0,0 +1,829 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import json
+import time
+import datetime
+import pytz
+import threading
+import numpy as np
+from matplotlib_cache import MATPLOTLIB_WARM_UP, configure_matplotlib, warm_up
+configure_matplotlib()
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
+from retry import retry
+from client_registry import ClientRegistry
+from card_counts import COUNT_UNIT, count_cards, fetch_cards, weighted_cards
+from sprint_history import NOT_RECORDED, to_date_strings, history_key, download_history, upload_history
+from render_queue import RENDER_QUEUE_URL, SqsRenderQueue, render_job
+from chart_publisher import CHART_PUBLISH_MODE, CHART_BUCKET, CHART_KEY_SECRET_SSM_PARAMETER_KEY, S3_MODE, publish_chart_to_s3
+from memory_instrumentation import MemoryProfiler
+from tenants import TenantRegistry
+from rollup import rollup_series, rollup_chart_id
+from forecast import sprint_forecast
+from render_throttle import RENDER_THROTTLE_MINUTES, render_throttle
+
+
+# Get the SSM Parameter Keys
+try:
+    TRELLO_API_KEY_SSM_PARAMETER_KEY = os.getenv('TRELLO_API_KEY_SSM_PARAMETER_KEY')
+except Exception:
+    TRELLO_API_KEY_SSM_PARAMETER_KEY = '/Serverless/Trello/ApiKey'
+
+try:
+    TRELLO_TOKEN_SSM_PARAMETER_KEY = os.getenv('TRELLO_TOKEN_SSM_PARAMETER_KEY')
+except Exception:
+    TRELLO_TOKEN_SSM_PARAMETER_KEY = '/Serverless/Trello/Token'
+
+
+try:
+    POWERUP_NAME = os.getenv('POWERUP_NAME')
+except Exception:
+    print('Power-Up Name value missing in Lambda Environment Variable')
+
+try:
+    DEPLOYMENT_BUCKET = os.getenv('DEPLOYMENT_BUCKET')
+except Exception:
+    print('Deployment Bucket Name value missing in Lambda Environment Variable')
+
+# Boards fetched and published at the same time
+ENGINE_MAX_WORKERS = int(os.getenv('ENGINE_MAX_WORKERS', '8'))
+
+# Setting Time Zone to CST
+cst_timezone = pytz.timezone('US/Central')
+
+
+# Set the Current Date and Day of an invocation
+def set_current_date(now=None):
+    """
+    Sets the day and date of the invocation, read by the chart and Sprint History functions. Every handler calls it
+    first, since a warm container keeps serving invocations after midnight
+    :param now: CST datetime of the invocation, defaults to now
+    :return: returns tuple of (current_day, current_date). Eg: ('Monday', '2020-05-04')
+    """
+    global current_day, current_date
+    now = datetime.datetime.now(cst_timezone) if now is None else now
+    current_day = now.strftime("%A")
+    current_date = now.strftime("%Y-%m-%d")
+    return current_day, current_date
+
+
+# Setting Current Date and Day, set again by every invocation
+current_day, current_date = set_current_date()
+
+# Trello, S3 and SQS clients shared by warm invocations of this container
+clients = ClientRegistry(TRELLO_API_KEY_SSM_PARAMETER_KEY, TRELLO_TOKEN_SSM_PARAMETER_KEY)
+
+# Organizations served by this deployment, the one of TRELLO_ORGANIZATION_ID uses the clients above
+tenants = TenantRegistry(clients, POWERUP_NAME)
+
+# Memory instrumentation, enabled with MEMORY_PROFILING=True
+memory = MemoryProfiler()
+
+# Chart publishes of the Boards, at most one per throttle window of a Board
+throttle = render_throttle()
+
+# pyplot is not thread safe, batches running on threads of one process render one chart at a time
+render_lock = threading.Lock()
+
+# Load the Agg backend and fonts while the container starts, before the first chart
+if MATPLOTLIB_WARM_UP:
+    warm_up()
+
+
+# Get Our PowerUp ID from the Board
+def get_plugin_id(client, board_id, powerup_name=None):
+    """
+    Gets Our PowerUp ID from the Board
+    :param client: Trello client Object
+    :param board_id: The ID of the Board
+    :param powerup_name: PowerUp name of the tenant, defaults to POWERUP_NAME
+    :return: returns Plugin/PowerUp Value
+    """
+    plugins = client.fetch_json(
+        f"boards/{board_id}/plugins",
+        http_method="GET",
+        headers={
+                "Accept": "application/json"
+                },
+        )
+
+    for plugin in plugins:
+        if plugin['name'] == (POWERUP_NAME if powerup_name is None else powerup_name):
+            return plugin['id']
+
+
+# Get all Enabled PowerUps from the Board
+def enabled_powerups(client, board_id):
+    """
+    Gets Enabled Plugin/PowerUp from the board
+    :param client: Trello client Object
+    :param board_id: The ID of the Board
+    :return: returns Enabled Plugin/PowerUp Data
+    """
+    return client.fetch_json(
+        f"boards/{board_id}/boardPlugins",
+        http_method="GET",
+        headers={
+                "Accept": "application/json"
+            }
+        )
+
+
+# Get PowerUp Data that is required for monitoring the Board
+@retry(tries=3, delay=11)
+def get_powerup_data(client, board_id, powerup_name=None):
+    """
+    Get PowerUp Data from the board
+    :param client: Trello client Object
+    :param board_id: The ID of the Board
+    :param powerup_name: PowerUp name of the tenant, defaults to POWERUP_NAME
+    :return: returns PowerUp Data for monitoring boards
+    """
+    # Get Enabled PowerUps in the Board
+    enabled_powerups_data = enabled_powerups(client, board_id)
+    plugin_id = get_plugin_id(client, board_id, powerup_name)
+
+    for enabled_powerup in enabled_powerups_data:
+        # Check if our PowerUp Enabled or Not
+        if plugin_id == enabled_powerup['idPlugin']:
+            plugin_data = client.fetch_json(
+                f"boards/{board_id}/pluginData",
+                http_method="GET",
+                headers={
+                    "Accept": "application/json"
+                    },
+                query_params={
+                    'idPlugin': plugin_id
+                    }
+            )
+
+            return plugin_data[0]['value']
+
+
+# Get Stories and Tasks Counts
+@retry(tries=3, delay=11)
+def get_counts(client, board_id, monitor_lists, done_list, start_day, unit=COUNT_UNIT, story_points_field=None):
+    """
+    Get List data
+    :param client: Trello client Object
+    :param board_id: The ID of the Board
+    :param monitor_lists: Trello monitor lists from PowerUp Data
+    :param done_list: Trello done list from PowerUp Data
+    :param start_day: Start day of the Sprint. Eg: Monday
+    :param unit: Burndown unit from PowerUp Data, 'count' or 'points'
+    :param story_points_field: ID of the story points custom field from PowerUp Data
+    :return: returns count of User Stories/Defects remaining and completed
+    """
+    # Cards and their custom field values come back in one request
+    board_cards = fetch_cards(client, board_id, unit)
+
+    stories_defects_remaining, stories_defects_done, tasks_remaining, tasks_done = count_cards(
+        weighted_cards(board_cards, unit, story_points_field), monitor_lists, done_list)
+
+    # Ideal tasks remaining is only counted on the Sprint start day
+    ideal_tasks_remaining = 0
+    if current_day == start_day:
+        ideal_tasks_remaining = tasks_remaining + tasks_done
+
+    return stories_defects_remaining, stories_defects_done, tasks_remaining, ideal_tasks_remaining
+
+
+# Get Sprint Dates
+def get_sprint_dates(start_day, total_sprint_days, board_id, sprint_history):
+    """
+    Gets Sprint dates based on the Start day and Total Sprint days
+    :param start_day: Start day of the Sprint. Eg: Monday
+    :param total_sprint_days: Total days of a Sprint. Value starts from 0. So if Sprint has 5 days then total_sprint_days=4
+    :param board_id: The ID of the Board
+    :param sprint_history: SprintHistory of all Boards
+    :return: returns list of Sprint dates
+    """
+    sprint_dates = []
+    start_date = datetime.datetime.now(cst_timezone)
+    if current_day == start_day:
+        sprint_dates.append(start_date.strftime("%Y-%m-%d"))
+        business_days_to_add = total_sprint_days
+        current_datetime = start_date
+        while business_days_to_add > 0:
+            current_datetime += datetime.timedelta(days=1)
+            weekday = current_datetime.weekday()
+            if weekday >= 5: # sunday = 6
+                continue
+            business_days_to_add -= 1
+            sprint_dates.append(current_datetime.strftime("%Y-%m-%d"))
+    else:
+        sprint_dates = sprint_history.sprint_dates(board_id)
+
+    return sprint_dates
+
+
+# Create/Update Sprint Data
+def update_sprint_data(start_day, board_id, sprint_dates, stories_defects_remaining, stories_defects_done, tasks_remaining, ideal_tasks_remaining, team_size, team_members_days_ooo, sprint_history):
+    """
+    Create/Update Sprint Data in the Sprint History
+    :param start_day: Start day of the Sprint. Eg: Monday
+    :param board_id: The ID of the Board
+    :param sprint_dates: List of current sprint dates
+    :param stories_defects_remaining: Userstories or Defects remaining count
+    :param stories_defects_done: Userstories or Defects done count
+    :param tasks_remaining: Tasks remaining count
+    :param ideal_tasks_remaining: Ideal tasks remaining count
+    :param team_size: Total Team Size in the Current Sprint
+    :param team_members_days_ooo: Team Members Days Out of Office per Sprint day
+    :param sprint_history: SprintHistory of all Boards
+    :return: returns Sprint History
+    """
+    # A new Sprint is appended, previous Sprints are kept in the history
+    if current_day == start_day:
+        sprint_history.start_sprint(board_id, sprint_dates, ideal_tasks_remaining)
+
+    sprint_history.set_days_ooo(board_id, team_members_days_ooo)
+    sprint_history.record(board_id, current_date, stories_defects_remaining, stories_defects_done, tasks_remaining, team_size, int(datetime.datetime.now(cst_timezone).timestamp()))
+
+    return sprint_history
+
+
+# Create Sprint Burndown Chart
+def create_chart(sprint_history, total_sprint_days, board_id, team_members, is_show_team_size, is_show_intraday=False, is_show_forecast=False):
+    """
+    Creates Sprint Burndown Chart
+    :param sprint_history: SprintHistory of all Boards
+    :param total_sprint_days: Total Sprint Days in the Current Sprint without Weekends Eg: 5 (Multiples of 5)
+    :param board_id: The ID of the Board
+    :param team_members: Team members on Team for Sprint
+    :param is_show_team_size: To enable Team Size in Sprint Burndown Chart
+    :param is_show_intraday: To enable today's intra-day Tasks Remaining points in Sprint Burndown Chart
+    :param is_show_forecast: To enable the projected Tasks Remaining band and completion date in Sprint Burndown Chart
+    :return: returns nothing
+    """
+    sprint, days = sprint_history.current_sprint(board_id)
+
+    ideal_tasks_remaining = float(sprint['ideal_tasks_remaining'])
+
+    tasks_remaining = days['tasks_remaining']
+    team_size = days['team_size']
+
+    # Days not recorded yet are drawn as empty bars and left off the lines
+    sprint_dates_list = [""] + to_date_strings(days['date'])
+    stories_defects_remaining_list = [0] + np.maximum(days['stories_defects_remaining'], 0).tolist()
+    stories_defects_done_list = [0] + np.maximum(days['stories_defects_done'], 0).tolist()
+    tasks_remaining_list = [ideal_tasks_remaining] + tasks_remaining[tasks_remaining != NOT_RECORDED].tolist()
+    team_size_list = [0] + team_size[team_size != NOT_RECORDED].tolist()
+    team_members_days_ooo = [0] + days['days_ooo'].tolist()
+
+    team_size_list[0] = team_size_list[1]
+
+    f, ax = plt.subplots()
+
+    x_axis = [item for item in range(0, total_sprint_days + 1)]
+    x_axis_label = sprint_dates_list
+
+    y_axis_labels = [0]
+    ideal_line_list = [0]
+    ax.axhline(y=0,color='#d0e2f6',linewidth=.5, zorder=0)
+    for index in range(0, total_sprint_days):
+        y_axis_label = y_axis_labels[index] + round((max(tasks_remaining_list)/total_sprint_days) + 0.5)
+        ideal_line = ideal_line_list[index] + (ideal_tasks_remaining/total_sprint_days)
+        y_axis_labels.append(y_axis_label)
+        ideal_line_list.append(ideal_line)
+        ax.axhline(y=y_axis_labels[index + 1],color='#d0e2f6',linewidth=.5, zorder=0)
+
+    ax.set_xticks(x_axis)
+    ax.set_xticklabels(x_axis_label,rotation=40,ha='right')
+    ax.set_yticks(y_axis_labels)
+    ax.set_yticklabels(y_axis_labels)
+
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['bottom'].set_visible(False)
+    ax.spines['left'].set_visible(False)
+
+    plt.tick_params(
+        axis='both',       # changes apply to the x-axis
+        which='both',      # both major and minor ticks are affected
+        bottom=False,      # ticks along the bottom edge are off
+        left=False,        # ticks along the top edge are off
+        labelbottom=True,
+        labelsize=6,
+        pad=4
+    )
+
+    if is_show_team_size:
+        plt.fill_between(np.arange(len(team_size_list)), 0, team_size_list, color='#ff9f68', alpha=0.5, lw=0)
+        p6, = plt.plot(np.arange(len(team_size_list)),team_size_list,'k--',color='#ff9f68', label='line 1',zorder=1)
+        for index in range(0, len(team_size_list)):
+            plt.annotate(str(team_size_list[index]), xy=[index, team_size_list[index]], color='#ff9f68', size=6, ha='center', va='bottom', textcoords="offset points", xytext=(2, 3))
+
+    p3 = plt.bar(np.arange(len(stories_defects_remaining_list)), stories_defects_remaining_list, color='#c5e3f6',width=-.25,align='edge',zorder=2)
+    p4 = plt.bar(np.arange(len(stories_defects_done_list)), stories_defects_done_list, color='#17b978',width=.25,align='edge', zorder=2)
+    p5 = plt.bar(np.arange(len(team_members_days_ooo)) -.5, team_members_days_ooo, color='#ffcef3',width=.25,align='edge', zorder=2)
+    p1, = plt.plot(x_axis,[element for element in reversed(ideal_line_list)],'k',label='line 3',linewidth=.7, zorder=4)
+    p2, = plt.plot(np.arange(len(tasks_remaining_list)),tasks_remaining_list,'--',color='#482ff7', label='line 1', zorder=5)
+
+    # Intra-day samples are placed between yesterday and today by time of day
+    if is_show_intraday and current_date in sprint_dates_list:
+        samples = sprint_history.intraday_samples(board_id, current_date)
+        day_start = cst_timezone.localize(datetime.datetime.strptime(current_date, "%Y-%m-%d")).timestamp()
+        plt.plot(sprint_dates_list.index(current_date) - 1 + (samples['timestamp'] - day_start) / 86400, samples['tasks_remaining'], '.', color='#482ff7', markersize=3, zorder=5)
+
+    # Projected Tasks Remaining from the latest recorded day, day index i is drawn at i + 1 like the recorded days
+    forecast = sprint_forecast(sprint_history, board_id) if is_show_forecast else None
+    if forecast is not None and forecast['projected_median'] is not None:
+        projected = np.array([np.nan if value is None else value for value in forecast['projected_median']])
+        projected_x = np.arange(1, len(projected) + 1)
+        plt.fill_between(projected_x, [np.nan if value is None else value for value in forecast['projected_low']], [np.nan if value is None else value for value in forecast['projected_high']], color='#482ff7', alpha=0.12, lw=0, zorder=3)
+        plt.plot(projected_x, projected, ':', color='#482ff7', zorder=5)
+    if forecast is not None and forecast['completion_date'] is not None:
+        plt.text(.02, 0.9, f"Forecast Done: {forecast['completion_date']}\n{forecast['confidence']:.0%} by: {forecast['completion_date_late'] or 'Not in sight'}\nOn Time: {forecast['on_time_probability']:.0%}", fontsize=5, transform=plt.gcf().transFigure)
+
+    def autolabel(rects):
+        """Attach a text label above each bar in *rects*, displaying its height."""
+        for rect in rects:
+            height = rect.get_height()
+            if height != 0:
+                ax.annotate('{:g}'.format(height),
+                            xy=(rect.get_x() + rect.get_width() / 2, height /2),
+                            xytext=(0, -3),  # 3 points vertical offset
+                            textcoords="offset points",
+                            ha='center', va='bottom', size=6)
+
+    autolabel(p3)
+    autolabel(p4)
+    autolabel(p5)
+
+    for index in range(0, len(tasks_remaining_list)):
+        plt.annotate('{:g}'.format(tasks_remaining_list[index]), xy=[index, tasks_remaining_list[index]], color='#482ff7', size=6, ha='center', va='bottom', textcoords="offset points", xytext=(2, 3))
+
+    plt.title("Burndown Chart")
+
+    on_team_for_sprint = ['On Team for Sprint', '\n']
+
+    on_team_for_sprint.extend(team_members)
+
+    plt.text(.02, 0.1, "\n".join(on_team_for_sprint), fontsize=5, transform=plt.gcf().transFigure)
+    plt.subplots_adjust(left=0.2)
+
+    if is_show_team_size:
+        plt.legend([p1,p2,p3, p4, p5, p6], ["Ideal Tasks Remaining","Tasks Remaining","Stories/Defects Remaining", "Stories/Defects Done", "Team Members Days OOO","Team Size"], loc=1, borderaxespad=0,fontsize=6).get_frame().set_alpha(0.5)
+    else:
+        plt.legend([p1,p2,p3, p4, p5], ["Ideal Tasks Remaining","Tasks Remaining","Stories/Defects Remaining", "Stories/Defects Done", "Team Members Days OOO"], loc=1, borderaxespad=0,fontsize=6).get_frame().set_alpha(0.5)
+
+    plt.savefig('/tmp/' + current_date + '_Sprint_Burndown_Chart_' + board_id, dpi=150)
+
+    # Release the figure, pyplot keeps every open figure alive across warm invocations
+    plt.close(f)
+
+
+# Create the Organization rollup Chart
+def create_rollup_chart(series, image_path):
+    """
+    Creates the portfolio Burndown Chart of an Organization
+    :param series: Rollup series from rollup.rollup_series()
+    :param image_path: png path the Chart is saved to
+    :return: returns nothing
+    """
+    x_axis = np.arange(len(series['dates']))
+
+    # Days not recorded yet are drawn as empty bars and left off the lines
+    def values(name):
+        return np.array([np.nan if value is None else value for value in series[name]], dtype=float)
+
+    tasks_remaining = values('tasks_remaining')
+    team_size = values('team_size')
+
+    f, ax = plt.subplots()
+
+    ax.grid(axis='y', color='#d0e2f6', linewidth=.5, zorder=0)
+    ax.set_xticks(x_axis)
+    ax.set_xticklabels(series['dates'], rotation=40, ha='right')
+
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+
+    plt.tick_params(axis='both', which='both', bottom=False, left=False, labelbottom=True, labelsize=6, pad=4)
+
+    p6, = plt.plot(x_axis, team_size, '--', color='#ff9f68', zorder=1)
+    p3 = plt.bar(x_axis, np.nan_to_num(values('stories_defects_remaining')), color='#c5e3f6', width=-.25, align='edge', zorder=2)
+    p4 = plt.bar(x_axis, np.nan_to_num(values('stories_defects_done')), color='#17b978', width=.25, align='edge', zorder=2)
+    p1, = plt.plot(x_axis, values('ideal'), 'k', linewidth=.7, zorder=4)
+    p2, = plt.plot(x_axis, tasks_remaining, '--', color='#482ff7', zorder=5)
+
+    for index in np.flatnonzero(~np.isnan(tasks_remaining)):
+        plt.annotate('{:g}'.format(tasks_remaining[index]), xy=[index, tasks_remaining[index]], color='#482ff7', size=6, ha='center', va='bottom', textcoords="offset points", xytext=(2, 3))
+
+    plt.title(f"Portfolio Burndown Chart - {series['boards']} Boards")
+
+    plt.legend([p1, p2, p3, p4, p6], ["Ideal Tasks Remaining", "Tasks Remaining", "Stories/Defects Remaining", "Stories/Defects Done", "Team Size"], loc=1, borderaxespad=0, fontsize=6).get_frame().set_alpha(0.5)
+
+    plt.savefig(image_path, dpi=150)
+
+    # Release the figure, pyplot keeps every open figure alive across warm invocations
+    plt.close(f)
+
+
+# Delete previously attached Chart from the card
+@retry(tries=3, delay=11)
+def delete_chart(client, card_id):
+    """
+    Deletes already existing Sprint Burndown chart
+    :param client: Trello client Object
+    :param card_id: The ID of the Card
+    :return: returns None
+    """
+    card_attachments = client.fetch_json(
+        f"cards/{card_id}/attachments",
+        http_method="GET",
+        headers = {
+                "Accept": "application/json"
+            }
+    )
+    for card_attachment in card_attachments:
+        if current_date in card_attachment['name']:
+            client.fetch_json(
+                    f"cards/{card_id}/attachments/{card_attachment['id']}",
+                    http_method="DELETE",
+                    headers = {
+                            "Accept": "application/json"
+                    }
+                )
+
+
+# Attach Chart to the Card
+@retry(tries=3, delay=11)
+def attach_chart(client, card_id, board_id):
+    """
+    Attaches Sprint Burndown chart to a card
+    :param client: Trello client Object
+    :param card_id: The ID of the Card
+    :param board_id: The ID of the Board
+    :return: returns attachment response
+    """
+    image_path = '/tmp/' + current_date + '_Sprint_Burndown_Chart_' + board_id + '.png'
+    with open(image_path, 'rb') as image_file:
+        attachment_response = client.fetch_json(
+            f"cards/{card_id}/attachments",
+            http_method="POST",
+            files = {
+                'file': (current_date + '_Sprint_Burndown_Chart.png', image_file),
+            },
+            headers = {
+                    "Accept": "application/json"
+            }
+        )
+
+    # Delete Chart locally
+    os.remove(image_path)
+
+    return attachment_response
+
+
+# Read the PowerUp Data of a Board
+def board_settings(powerup_data):
+    """
+    Parses the PowerUp Data once into the settings used by the pipeline
+    :param powerup_data: PowerUp Data json string of the Board
+    :return: returns settings dict
+    """
+    powerup_data = json.loads(powerup_data)
+
+    team_members_days_ooo = powerup_data['team_members_days_ooo'].split(",")
+
+    return {
+        'sprint_start_day': powerup_data['sprint_start_day'],
+        'total_sprint_days': int(powerup_data['total_sprint_days']),
+        'monitor_lists': powerup_data['selected_list'],
+        'done_list': powerup_data['selected_done_list'],
+        'burndown_unit': powerup_data.get('burndown_unit', COUNT_UNIT),
+        'story_points_field': powerup_data.get('story_points_field'),
+        'team_members': powerup_data['team_member_list'],
+        'team_members_days_ooo': [float(ooo_per_day.split("-")[1]) for ooo_per_day in team_members_days_ooo],
+        'is_show_team_size': eval(powerup_data.get('is_show_team_size', 'False')),
+        'is_show_intraday': eval(powerup_data.get('is_show_intraday', 'False')),
+        'is_show_forecast': eval(powerup_data.get('is_show_forecast', 'False')),
+        'render_throttle_minutes': float(powerup_data.get('render_throttle_minutes') or RENDER_THROTTLE_MINUTES),
+        'attachment_card_id': powerup_data['selected_card_for_attachment']
+    }
+
+
+# Replace the Chart attached to the Card
+def publish_chart(client, board_id, settings, publish_mode=CHART_PUBLISH_MODE, s3=None):
+    """
+    Publishes the rendered Chart. In 's3' mode it is written to its stable S3 URL, otherwise
+    today's previously attached Chart is deleted and the rendered one attached to the Card
+    :param client: Trello client Object
+    :param board_id: The ID of the Board
+    :param settings: Board settings from board_settings()
+    :param publish_mode: 'attachment' or 's3'
+    :param s3: Boto3 S3 resource for 's3' mode
+    :return: returns attachment response, or the publish_chart_to_s3 result in 's3' mode
+    """
+    if publish_mode == S3_MODE:
+        image_path = '/tmp/' + current_date + '_Sprint_Burndown_Chart_' + board_id + '.png'
+        return publish_chart_to_s3(client, clients.s3() if s3 is None else s3, CHART_BUCKET, board_id, settings['attachment_card_id'], image_path, clients.parameter(CHART_KEY_SECRET_SSM_PARAMETER_KEY))
+
+    # Delete previously attached Chart from the card
+    delete_chart(client, settings['attachment_card_id'])
+
+    # Attach Chart to Card
+    return attach_chart(client, settings['attachment_card_id'], board_id)
+
+
+# Render and Attach Sprint Burndown Chart for a Render Job
+def render_sprint_chart(client, job, sprint_history, s3=None):
+    """
+    Renders the Sprint Burndown Chart from the stored Sprint Data and publishes it
+    :param client: Trello client Object
+    :param job: Render Job dict from render_queue.render_job()
+    :param sprint_history: SprintHistory of all Boards
+    :param s3: Boto3 S3 resource for the 's3' publish mode
+    :return: returns publish_chart response
+    """
+    board_id = job['board_id']
+    settings = board_settings(job['powerup_data'])
+
+    # Create Sprint Burndown Chart
+    with render_lock:
+        create_chart(sprint_history, settings['total_sprint_days'], board_id, settings['team_members'], settings['is_show_team_size'], settings['is_show_intraday'], settings['is_show_forecast'])
+
+    return publish_chart(client, board_id, settings, s3=s3)
+
+
+# Throttle the Chart publishes of a Board
+def is_publish_due(job, settings, render_queue=None):
+    """
+    Checks the render throttle of a Board. A suppressed render enqueues one trailing Render Job for the end of the
+    throttle window, so the latest counts are always published
+    :param job: Render Job dict from render_queue.render_job()
+    :param settings: Board settings from board_settings()
+    :param render_queue: RenderQueue the trailing Render Job is enqueued to, None when there is no Render Queue
+    :return: returns True when the Chart is rendered and published now
+    """
+    # Without a Render Queue no trailing render could publish the final counts, so the Chart is not throttled
+    if render_queue is None:
+        return True
+
+    def schedule_trailing(delay_seconds):
+        render_queue.enqueue(dict(job, trailing=True, enqueued_at=time.time()), delay_seconds)
+
+    return throttle.is_publish_due(job['board_id'], settings['render_throttle_minutes'], schedule_trailing, job.get('trailing', False))
+
+
+# Render and Publish the Organization rollup Chart
+def publish_rollup_chart(tenant, board_ids, sprint_history, s3):
+    """
+    Aggregates the current Sprints of the Boards of a tenant into one portfolio Chart and writes it to its stable
+    Chart Bucket URL, linked from the rollup Card of the tenant when one is set
+    :param tenant: Tenant of the Boards
+    :param board_ids: list of Board IDs, eg: the enabled Boards of the tenant
+    :param sprint_history: SprintHistory of the tenant
+    :param s3: Boto3 S3 resource
+    :return: returns publish_chart_to_s3 result, None when no Board has a current Sprint
+    """
+    series = rollup_series(sprint_history, board_ids, current_date)
+    if series is None:
+        return None
+
+    image_path = f'/tmp/{current_date}_Portfolio_Burndown_Chart_{tenant.organization_id}.png'
+    with render_lock:
+        create_rollup_chart(series, image_path)
+
+    client = RateLimitedClient(tenant.clients.trello(), tenant.rate_limiter) if tenant.rollup_card_id else None
+    return publish_chart_to_s3(client, s3, CHART_BUCKET, rollup_chart_id(tenant.organization_id), tenant.rollup_card_id, image_path, clients.parameter(CHART_KEY_SECRET_SSM_PARAMETER_KEY))
+
+
+class RateLimitedClient(object):
+    """
+    Trello client wrapper, every request waits for the shared RateLimiter
+    """
+
+    def __init__(self, client, rate_limiter):
+        self.client = client
+        self.rate_limiter = rate_limiter
+
+    def fetch_json(self, *args, **kwargs):
+        self.rate_limiter.acquire()
+        return self.client.fetch_json(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+# Run a function for many items on a thread pool
+def run_concurrently(function, items, max_workers=ENGINE_MAX_WORKERS):
+    """
+    Runs a function for every item concurrently, an error only fails its own item
+    :param function: Function called with one item
+    :param items: list of items
+    :param max_workers: Items in flight at the same time
+    :return: returns list of (item, result, error) tuples in the order of the items
+    """
+    def run(item):
+        try:
+            return item, function(item), None
+        except Exception as error:
+            return item, None, error
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(run, items))
+
+
+# Options of process_boards
+DEFAULT_OPTIONS = {
+    # Tenant the Boards belong to, its clients, PowerUp name, rate limit budget and S3 prefix are used.
+    # Defaults to the Organization of the deployment
+    'tenant': None,
+    # Trello client and S3 resource, default to the clients of the tenant
+    'client': None,
+    's3': None,
+    # SprintHistory to record into, downloaded from S3 when missing
+    'sprint_history': None,
+    # PowerUp Data json per Board ID, fetched for Boards missing from it
+    'powerup_data': {},
+    # 'inline' renders and attaches the charts, 'queue' enqueues Render Jobs, 'none' only records counts
+    'render': 'inline',
+    # Render Queue for 'queue', defaults to the SQS Render Queue
+    'render_queue': None,
+    # 'attachment' or 's3', see chart_publisher
+    'publish': CHART_PUBLISH_MODE,
+    # Throttle the Chart publishes of the Boards, the scheduled sweep publishes every Board it records
+    'throttle': True,
+    # Raise the first error instead of reporting failed Boards
+    'raise_errors': False,
+    'max_workers': ENGINE_MAX_WORKERS,
+    # RateLimiter shared by the Trello requests of the batch, defaults to the budget of the tenant
+    'rate_limiter': None,
+    # S3 key the Sprint History is uploaded to. A shard worker of a sweep uploads only its Boards to its own key
+    'history_key': None
+}
+
+
+# Process many Boards as one batch
+def process_boards(board_ids, options=None):
+    """
+    Records counts and publishes Sprint Burndown Charts for many Boards. Every stage runs once for
+    the whole batch: PowerUp Data and counts are fetched concurrently, the Sprint History is
+    downloaded and uploaded once, charts are rendered one at a time and attached concurrently.
+    :param board_ids: list of Board IDs
+    :param options: dict overriding DEFAULT_OPTIONS
+    :return: returns report dict with processed, skipped, rendered, enqueued and suppressed Board IDs and failed Board errors
+    """
+    options = dict(DEFAULT_OPTIONS, **(options or {}))
+    tenant = tenants.default_tenant if options['tenant'] is None else options['tenant']
+    client = tenant.clients.trello() if options['client'] is None else options['client']
+    rate_limiter = tenant.rate_limiter if options['rate_limiter'] is None else options['rate_limiter']
+    # A client already waiting for the same RateLimiter, eg: of a webhook, is not wrapped twice
+    if not (isinstance(client, RateLimitedClient) and client.rate_limiter is rate_limiter):
+        client = RateLimitedClient(client, rate_limiter)
+    s3 = tenant.clients.s3() if options['s3'] is None else options['s3']
+    max_workers = options['max_workers']
+
+    # Render Queue of the Render Jobs, and of the trailing renders of throttled Boards
+    render_queue = options['render_queue']
+    if render_queue is None and RENDER_QUEUE_URL and (options['render'] == 'queue' or options['throttle']):
+        render_queue = SqsRenderQueue(RENDER_QUEUE_URL, clients.sqs())
+    if options['render'] == 'queue' and render_queue is None:
+        raise ValueError('RENDER_QUEUE_URL value missing in Lambda Environment Variable, required by render \'queue\'')
+
+    report = {'boards': len(board_ids), 'processed': [], 'skipped': [], 'rendered': [], 'enqueued': [], 'suppressed': [], 'failed': {}}
+
+    def fail(board_id, error):
+        if options['raise_errors']:
+            raise error
+        print(f'{error}: Error processing the Trello Board - {board_id}')
+        report['failed'][board_id] = str(error)
+
+    # Get PowerUp Data of the Boards it was not given for
+    powerup_data = dict(options['powerup_data'])
+    missing_board_ids = [board_id for board_id in board_ids if board_id not in powerup_data]
+    for board_id, board_powerup_data, error in run_concurrently(lambda board_id: get_powerup_data(client, board_id, tenant.powerup_name), missing_board_ids, max_workers):
+        if error is not None:
+            fail(board_id, error)
+        else:
+            powerup_data[board_id] = board_powerup_data
+
+    settings = {}
+    for board_id in board_ids:
+        if board_id in report['failed']:
+            continue
+        # Check PowerUp Data exists
+        if powerup_data.get(board_id) is None:
+            report['skipped'].append(board_id)
+            continue
+        try:
+            settings[board_id] = board_settings(powerup_data[board_id])
+        except Exception as error:
+            fail(board_id, error)
+
+    # Get counts of Stories/Tasks
+    def board_counts(board_id):
+        return get_counts(client, board_id, settings[board_id]['monitor_lists'], settings[board_id]['done_list'], settings[board_id]['sprint_start_day'], settings[board_id]['burndown_unit'], settings[board_id]['story_points_field'])
+
+    # The Boards are counted on threads, their memory is measured for the whole batch
+    counts = {}
+    with memory.stage('counts'):
+        batch_counts = run_concurrently(board_counts, list(settings), max_workers)
+    for board_id, board_counts_result, error in batch_counts:
+        if error is not None:
+            fail(board_id, error)
+        else:
+            counts[board_id] = board_counts_result
+
+    if not counts:
+        return report
+
+    # Download Sprint History from S3
+    sprint_history = options['sprint_history']
+    if sprint_history is None:
+        with memory.stage('download_history'):
+            sprint_history = download_history(s3, DEPLOYMENT_BUCKET, prefix=tenant.prefix)
+
+    for board_id, (stories_defects_remaining, stories_defects_done, tasks_remaining, ideal_tasks_remaining) in counts.items():
+        board = settings[board_id]
+        try:
+            print(f'Board ID: {board_id}')
+            print(f'Stories Remaining: {stories_defects_remaining}')
+            print(f'Stories Done: {stories_defects_done}')
+            print(f'Tasks Remaining: {tasks_remaining}')
+            print(f'Ideal Tasks Remaining: {ideal_tasks_remaining}')
+
+            # Current Sprint Dates
+            sprint_dates = get_sprint_dates(board['sprint_start_day'], (board['total_sprint_days'] - 1), board_id, sprint_history)
+
+            print(f'Start Date: {sprint_dates[0]} End Date: {sprint_dates[len(sprint_dates)-1]}')
+
+            # Update sprint data
+            update_sprint_data(board['sprint_start_day'], board_id, sprint_dates, stories_defects_remaining, stories_defects_done, tasks_remaining, ideal_tasks_remaining, len(board['team_members']), board['team_members_days_ooo'], sprint_history)
+            report['processed'].append(board_id)
+        except Exception as error:
+            fail(board_id, error)
+
+    # Nothing was recorded, the downloaded Sprint History is not written back
+    if not report['processed']:
+        return report
+
+    # Upload Sprint History to S3 once, before rendering so a render failure does not lose the snapshots
+    with memory.stage('upload_history'):
+        if options['history_key'] is None:
+            upload_history(s3, DEPLOYMENT_BUCKET, sprint_history, key=history_key(tenant.prefix))
+        else:
+            upload_history(s3, DEPLOYMENT_BUCKET, sprint_history.subset(report['processed']), key=options['history_key'])
+
+    if options['render'] == 'queue':
+        # Enqueue Render Jobs for the render worker, which applies the render throttle
+        for board_id in report['processed']:
+            render_queue.enqueue(render_job(board_id, powerup_data[board_id], current_date, tenant.organization_id))
+            report['enqueued'].append(board_id)
+
+    elif options['render'] == 'inline':
+        # pyplot is not thread safe, charts are rendered one at a time
+        rendered = []
+        for board_id in report['processed']:
+            board = settings[board_id]
+            try:
+                # The counts are recorded already, a throttled Board only skips its Chart
+                if options['throttle'] and not is_publish_due(render_job(board_id, powerup_data[board_id], current_date, tenant.organization_id), board, render_queue):
+                    report['suppressed'].append(board_id)
+                    continue
+                with render_lock, memory.board(board_id), memory.stage('render', board_id):
+                    create_chart(sprint_history, board['total_sprint_days'], board_id, board['team_members'], board['is_show_team_size'], board['is_show_intraday'], board['is_show_forecast'])
+                rendered.append(board_id)
+            except Exception as error:
+                fail(board_id, error)
+
+        # Attach the rendered Charts, boto3 resources are not thread safe so every worker publishes with its own
+        def publish(board_id):
+            return publish_chart(client, board_id, settings[board_id], options['publish'], tenant.clients.s3() if options['s3'] is None else options['s3'])
+
+        for board_id, attachment_response, error in run_concurrently(publish, rendered, max_workers):
+            if error is not None:
+                fail(board_id, error)
+            else:
+                report['rendered'].append(board_id)
+
+    return report
+
+
+# Combine process_boards reports
+def merge_report(report, other):
+    """
+    Adds the Boards of a process_boards report to another report, eg: of one batch or shard of a sweep
+    :param report: Report dict updated in place
+    :param other: Report dict of process_boards
+    :return: returns the updated report
+    """
+    for key in ('processed', 'skipped', 'rendered', 'enqueued', 'suppressed'):
+        report.setdefault(key, []).extend(other.get(key, []))
+    report.setdefault('failed', {}).update(other['failed'])
+    return report
+
+
+# Success Status Method
+def success():
+    """
+    Success Status Method
+    :return: returns Success Status Code
+    """
+    return {"statusCode": 200}
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import re
+
+
+# Card name prefixes
+TASK_PREFIX = 'T '
+STORY_DEFECT_PREFIXES = ('U ', 'D ', 'C ')
+
+# Story points written in the card name. Eg: 'U Checkout page (5)'
+STORY_POINTS_PATTERN = re.compile(r'\((\d+(?:\.\d+)?)\)')
+
+# Burndown units from PowerUp Data
+COUNT_UNIT = 'count'
+POINTS_UNIT = 'points'
+
+
+# Classify a Card by its name
+def card_kind(name):
+    """
+    Classifies a Card by the prefix of its name
+    :param name: Card name. Eg: 'U As a user...' or 'T Write tests'
+    :return: returns 'task', 'story' for User Stories/Defects, or None
+    """
+    if name[:2] in TASK_PREFIX:
+        return 'task'
+    if name[:2] in STORY_DEFECT_PREFIXES:
+        return 'story'
+    return None
+
+
+# Story points of a Card
+def card_points(name, custom_field_items=None, story_points_field=None):
+    """
+    Gets the story points of a Card from its custom field, falling back to the name pattern
+    :param name: Card name
+    :param custom_field_items: customFieldItems of the Card returned with the cards request
+    :param story_points_field: ID of the number custom field holding story points
+    :return: returns story points, 0 for cards without an estimate
+    """
+    if story_points_field:
+        for custom_field_item in custom_field_items or []:
+            if custom_field_item.get('idCustomField') == story_points_field:
+                try:
+                    return float(custom_field_item.get('value', {}).get('number'))
+                except (TypeError, ValueError):
+                    break
+
+    match = STORY_POINTS_PATTERN.search(name)
+    if match:
+        return float(match.group(1))
+    return 0
+
+
+# Get all open Cards of a Board in one request
+def fetch_cards(client, board_id, unit=COUNT_UNIT):
+    """
+    Gets the open Cards of a Board, custom field values come back in the same request in points mode
+    :param client: Trello client Object
+    :param board_id: The ID of the Board
+    :param unit: Burndown unit, 'count' or 'points'
+    :return: returns list of card dicts with id, idList, name and customFieldItems in points mode
+    """
+    query_params = {
+        'fields': 'idList,name'
+    }
+    if unit == POINTS_UNIT:
+        query_params['customFieldItems'] = 'true'
+
+    return client.fetch_json(
+        f"boards/{board_id}/cards",
+        http_method="GET",
+        headers={
+            "Accept": "application/json"
+        },
+        query_params=query_params
+    )
+
+
+# Weigh Cards by the burndown unit
+def weighted_cards(cards, unit=COUNT_UNIT, story_points_field=None):
+    """
+    Pairs every card with its weight, 1 in count mode and its story points in points mode
+    :param cards: card dicts from fetch_cards
+    :param unit: Burndown unit, 'count' or 'points'
+    :param story_points_field: ID of the number custom field holding story points
+    :return: returns generator of (list ID, card name, weight) tuples
+    """
+    for card in cards:
+        if unit == POINTS_UNIT:
+            yield card['idList'], card['name'], card_points(card['name'], card.get('customFieldItems'), story_points_field)
+        else:
+            yield card['idList'], card['name'], 1
+
+
+# Count Stories and Tasks in the monitor and done lists
+def count_cards(cards, monitor_lists, done_list):
+    """
+    Sums Stories/Defects and Tasks in one pass over the cards
+    :param cards: Iterable of (list ID, card name, weight) tuples of open cards
+    :param monitor_lists: Trello monitor lists from PowerUp Data
+    :param done_list: Trello done list from PowerUp Data
+    :return: returns tuple of (stories_defects_remaining, stories_defects_done, tasks_remaining, tasks_done)
+    """
+    monitor_lists = set(monitor_lists)
+    stories_defects_remaining = 0
+    stories_defects_done = 0
+    tasks_remaining = 0
+    tasks_done = 0
+
+    for id_list, name, weight in cards:
+        if id_list in monitor_lists:
+            kind = card_kind(name)
+            if kind == 'task':
+                tasks_remaining += weight
+            elif kind == 'story':
+                stories_defects_remaining += weight
+        if id_list == done_list:
+            kind = card_kind(name)
+            if kind == 'task':
+                tasks_done += weight
+            elif kind == 'story':
+                stories_defects_done += weight
+
+    return stories_defects_remaining, stories_defects_done, tasks_remaining, tasks_done
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+from botocore.exceptions import ClientError
+from sprint_history import NOT_RECORDED, SprintHistory, to_date_strings, history_key, download_history
+from forecast import sprint_forecast
+
+
+# Seconds a container serves its copy of the Sprint History before checking the S3 ETag again
+CHART_DATA_REVALIDATE_SECONDS = float(os.getenv('CHART_DATA_REVALIDATE_SECONDS', '30'))
+
+# Seconds browsers may reuse the chart data without revalidating it
+CHART_DATA_CACHE_SECONDS = int(os.getenv('CHART_DATA_CACHE_SECONDS', '0'))
+
+# Get the Origin allowed to read the chart data, the Glitch URL of the Power-Up
+try:
+    CHART_DATA_ALLOWED_ORIGIN = os.getenv('CHART_DATA_ALLOWED_ORIGIN')
+except Exception:
+    print('CHART_DATA_ALLOWED_ORIGIN value missing in Lambda Environment Variable')
+
+
+# Shortest json number of a count
+def compact(value, digits=2):
+    """
+    Rounds a count, whole numbers are written without a fraction
+    :param value: Count as float
+    :param digits: Decimals kept
+    :return: returns int or float
+    """
+    value = round(value, digits)
+    return int(value) if value.is_integer() else value
+
+
+# Replace not recorded days with null
+def recorded(values):
+    """
+    Converts a day column to a list, days not recorded yet become None
+    :param values: Day column of the Sprint History
+    :return: returns list of numbers and None
+    """
+    return [None if value == NOT_RECORDED else compact(value) for value in np.asarray(values, dtype=float).tolist()]
+
+
+# Burndown series of the current Sprint of a Board
+def chart_series(sprint_history, board_id):
+    """
+    Gets the series the Sprint Burndown Chart is drawn from, the ideal line starts one point before the first day like the Chart.
+    The forecast projections are aligned with the dates
+    :param sprint_history: SprintHistory of all Boards
+    :param board_id: The ID of the Board
+    :return: returns series dict, None when the Board has no Sprint
+    """
+    sprint, days = sprint_history.current_sprint(board_id)
+    if sprint is None:
+        return None
+
+    ideal_tasks_remaining = float(sprint['ideal_tasks_remaining'])
+    total_sprint_days = len(days)
+
+    return {
+        'board_id': board_id,
+        'dates': to_date_strings(days['date']),
+        'stories_defects_remaining': recorded(days['stories_defects_remaining']),
+        'stories_defects_done': recorded(days['stories_defects_done']),
+        'tasks_remaining': recorded(days['tasks_remaining']),
+        'ideal_tasks_remaining': compact(ideal_tasks_remaining),
+        'ideal': [compact(ideal_tasks_remaining * (total_sprint_days - index) / total_sprint_days) for index in range(total_sprint_days + 1)],
+        'team_size': recorded(days['team_size']),
+        'days_ooo': [compact(days_ooo) for days_ooo in days['days_ooo'].astype(float).tolist()],
+        'forecast': sprint_forecast(sprint_history, board_id)
+    }
+
+
+# Entity tag of a response body
+def entity_tag(body):
+    """
+    Gets the strong ETag of a response body
+    :param body: Response body string
+    :return: returns quoted ETag
+    """
+    return '"' + hashlib.md5(body.encode()).hexdigest() + '"'
+
+
+# Compare the ETag with an If-None-Match header
+def etag_matches(etag, if_none_match):
+    """
+    Checks a conditional GET, weak validators match as allowed for GET requests
+    :param etag: Current ETag
+    :param if_none_match: If-None-Match request header
+    :return: returns True when the client copy is current
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+
+class ChartDataStore(object):
+    """
+    Serves chart data from the Sprint History, downloaded again only when its S3 ETag changes
+    """
+
+    def __init__(self, bucket, revalidate_seconds=CHART_DATA_REVALIDATE_SECONDS, prefix=''):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.revalidate_seconds = revalidate_seconds
+        self.history = SprintHistory()
+        self.history_etag = None
+        self.checked_at = None
+        self.bodies = {}
+        self.lock = threading.Lock()
+        self.stats = {'history_checks': 0, 'history_downloads': 0}
+
+    def history_version(self, s3):
+        """
+        Reads the ETag of the Sprint History object
+        :param s3: Boto3 S3 resource
+        :return: returns ETag, None when no Sprint History exists
+        """
+        self.stats['history_checks'] += 1
+        history_object = s3.Object(self.bucket, history_key(self.prefix))
+        try:
+            history_object.load()
+        except ClientError as error:
+            if error.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return history_object.e_tag
+
+    def refresh(self, s3):
+        """
+        Checks the Sprint History at most every revalidate_seconds and downloads it when it changed
+        :param s3: Boto3 S3 resource
+        :return: returns nothing
+        """
+        with self.lock:
+            if self.checked_at is not None and time.time() - self.checked_at < self.revalidate_seconds:
+                return
+            history_etag = self.history_version(s3)
+            if self.checked_at is None or history_etag != self.history_etag:
+                self.stats['history_downloads'] += 1
+                self.history = download_history(s3, self.bucket, prefix=self.prefix) if history_etag is not None else SprintHistory()
+                self.history_etag = history_etag
+                self.bodies = {}
+            self.checked_at = time.time()
+
+    def chart_data(self, s3, board_id):
+        """
+        Gets the compact json chart data of a Board and its ETag, serialised once per Sprint History version
+        :param s3: Boto3 S3 resource
+        :param board_id: The ID of the Board
+        :return: returns tuple of (body, etag), (None, None) when the Board has no Sprint
+        """
+        self.refresh(s3)
+        bodies = self.bodies
+        if board_id not in bodies:
+            series = chart_series(self.history, board_id)
+            if series is None:
+                return None, None
+            body = json.dumps(series, separators=(',', ':'))
+            bodies[board_id] = (body, entity_tag(body))
+        return bodies[board_id]
+
+
+# CORS headers of the chart data responses
+def cors_headers():
+    """
+    Allows the Power-Up to read the responses, no Origin is allowed when CHART_DATA_ALLOWED_ORIGIN is not set
+    :return: returns dict of headers
+    """
+    return {'Access-Control-Allow-Origin': CHART_DATA_ALLOWED_ORIGIN} if CHART_DATA_ALLOWED_ORIGIN else {}
+
+
+# Error response of the chart data endpoint
+def error_response(status_code, error):
+    """
+    Builds an API Gateway proxy error response
+    :param status_code: HTTP status code
+    :param error: Error message
+    :return: returns API Gateway proxy response dict
+    """
+    return {'statusCode': status_code, 'headers': cors_headers(), 'body': json.dumps({'error': error})}
+
+
+# API Gateway response of the chart data endpoint
+def chart_data_response(store, s3, board_id, if_none_match=None):
+    """
+    Answers a chart data request, 304 when the If-None-Match header holds the current ETag
+    :param store: ChartDataStore of this container
+    :param s3: Boto3 S3 resource
+    :param board_id: The ID of the Board
+    :param if_none_match: If-None-Match request header
+    :return: returns API Gateway proxy response dict
+    """
+    headers = cors_headers()
+    headers['Access-Control-Expose-Headers'] = 'ETag'
+    # Responses depend on the Authorization header, shared caches must not serve them
+    headers['Cache-Control'] = f'private, max-age={CHART_DATA_CACHE_SECONDS}, must-revalidate'
+    if not board_id:
+        return error_response(400, 'board_id is required')
+
+    body, etag = store.chart_data(s3, board_id)
+    if body is None:
+        return error_response(404, f'No Sprint for the Trello Board - {board_id}')
+
+    headers['ETag'] = etag
+    if etag_matches(etag, if_none_match):
+        return {'statusCode': 304, 'headers': headers, 'body': ''}
+
+    headers['Content-Type'] = 'application/json'
+    return {'statusCode': 200, 'headers': headers, 'body': body}
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import requests
+
+
+# Get the Trello API Key of the Power-Up, the appKey its REST API client authorizes members with
+try:
+    CHART_DATA_TRELLO_APP_KEY = os.getenv('CHART_DATA_TRELLO_APP_KEY')
+except Exception:
+    print('CHART_DATA_TRELLO_APP_KEY value missing in Lambda Environment Variable')
+
+# Seconds a container trusts that a member token can read a Board before asking Trello again
+CHART_DATA_AUTH_TTL_SECONDS = float(os.getenv('CHART_DATA_AUTH_TTL_SECONDS', '300'))
+
+# Member token and Board pairs a container remembers, the least recently used are dropped
+CHART_DATA_AUTH_CACHE_SIZE = int(os.getenv('CHART_DATA_AUTH_CACHE_SIZE', '10000'))
+
+TRELLO_BOARD_URL = 'https://api.trello.com/1/boards/{board_id}'
+
+
+# Bearer token of an Authorization header
+def bearer_token(authorization):
+    """
+    Gets the token of an Authorization header
+    :param authorization: Authorization request header. Eg: Bearer 5eb...
+    :return: returns token, None when the header is missing or not a Bearer token
+    """
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    return token.strip()
+
+
+class TrelloBoardAccess(object):
+    """
+    Verifies that the member a Trello token belongs to can read a Board, by reading the Board with that token.
+    Answers are cached per token and Board, so that a popup polling the chart data asks Trello once per TTL
+    """
+
+    def __init__(self, app_key=CHART_DATA_TRELLO_APP_KEY, session=None, ttl_seconds=CHART_DATA_AUTH_TTL_SECONDS, cache_size=CHART_DATA_AUTH_CACHE_SIZE, clock=time.time):
+        self.app_key = app_key
+        self.session = session
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self.clock = clock
+        # (token digest, Board ID) -> (Organization ID or None, checked at)
+        self.organizations = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'checks': 0, 'trello_requests': 0, 'denied': 0}
+
+    def fetch_organization(self, token, board_id):
+        """
+        Reads the Organization of a Board with the member token
+        :param token: Trello token of the member
+        :param board_id: The ID of the Board
+        :return: returns Organization ID, None when the token cannot read the Board
+        """
+        if self.session is None:
+            self.session = requests.Session()
+        response = self.session.get(
+            TRELLO_BOARD_URL.format(board_id=board_id),
+            params={'fields': 'idOrganization', 'key': self.app_key, 'token': token},
+            timeout=5
+        )
+        if response.status_code in (400, 401, 403, 404):
+            return None
+        response.raise_for_status()
+        return response.json().get('idOrganization')
+
+    def board_organization(self, token, board_id):
+        """
+        Gets the Organization of a Board the token can read
+        :param token: Trello token of the member
+        :param board_id: The ID of the Board
+        :return: returns Organization ID, None when the token cannot read the Board
+        """
+        if not self.app_key:
+            raise ValueError('CHART_DATA_TRELLO_APP_KEY value missing in Lambda Environment Variable')
+
+        # Tokens are only kept as digests
+        key = (hashlib.sha256(token.encode()).hexdigest(), board_id)
+        now = self.clock()
+        with self.lock:
+            self.stats['checks'] += 1
+            cached = self.organizations.get(key)
+            if cached is not None and now - cached[1] < self.ttl_seconds:
+                self.organizations.move_to_end(key)
+                return cached[0]
+
+        organization_id = self.fetch_organization(token, board_id)
+        with self.lock:
+            self.stats['trello_requests'] += 1
+            self.organizations[key] = (organization_id, now)
+            self.organizations.move_to_end(key)
+            while len(self.organizations) > self.cache_size:
+                self.organizations.popitem(last=False)
+        return organization_id
+
+    def can_read(self, token, board_id, organization_id):
+        """
+        Checks that the token can read a Board of the Organization
+        :param token: Trello token of the member, None when the request had none
+        :param board_id: The ID of the Board
+        :param organization_id: Trello Organization ID of the tenant that is read
+        :return: returns True when the Board belongs to the Organization and the member can read it
+        """
+        allowed = bool(token) and bool(board_id) and self.board_organization(token, board_id) == organization_id
+        if not allowed:
+            with self.lock:
+                self.stats['denied'] += 1
+        return allowed
+
+    def report(self):
+        with self.lock:
+            return dict(self.stats, cached=len(self.organizations))
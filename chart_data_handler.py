@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+from client_registry import ClientRegistry
+from chart_data import ChartDataStore, chart_data_response, error_response
+from chart_data_auth import TrelloBoardAccess, bearer_token
+from tenants import ORGANIZATION_ID_PATTERN, TenantRegistry, UnknownTenant
+
+
+try:
+    DEPLOYMENT_BUCKET = os.getenv('DEPLOYMENT_BUCKET')
+except Exception:
+    print('Deployment Bucket Name value missing in Lambda Environment Variable')
+
+# S3 and SSM clients shared by warm invocations, kept apart from handler.py so that matplotlib is never loaded
+clients = ClientRegistry(None, None)
+
+# Organizations served by the deployment, only their Sprint Histories are read
+tenants = TenantRegistry(clients, None)
+
+# Member tokens checked against Trello, shared by warm invocations
+board_access = TrelloBoardAccess()
+
+# Sprint History and serialised chart data of every configured tenant, shared by warm invocations
+stores = {}
+
+
+# Read a request header regardless of its case
+def request_header(event, name):
+    """
+    Gets a request header from an API Gateway proxy event
+    :param event: API Gateway proxy event
+    :param name: Header name. Eg: If-None-Match
+    :return: returns header value, None when missing
+    """
+    for header, value in (event.get('headers') or {}).items():
+        if header.lower() == name.lower():
+            return value
+    return None
+
+
+# Chart data store of a tenant
+def tenant_store(tenant):
+    """
+    Gets the ChartDataStore of a tenant, created on first use. Stores of Organizations removed from the tenant config are dropped
+    :param tenant: Tenant whose Sprint History is read
+    :return: returns ChartDataStore
+    """
+    configured = {configured_tenant.prefix for configured_tenant in tenants.all()}
+    for prefix in [prefix for prefix in stores if prefix not in configured]:
+        del stores[prefix]
+    if tenant.prefix not in stores:
+        stores[tenant.prefix] = ChartDataStore(DEPLOYMENT_BUCKET, prefix=tenant.prefix)
+    return stores[tenant.prefix]
+
+
+def chartData(event, context):
+    """
+    HTTP endpoint returning the Sprint Burndown series of a Board as json, so that the Power-Up draws the Chart in the browser.
+    The caller sends the Trello token of the member, the Board must belong to the tenant and the member must be able to read it
+    :param event: API Gateway proxy event of GET /boards/{board_id}/chart-data?tenant={organization_id} with an Authorization: Bearer {token} header
+    :param context: This object provides methods and properties that provide information about the invocation, function and execution environment
+    :return: returns 200 with the chart data, 304 when the If-None-Match header is current, 401 without a token,
+    403 when the token cannot read the Board of the tenant or 404 for unknown tenants and Boards without a Sprint
+    """
+    board_id = (event.get('pathParameters') or {}).get('board_id')
+    organization_id = (event.get('queryStringParameters') or {}).get('tenant')
+
+    # The tenant makes up the S3 prefix that is read, only Organization IDs are accepted
+    if organization_id and not ORGANIZATION_ID_PATTERN.match(organization_id):
+        return error_response(400, 'tenant is not a Trello Organization ID')
+
+    try:
+        tenant = tenants.get(organization_id)
+    except UnknownTenant as error:
+        return error_response(404, str(error))
+
+    token = bearer_token(request_header(event, 'Authorization'))
+    if token is None:
+        return error_response(401, 'Authorization Bearer token of the Trello member is required')
+    if not board_access.can_read(token, board_id, tenant.organization_id):
+        return error_response(403, f'The Trello token cannot read the Board {board_id} of the Organization')
+
+    return chart_data_response(tenant_store(tenant), clients.s3(), board_id, request_header(event, 'If-None-Match'))
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import hmac
+import hashlib
+from botocore.exceptions import ClientError
+
+
+# 'attachment' re-uploads the Chart to the Card, 's3' writes it to a stable S3 URL linked from the Card once
+CHART_PUBLISH_MODE = os.getenv('CHART_PUBLISH_MODE', 'attachment')
+
+# Get the Chart Bucket Settings
+try:
+    CHART_BUCKET = os.getenv('CHART_BUCKET')
+except Exception:
+    print('CHART_BUCKET value missing in Lambda Environment Variable')
+
+# Public base URL of the Charts, the CloudFront distribution in front of the private Chart Bucket
+CHART_BASE_URL = os.getenv('CHART_BASE_URL')
+
+# SSM SecureString Parameter of the secret the Chart keys are derived from, so that a Chart URL cannot be guessed
+# from the Board ID. It is only read in 's3' mode
+CHART_KEY_SECRET_SSM_PARAMETER_KEY = os.getenv('CHART_KEY_SECRET_SSM_PARAMETER_KEY', '/Serverless/Trello/ChartKeySecret')
+
+# Seconds browsers and Trello previews may cache a Chart
+CHART_CACHE_SECONDS = int(os.getenv('CHART_CACHE_SECONDS', '300'))
+
+# Object metadata recording the Card the Chart link is attached to
+ATTACHED_CARD_METADATA = 'attached-card'
+
+ATTACHMENT_MODE = 'attachment'
+S3_MODE = 's3'
+
+
+# Stable S3 key of a Board Chart
+def chart_key(board_id, secret):
+    """
+    Gets the stable S3 key of the Chart of a Board, its path carries an HMAC of the Board ID
+    :param board_id: The ID of the Board
+    :param secret: Secret the key is derived from, the value of CHART_KEY_SECRET_SSM_PARAMETER_KEY
+    :return: returns S3 key
+    """
+    if not secret:
+        raise ValueError(f'Chart key secret {CHART_KEY_SECRET_SSM_PARAMETER_KEY} missing in Parameter Store')
+    digest = hmac.new(secret.encode(), board_id.encode(), hashlib.sha256).hexdigest()[:32]
+    return f'charts/{board_id}/{digest}/sprint_burndown_chart.png'
+
+
+# Public URL of a Board Chart
+def chart_url(board_id, secret, base_url=CHART_BASE_URL):
+    """
+    Gets the stable URL the Chart of a Board is served from
+    :param board_id: The ID of the Board
+    :param secret: Secret the key is derived from
+    :param base_url: Public base URL of the Charts
+    :return: returns Chart URL
+    """
+    if not base_url:
+        raise ValueError('CHART_BASE_URL value missing in Lambda Environment Variable')
+    return f'{base_url.rstrip("/")}/{chart_key(board_id, secret)}'
+
+
+# Get the Card the Chart link is attached to
+def attached_card(s3, bucket, board_id, secret):
+    """
+    Reads the Card ID recorded on the published Chart
+    :param s3: Boto3 S3 resource
+    :param bucket: Chart Bucket name
+    :param board_id: The ID of the Board
+    :param secret: Secret the key is derived from
+    :return: returns Card ID, None when the Chart was never published
+    """
+    chart = s3.Object(bucket, chart_key(board_id, secret))
+    try:
+        chart.load()
+    except ClientError as error:
+        if error.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+    return chart.metadata.get(ATTACHED_CARD_METADATA)
+
+
+# Attach the Chart URL to the Card
+def attach_chart_link(client, card_id, url):
+    """
+    Attaches the stable Chart URL to a card
+    :param client: Trello client Object
+    :param card_id: The ID of the Card
+    :param url: Chart URL
+    :return: returns attachment response
+    """
+    return client.fetch_json(
+        f"cards/{card_id}/attachments",
+        http_method="POST",
+        headers={
+            "Accept": "application/json"
+        },
+        post_args={
+            'url': url,
+            'name': 'Sprint Burndown Chart'
+        }
+    )
+
+
+# Publish a Chart to its stable S3 URL
+def publish_chart_to_s3(client, s3, bucket, board_id, card_id, image_path, secret, base_url=CHART_BASE_URL):
+    """
+    Writes the Chart over its stable S3 key, the link is only attached to the Card the first time
+    or when the Card changes, so that later renders make no Trello requests
+    :param client: Trello client Object
+    :param s3: Boto3 S3 resource
+    :param bucket: Chart Bucket name
+    :param board_id: The ID of the Board
+    :param card_id: The ID of the Card the Chart is linked from, None to publish without a link
+    :param image_path: Rendered Chart png
+    :param secret: Secret the key is derived from
+    :param base_url: Public base URL of the Charts
+    :return: returns dict of url, version_id and the Trello requests made
+    """
+    url = chart_url(board_id, secret, base_url)
+    trello_requests = 0
+
+    # The link is attached before the object records it, a failed attach is retried on the next render
+    if card_id is not None and attached_card(s3, bucket, board_id, secret) != card_id:
+        attach_chart_link(client, card_id, url)
+        trello_requests += 1
+
+    with open(image_path, 'rb') as image_file:
+        response = s3.Object(bucket, chart_key(board_id, secret)).put(
+            Body=image_file,
+            ContentType='image/png',
+            CacheControl=f'public, max-age={CHART_CACHE_SECONDS}',
+            Metadata={ATTACHED_CARD_METADATA: card_id} if card_id is not None else {}
+        )
+
+    # Delete Chart locally
+    os.remove(image_path)
+
+    return {'url': url, 'version_id': response.get('VersionId'), 'trello_requests': trello_requests}
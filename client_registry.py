@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import time
+import threading
+import boto3
+import requests
+from botocore.config import Config
+from requests.adapters import HTTPAdapter
+from trello import TrelloClient, Unauthorized
+
+
+# Seconds between checks of the SSM credentials for a rotation
+CLIENT_CREDENTIALS_TTL_SECONDS = float(os.getenv('CLIENT_CREDENTIALS_TTL_SECONDS', '300'))
+
+# Pooled connections kept open per host
+CLIENT_POOL_SIZE = int(os.getenv('CLIENT_POOL_SIZE', '10'))
+
+# Seconds the Trello client may sit idle before it is checked with a request, 0 disables the check
+CLIENT_HEALTH_CHECK_SECONDS = float(os.getenv('CLIENT_HEALTH_CHECK_SECONDS', '300'))
+
+# Seconds to wait for a synchronously invoked Lambda function, the longest Lambda timeout
+LAMBDA_READ_TIMEOUT_SECONDS = 900
+
+# Guards the AWS clients shared by the registries of every tenant, batches create them from worker threads
+aws_clients_lock = threading.Lock()
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that reports how often pooled connections are reused
+    """
+
+    def connection_stats(self):
+        """
+        Sums the urllib3 pool counters of every host
+        :return: returns dict of requests, connections opened and connections reused
+        """
+        stats = {'requests': 0, 'connections': 0}
+        for key in list(self.poolmanager.pools.keys()):
+            pool = self.poolmanager.pools[key]
+            stats['requests'] += pool.num_requests
+            stats['connections'] += pool.num_connections
+        stats['reused'] = stats['requests'] - stats['connections']
+        return stats
+
+
+class ClientRegistry(object):
+    """
+    Creates the Trello client, AWS clients and their pooled sessions once per container.
+    boto3 clients are thread safe and shared, boto3 resources are not and are created once per thread
+    """
+
+    def __init__(self, api_key_parameter, token_parameter, credentials_ttl_seconds=CLIENT_CREDENTIALS_TTL_SECONDS, aws_clients=None, health_check_seconds=CLIENT_HEALTH_CHECK_SECONDS):
+        self.api_key_parameter = api_key_parameter
+        self.token_parameter = token_parameter
+        self.credentials_ttl_seconds = credentials_ttl_seconds
+        self.health_check_seconds = health_check_seconds
+        self.boto_config = Config(max_pool_connections=CLIENT_POOL_SIZE, retries={'max_attempts': 3})
+        # Registries of several tenants share one set of AWS clients, only the Trello credentials differ.
+        # A resource stored here, eg: a local fake, is shared by every thread
+        self.aws_clients = {} if aws_clients is None else aws_clients
+        with aws_clients_lock:
+            self.aws_clients.setdefault('thread_resources', threading.local())
+        self.lock = threading.RLock()
+        self.credentials = None
+        self.credentials_checked_at = 0
+        # SSM Parameter name -> (value, checked at)
+        self.parameters = {}
+        self.trello_client = None
+        self.trello_used_at = None
+        self.http_adapter = None
+        self.stats = {'trello_clients_created': 0, 'credential_checks': 0, 'credential_rotations': 0, 'health_checks': 0, 'health_check_failures': 0}
+
+    def aws(self, kind, service):
+        """
+        Gets a boto3 client or resource, created on first use
+        :param kind: 'client' or 'resource'
+        :param service: AWS service name. Eg: s3
+        :return: returns boto3 client shared by all threads, or boto3 resource of the calling thread
+        """
+        if (kind, service) in self.aws_clients:
+            return self.aws_clients[(kind, service)]
+
+        if kind == 'resource':
+            resources = self.aws_clients['thread_resources']
+            if not hasattr(resources, service):
+                # The default boto3 session is not thread safe, every thread builds its resource on its own session
+                setattr(resources, service, boto3.session.Session().resource(service, config=self.boto_config))
+            return getattr(resources, service)
+
+        with aws_clients_lock:
+            if (kind, service) not in self.aws_clients:
+                self.aws_clients[(kind, service)] = boto3.client(service, config=self.boto_config)
+        return self.aws_clients[(kind, service)]
+
+    def s3(self):
+        return self.aws('resource', 's3')
+
+    def ssm(self):
+        return self.aws('client', 'ssm')
+
+    def sqs(self):
+        return self.aws('client', 'sqs')
+
+    def lambda_client(self):
+        """
+        Gets the Lambda client, its read timeout outlasts a synchronous invocation of a worker
+        :return: returns boto3 Lambda client
+        """
+        with aws_clients_lock:
+            if ('client', 'lambda') not in self.aws_clients:
+                self.aws_clients[('client', 'lambda')] = boto3.client('lambda', config=self.boto_config.merge(Config(read_timeout=LAMBDA_READ_TIMEOUT_SECONDS, retries={'max_attempts': 0})))
+        return self.aws_clients[('client', 'lambda')]
+
+    def load_credentials(self):
+        """
+        Reads the Trello API Key and Token from SSM in one request
+        :return: returns tuple of (api_key, token)
+        """
+        self.stats['credential_checks'] += 1
+        parameters = self.ssm().get_parameters(
+            Names=[self.api_key_parameter, self.token_parameter],
+            WithDecryption=True
+        )['Parameters']
+        values = {parameter['Name']: parameter['Value'] for parameter in parameters}
+        return values[self.api_key_parameter], values[self.token_parameter]
+
+    def get_credentials(self):
+        """
+        Gets the Trello credentials, checking SSM again once they are older than the TTL
+        :return: returns tuple of (api_key, token)
+        """
+        with self.lock:
+            if self.credentials is None or time.time() - self.credentials_checked_at > self.credentials_ttl_seconds:
+                credentials = self.load_credentials()
+                self.credentials_checked_at = time.time()
+                if self.credentials is not None and credentials != self.credentials:
+                    # Rotated credentials, the Trello client is rebuilt with them
+                    self.stats['credential_rotations'] += 1
+                    self.trello_client = None
+                self.credentials = credentials
+            return self.credentials
+
+    def parameter(self, name):
+        """
+        Gets a SecureString Parameter other than the Trello credentials, checking SSM again once it is older than the TTL
+        :param name: SSM Parameter name. Eg: /Serverless/Trello/ChartKeySecret
+        :return: returns decrypted value
+        """
+        with self.lock:
+            cached = self.parameters.get(name)
+            if cached is None or time.time() - cached[1] > self.credentials_ttl_seconds:
+                response = self.ssm().get_parameters(Names=[name], WithDecryption=True)
+                if not response['Parameters']:
+                    raise ValueError(f'SSM Parameter {name} missing in Parameter Store')
+                cached = (response['Parameters'][0]['Value'], time.time())
+                self.parameters[name] = cached
+            return cached[0]
+
+    def api_key(self):
+        return self.get_credentials()[0]
+
+    def token(self):
+        return self.get_credentials()[1]
+
+    def http_session(self):
+        """
+        Creates a pooled requests Session
+        :return: returns requests Session
+        """
+        session = requests.Session()
+        self.http_adapter = CountingHTTPAdapter(pool_connections=CLIENT_POOL_SIZE, pool_maxsize=CLIENT_POOL_SIZE)
+        session.mount('https://', self.http_adapter)
+        return session
+
+    def is_healthy(self, trello_client):
+        """
+        Checks the Trello client and its pooled session with the cheapest authenticated request
+        :param trello_client: TrelloClient
+        :return: returns False when the credentials were rejected or the connection failed
+        """
+        self.stats['health_checks'] += 1
+        try:
+            trello_client.fetch_json('members/me', query_params={'fields': 'id'})
+            return True
+        except (Unauthorized, requests.exceptions.ConnectionError, requests.exceptions.Timeout) as error:
+            print(f'Trello client health check failed, rebuilding it - {error!r}')
+            self.stats['health_check_failures'] += 1
+            return False
+
+    def trello(self):
+        """
+        Gets the Trello client, sharing one pooled session across warm invocations. A client idle for longer than
+        health_check_seconds is checked first, and rebuilt on fresh credentials when the check fails
+        :return: returns TrelloClient
+        """
+        with self.lock:
+            if self.trello_client is not None and self.trello_used_at is not None and self.health_check_seconds and time.time() - self.trello_used_at > self.health_check_seconds:
+                if not self.is_healthy(self.trello_client):
+                    self.invalidate()
+
+            api_key, token = self.get_credentials()
+            if self.trello_client is None:
+                self.stats['trello_clients_created'] += 1
+                self.trello_client = TrelloClient(
+                    api_key=api_key,
+                    token=token,
+                    http_service=self.http_session()
+                )
+            self.trello_used_at = time.time()
+            return self.trello_client
+
+    def invalidate(self):
+        """
+        Drops the Trello client and credentials, eg: after an Unauthorized response
+        :return: returns nothing
+        """
+        with self.lock:
+            self.trello_client = None
+            self.credentials = None
+
+    def report(self):
+        """
+        Gets instrumentation of the registry and connection reuse
+        :return: returns stats dict
+        """
+        report = dict(self.stats)
+        if self.http_adapter is not None:
+            report['trello_connections'] = self.http_adapter.connection_stats()
+        return report
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import json
+import datetime
+import pytz
+from client_registry import ClientRegistry
+from sprint_history import download_history
+from history_export import CSV_FORMAT, download_watermark, upload_watermark, incremental_since, export_to_s3
+from tenants import ORGANIZATION_ID_PATTERN, tenant_prefix
+
+
+try:
+    DEPLOYMENT_BUCKET = os.getenv('DEPLOYMENT_BUCKET')
+except Exception:
+    print('Deployment Bucket Name value missing in Lambda Environment Variable')
+
+# S3 client shared by warm invocations, kept apart from handler.py so that matplotlib is never loaded
+clients = ClientRegistry(None, None)
+
+# Setting Time Zone to CST
+cst_timezone = pytz.timezone('US/Central')
+
+
+def exportSprintBurndown(event, context):
+    """
+    Exports the Sprint History for analytics, one row per Board and recorded day, to exports/ in the deployment bucket
+    :param event: Event data, optional 'format' 'csv', 'ndjson' or 'npz' (default csv), 'since' first date exported,
+                  'incremental' true to export the days recorded since the last incremental export and move its watermark forward,
+                  and 'tenant' Organization ID. Eg: {"format": "ndjson", "incremental": true}
+    :param context: This object provides methods and properties that provide information about the invocation, function and execution environment
+    :return: returns dict of key, rows, since, since_recorded_at, latest_date and latest_recorded_at
+    """
+    event = event or {}
+    organization_id = event.get('tenant')
+
+    # The tenant makes up the S3 prefix that is read, only Organization IDs are accepted
+    if organization_id and not ORGANIZATION_ID_PATTERN.match(organization_id):
+        raise ValueError(f'tenant {organization_id} is not a Trello Organization ID')
+    prefix = tenant_prefix(organization_id)
+
+    # S3 Client
+    s3 = clients.s3()
+
+    # Incremental exports select days by record time, so days backfilled or recorded again before the watermark
+    # date are exported as well. The overlap with the last export is exported again
+    since_date = None if event.get('incremental') else event.get('since')
+    since_recorded_at = incremental_since(download_watermark(s3, DEPLOYMENT_BUCKET, prefix)) if event.get('incremental') else None
+
+    export = export_to_s3(
+        s3,
+        DEPLOYMENT_BUCKET,
+        download_history(s3, DEPLOYMENT_BUCKET, prefix=prefix),
+        event.get('format', CSV_FORMAT),
+        since_date,
+        datetime.datetime.now(cst_timezone).strftime("%Y-%m-%d"),
+        prefix,
+        since_recorded_at=since_recorded_at
+    )
+
+    if event.get('incremental') and export['latest_recorded_at'] is not None:
+        upload_watermark(s3, DEPLOYMENT_BUCKET, export['latest_recorded_at'], export['latest_date'], prefix)
+
+    export['since'] = since_date
+    export['since_recorded_at'] = since_recorded_at
+    print(json.dumps(export))
+
+    return export
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import zlib
+import numpy as np
+from sprint_history import NOT_RECORDED, to_date_strings
+
+
+# Monte Carlo trials of the remaining days of a Sprint
+FORECAST_TRIALS = int(os.getenv('FORECAST_TRIALS', '1000'))
+
+# Share of the trials finishing by the late completion date, the early one is its complement
+FORECAST_CONFIDENCE = float(os.getenv('FORECAST_CONFIDENCE', '0.85'))
+
+# Past Sprints whose daily throughput is sampled along with the current Sprint
+FORECAST_SPRINTS = int(os.getenv('FORECAST_SPRINTS', '3'))
+
+# Business days after the latest recorded day a completion is looked for
+FORECAST_HORIZON_DAYS = int(os.getenv('FORECAST_HORIZON_DAYS', '60'))
+
+# Daily throughput samples needed before a forecast is made
+FORECAST_MIN_SAMPLES = 3
+
+
+# Daily throughput of recorded Sprints
+def daily_throughput(sprints, days):
+    """
+    Gets the Tasks burned per day between consecutive recorded days of the same Sprint, a gap spreads its burn over
+    its days. Days where Tasks were added come out negative, so scope growth slows the forecast down
+    :param sprints: Sprint rows of a Board
+    :param days: Day rows of a Board
+    :return: returns tuple of (throughput per recorded day pair, Sprint index of every pair)
+    """
+    sprint_lengths = sprints['total_sprint_days'].astype('<i4')
+    sprint_indexes = np.repeat(np.arange(len(sprints)), sprint_lengths)
+    day_rows = np.concatenate([np.arange(offset, offset + length) for offset, length in zip(sprints['offset'].tolist(), sprint_lengths.tolist())] or [np.zeros(0, dtype='<i4')])
+
+    recorded = days['tasks_remaining'][day_rows] != NOT_RECORDED
+    day_rows = day_rows[recorded]
+    sprint_indexes = sprint_indexes[recorded]
+
+    same_sprint = sprint_indexes[1:] == sprint_indexes[:-1]
+    tasks_remaining = days['tasks_remaining'][day_rows].astype(float)
+    throughput = (tasks_remaining[:-1] - tasks_remaining[1:]) / (day_rows[1:] - day_rows[:-1])
+    return throughput[same_sprint], sprint_indexes[1:][same_sprint]
+
+
+# Value of a sorted array at a quantile, without interpolating towards trials that never finish
+def quantile(sorted_values, share):
+    return sorted_values[min(len(sorted_values) - 1, int(share * len(sorted_values)))]
+
+
+# Completion forecast of the current Sprint of a Board
+def sprint_forecast(sprint_history, board_id, trials=FORECAST_TRIALS, confidence=FORECAST_CONFIDENCE, sprints=FORECAST_SPRINTS, horizon_days=FORECAST_HORIZON_DAYS):
+    """
+    Forecasts when the Tasks remaining in the current Sprint reach 0. The daily throughput of the current Sprint and
+    the last past Sprints is resampled for every remaining business day, in trials x days arrays
+    :param sprint_history: SprintHistory of the Board
+    :param board_id: The ID of the Board
+    :param trials: Monte Carlo trials
+    :param confidence: Share of the trials finishing by completion_date_late
+    :param sprints: Past Sprints sampled along with the current one
+    :param horizon_days: Business days after the latest recorded day a completion is looked for
+    :return: returns forecast dict, None without a recorded day or enough throughput samples
+    """
+    board_sprints, days = sprint_history.board(board_id)
+    if not len(board_sprints):
+        return None
+
+    current = len(board_sprints) - 1
+    sprint, sprint_days = sprint_history.current_sprint(board_id)
+    recorded = np.flatnonzero(sprint_days['tasks_remaining'] != NOT_RECORDED)
+    if not len(recorded):
+        return None
+
+    latest_index = int(recorded[-1])
+    latest_day = int(sprint_days['date'][latest_index])
+    tasks_remaining = float(sprint_days['tasks_remaining'][latest_index])
+
+    throughput, throughput_sprints = daily_throughput(board_sprints, days)
+    sampled = throughput_sprints >= current - sprints
+    samples = throughput[sampled]
+
+    # Rolling velocity is the mean daily throughput of the past Sprints, the burn rate the one of the current Sprint
+    past = sampled & (throughput_sprints < current)
+    velocity = float(throughput[past].mean()) if past.any() else None
+    burn_rate = float(throughput[throughput_sprints == current].mean()) if (throughput_sprints == current).any() else None
+
+    forecast = {
+        'velocity': None if velocity is None else round(velocity, 2),
+        'burn_rate': None if burn_rate is None else round(burn_rate, 2),
+        'tasks_remaining': tasks_remaining,
+        'confidence': confidence,
+        'completion_date': None,
+        'completion_date_early': None,
+        'completion_date_late': None,
+        'on_time_probability': None,
+        'projected_low': None,
+        'projected_median': None,
+        'projected_high': None
+    }
+
+    if tasks_remaining <= 0:
+        # Completed on the first day nothing was left
+        completed = to_date_strings(sprint_days['date'][recorded[sprint_days['tasks_remaining'][recorded] <= 0][:1]])[0]
+        forecast.update(completion_date=completed, completion_date_early=completed, completion_date_late=completed, on_time_probability=1.0)
+        return forecast
+    if len(samples) < FORECAST_MIN_SAMPLES:
+        return None
+
+    # The same history always gives the same forecast, so the chart data ETag only changes with the counts
+    random = np.random.RandomState(zlib.crc32(f'{board_id}{latest_day}{tasks_remaining}'.encode()))
+    burned = np.cumsum(samples[random.randint(0, len(samples), size=(trials, horizon_days))], axis=1)
+    remaining = np.maximum(tasks_remaining - burned, 0)
+
+    # Business days until every trial's remaining Tasks reach 0, trials that never get there stay at the horizon
+    finished = remaining <= 0
+    completion_days = np.where(finished.any(axis=1), finished.argmax(axis=1) + 1, np.inf)
+    completion_days.sort()
+
+    def completion_date(share):
+        business_days = quantile(completion_days, share)
+        if np.isinf(business_days):
+            return None
+        return to_date_strings([np.busday_offset(np.datetime64(latest_day, 'D'), int(business_days), roll='forward').astype('<i4')])[0]
+
+    sprint_days_left = len(sprint_days) - 1 - latest_index
+    forecast.update(
+        completion_date=completion_date(0.5),
+        completion_date_early=completion_date(1 - confidence),
+        completion_date_late=completion_date(confidence),
+        on_time_probability=round(float((completion_days <= sprint_days_left).mean()), 2)
+    )
+
+    # Remaining Tasks band over the rest of the Sprint, aligned with the Sprint days and starting at the latest recorded day
+    if sprint_days_left:
+        band = np.percentile(remaining[:, :sprint_days_left], [100 * (1 - confidence), 50, 100 * confidence], axis=0)
+        for name, values in zip(('projected_low', 'projected_median', 'projected_high'), band):
+            forecast[name] = [None] * latest_index + [tasks_remaining] + np.round(values, 2).tolist()
+
+    return forecast
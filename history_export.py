@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import sys
+import csv
+import json
+import uuid
+import shutil
+import zipfile
+import argparse
+import tempfile
+import numpy as np
+from botocore.exceptions import ClientError
+from sprint_history import NOT_RECORDED, SprintHistory, to_day, to_date_strings
+from chart_data import compact
+
+
+# S3 prefix of the exports and their watermark, below the prefix of the tenant
+EXPORT_PREFIX = 'exports/'
+
+# Watermark of the incremental exports, the latest record time exported so far
+EXPORT_WATERMARK_FILE_NAME = 'export_watermark.json'
+
+# Seconds before the watermark an incremental export starts from. A day is recorded before the Sprint History is
+# uploaded, a record that was still being uploaded during the last export is older than its watermark
+EXPORT_WATERMARK_OVERLAP_SECONDS = int(os.getenv('EXPORT_WATERMARK_OVERLAP_SECONDS', '900'))
+
+CSV_FORMAT = 'csv'
+NDJSON_FORMAT = 'ndjson'
+COLUMNAR_FORMAT = 'npz'
+
+EXPORT_FORMATS = (CSV_FORMAT, NDJSON_FORMAT, COLUMNAR_FORMAT)
+
+# One row per recorded day of every Sprint of a Board
+EXPORT_COLUMNS = [
+    'board_id',
+    'sprint_start_date',
+    'total_sprint_days',
+    'ideal_tasks_remaining',
+    'sprint_day',
+    'date',
+    'stories_defects_remaining',
+    'stories_defects_done',
+    'tasks_remaining',
+    'team_size',
+    'days_ooo',
+    'recorded_at'
+]
+
+# Columns of the columnar export, Board IDs are an index into the board_ids array of the file
+COLUMNAR_DTYPE = np.dtype([
+    ('board', '<i4'),
+    ('sprint_start_date', '<i4'),
+    ('total_sprint_days', '<i2'),
+    ('ideal_tasks_remaining', '<f4'),
+    ('sprint_day', '<i2'),
+    ('date', '<i4'),
+    ('stories_defects_remaining', '<f4'),
+    ('stories_defects_done', '<f4'),
+    ('tasks_remaining', '<f4'),
+    ('team_size', '<i2'),
+    ('days_ooo', '<f4'),
+    ('recorded_at', '<i8'),
+])
+
+
+# Recorded days of a Board as columns
+def board_columns(sprint_history, board_id, since_day=None, since_recorded_at=None):
+    """
+    Gets the recorded days of every Sprint of a Board, with the Sprint they belong to
+    :param sprint_history: SprintHistory
+    :param board_id: The ID of the Board
+    :param since_day: First day number exported, None for every day
+    :param since_recorded_at: Earliest Unix record time exported, None for every record
+    :return: returns structured array of COLUMNAR_DTYPE without the board column filled in
+    """
+    sprints, days = sprint_history.board(board_id)
+
+    # Sprints are consecutive slices of the day rows, starting at their offset
+    sprint_lengths = sprints['total_sprint_days'].astype('<i4')
+    sprint_rows = np.repeat(np.arange(len(sprints)), sprint_lengths)
+    day_rows = np.concatenate([np.arange(offset, offset + length) for offset, length in zip(sprints['offset'].tolist(), sprint_lengths.tolist())] or [np.zeros(0, dtype='<i4')])
+
+    keep = days['stories_defects_remaining'][day_rows] != NOT_RECORDED
+    if since_day is not None:
+        keep &= days['date'][day_rows] >= since_day
+    if since_recorded_at is not None:
+        keep &= days['recorded_at'][day_rows] >= since_recorded_at
+    sprint_rows = sprint_rows[keep]
+    day_rows = day_rows[keep]
+
+    columns = np.zeros(len(day_rows), dtype=COLUMNAR_DTYPE)
+    columns['sprint_start_date'] = sprints['start_date'][sprint_rows]
+    columns['total_sprint_days'] = sprints['total_sprint_days'][sprint_rows]
+    columns['ideal_tasks_remaining'] = sprints['ideal_tasks_remaining'][sprint_rows]
+    columns['sprint_day'] = day_rows - sprints['offset'][sprint_rows]
+    for name in ('date', 'stories_defects_remaining', 'stories_defects_done', 'tasks_remaining', 'team_size', 'days_ooo', 'recorded_at'):
+        columns[name] = days[name][day_rows]
+    return columns
+
+
+# Stream the rows of every Board
+def export_rows(sprint_history, since_date=None, board_ids=None, since_recorded_at=None):
+    """
+    Yields one row per Board and recorded day, only the rows of one Board are built at a time
+    :param sprint_history: SprintHistory
+    :param since_date: First date string exported, None for every day
+    :param board_ids: list of Board IDs, defaults to every Board of the Sprint History
+    :param since_recorded_at: Earliest Unix record time exported, None for every record. Eg: from the watermark of the last export
+    :return: returns generator of row dicts with EXPORT_COLUMNS
+    """
+    since_day = to_day(since_date) if since_date else None
+    for board_id in (sprint_history.board_ids() if board_ids is None else board_ids):
+        columns = board_columns(sprint_history, board_id, since_day, since_recorded_at)
+        for sprint_start_date, total_sprint_days, ideal_tasks_remaining, sprint_day, date, stories_defects_remaining, stories_defects_done, tasks_remaining, team_size, days_ooo, recorded_at in zip(
+                to_date_strings(columns['sprint_start_date']),
+                columns['total_sprint_days'].tolist(),
+                columns['ideal_tasks_remaining'].tolist(),
+                columns['sprint_day'].tolist(),
+                to_date_strings(columns['date']),
+                columns['stories_defects_remaining'].tolist(),
+                columns['stories_defects_done'].tolist(),
+                columns['tasks_remaining'].tolist(),
+                columns['team_size'].tolist(),
+                columns['days_ooo'].tolist(),
+                columns['recorded_at'].tolist()):
+            yield {
+                'board_id': board_id,
+                'sprint_start_date': sprint_start_date,
+                'total_sprint_days': total_sprint_days,
+                'ideal_tasks_remaining': compact(ideal_tasks_remaining),
+                'sprint_day': sprint_day,
+                'date': date,
+                'stories_defects_remaining': compact(stories_defects_remaining),
+                'stories_defects_done': compact(stories_defects_done),
+                'tasks_remaining': compact(tasks_remaining),
+                'team_size': None if team_size == NOT_RECORDED else team_size,
+                'days_ooo': compact(days_ooo),
+                # Days recorded before record times were kept have none
+                'recorded_at': None if recorded_at == NOT_RECORDED else recorded_at
+            }
+
+
+# Write the columnar export one Board at a time
+def write_columnar(sprint_history, output, board_ids, since_day=None, since_recorded_at=None, directory=None):
+    """
+    Writes a numpy npz file with one array per column without holding the columns of every Board: the columns of each
+    Board are appended to one temporary file per column, which are then copied into the npy members of the zip
+    :param sprint_history: SprintHistory
+    :param output: Writable binary file
+    :param board_ids: list of Board IDs
+    :param since_day: First day number exported, None for every day
+    :param since_recorded_at: Earliest Unix record time exported, None for every record
+    :param directory: Directory of the temporary column files, defaults to the system temporary directory
+    :return: returns tuple of (rows, latest day number, latest record time), None for the latest values without rows
+    """
+    rows = 0
+    latest_day = None
+    latest_recorded_at = None
+    with tempfile.TemporaryDirectory(dir=directory) as column_directory:
+        column_paths = {name: os.path.join(column_directory, f'{name}.bin') for name in COLUMNAR_DTYPE.names}
+        column_files = {name: open(path, 'wb') for name, path in column_paths.items()}
+        try:
+            for index, board_id in enumerate(board_ids):
+                columns = board_columns(sprint_history, board_id, since_day, since_recorded_at)
+                if not len(columns):
+                    continue
+                columns['board'] = index
+                for name, column_file in column_files.items():
+                    np.ascontiguousarray(columns[name]).tofile(column_file)
+                rows += len(columns)
+                latest_day = max(latest_day or 0, int(columns['date'].max()))
+                latest_recorded_at = max(latest_recorded_at or NOT_RECORDED, int(columns['recorded_at'].max()))
+        finally:
+            for column_file in column_files.values():
+                column_file.close()
+
+        # Same layout as numpy.savez_compressed, readable with numpy.load
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            with archive.open('board_ids.npy', 'w', force_zip64=True) as member:
+                np.lib.format.write_array(member, np.array(board_ids, dtype=str))
+            for name, path in column_paths.items():
+                with archive.open(f'{name}.npy', 'w', force_zip64=True) as member, open(path, 'rb') as column_file:
+                    np.lib.format.write_array_header_1_0(member, {'descr': np.lib.format.dtype_to_descr(COLUMNAR_DTYPE[name]), 'fortran_order': False, 'shape': (rows,)})
+                    shutil.copyfileobj(column_file, member)
+
+    return rows, latest_day, None if latest_recorded_at == NOT_RECORDED else latest_recorded_at
+
+
+# Write the export rows
+def write_export(sprint_history, output, export_format=CSV_FORMAT, since_date=None, board_ids=None, since_recorded_at=None, directory=None):
+    """
+    Writes the rows of every Board as they are built. The columnar format is a numpy npz file with one array per column
+    :param sprint_history: SprintHistory
+    :param output: Writable file, binary for the columnar format and text otherwise
+    :param export_format: 'csv', 'ndjson' or 'npz'
+    :param since_date: First date string exported, None for every day
+    :param board_ids: list of Board IDs, defaults to every Board of the Sprint History
+    :param since_recorded_at: Earliest Unix record time exported, None for every record
+    :param directory: Directory of the temporary column files of the columnar format
+    :return: returns dict of rows exported, the latest date and the latest record time exported, None without rows
+    """
+    rows = 0
+    latest_date = None
+    latest_recorded_at = None
+
+    if export_format == COLUMNAR_FORMAT:
+        board_ids = sprint_history.board_ids() if board_ids is None else board_ids
+        rows, latest_day, latest_recorded_at = write_columnar(sprint_history, output, board_ids, to_day(since_date) if since_date else None, since_recorded_at, directory)
+        latest_date = to_date_strings([latest_day])[0] if rows else None
+    elif export_format in (CSV_FORMAT, NDJSON_FORMAT):
+        writer = csv.DictWriter(output, EXPORT_COLUMNS, lineterminator='\n') if export_format == CSV_FORMAT else None
+        if writer is not None:
+            writer.writeheader()
+        for row in export_rows(sprint_history, since_date, board_ids, since_recorded_at):
+            if writer is not None:
+                writer.writerow(row)
+            else:
+                output.write(json.dumps(row) + '\n')
+            rows += 1
+            # Date strings sort like the dates they hold
+            latest_date = max(latest_date or row['date'], row['date'])
+            if row['recorded_at'] is not None:
+                latest_recorded_at = max(latest_recorded_at or row['recorded_at'], row['recorded_at'])
+    else:
+        raise ValueError(f'Export format {export_format} is not one of {", ".join(EXPORT_FORMATS)}')
+
+    return {'rows': rows, 'latest_date': latest_date, 'latest_recorded_at': latest_recorded_at}
+
+
+# S3 key of the export watermark of a tenant
+def watermark_key(prefix=''):
+    return f'{prefix}{EXPORT_PREFIX}{EXPORT_WATERMARK_FILE_NAME}'
+
+
+# Download the Export Watermark
+def download_watermark(s3, bucket, prefix=''):
+    """
+    Reads the latest record time of the last incremental export
+    :param s3: Boto3 S3 resource
+    :param bucket: S3 Bucket name
+    :param prefix: S3 prefix of the tenant, see tenants.tenant_prefix
+    :return: returns Unix time, None before the first export or when the last one kept the latest date only
+    """
+    try:
+        return json.loads(s3.Object(bucket, watermark_key(prefix)).get()['Body'].read()).get('latest_recorded_at')
+    except ClientError as error:
+        if error.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+
+
+# Upload the Export Watermark
+def upload_watermark(s3, bucket, latest_recorded_at, latest_date, prefix=''):
+    """
+    Writes the latest record time of an incremental export
+    :param s3: Boto3 S3 resource
+    :param bucket: S3 Bucket name
+    :param latest_recorded_at: Latest Unix record time exported
+    :param latest_date: Latest date string exported, kept for reference
+    :param prefix: S3 prefix of the tenant, see tenants.tenant_prefix
+    :return: returns nothing
+    """
+    s3.Object(bucket, watermark_key(prefix)).put(Body=json.dumps({'latest_recorded_at': latest_recorded_at, 'latest_date': latest_date}).encode())
+
+
+# First record time of an incremental export
+def incremental_since(watermark, overlap_seconds=EXPORT_WATERMARK_OVERLAP_SECONDS):
+    """
+    Gets the earliest record time an incremental export starts from, overlapping the last export
+    :param watermark: Latest record time of the last incremental export, None before the first
+    :param overlap_seconds: Seconds before the watermark exported again
+    :return: returns Unix time, None for a full export
+    """
+    return None if watermark is None else watermark - overlap_seconds
+
+
+# Export the Sprint History to S3
+def export_to_s3(s3, bucket, sprint_history, export_format=CSV_FORMAT, since_date=None, as_of_date=None, prefix='', directory='/tmp/', since_recorded_at=None):
+    """
+    Writes the export to a local file as the rows are built and uploads it
+    :param s3: Boto3 S3 resource
+    :param bucket: S3 Bucket name
+    :param sprint_history: SprintHistory
+    :param export_format: 'csv', 'ndjson' or 'npz'
+    :param since_date: First date string exported, None for every day
+    :param as_of_date: Date string of the export used in its key. Eg: today
+    :param prefix: S3 prefix of the tenant, see tenants.tenant_prefix
+    :param directory: Local directory for the export file
+    :param since_recorded_at: Earliest Unix record time exported, None for every record
+    :return: returns dict of key, rows, latest_date and latest_recorded_at
+    """
+    since = since_date or (f'recorded_{since_recorded_at}' if since_recorded_at is not None else 'full')
+    key = f'{prefix}{EXPORT_PREFIX}sprint_history_{since}_{as_of_date}.{export_format}'
+    path = directory + uuid.uuid4().hex + '_' + os.path.basename(key)
+    try:
+        with (open(path, 'wb') if export_format == COLUMNAR_FORMAT else open(path, 'w', newline='')) as export_file:
+            export = write_export(sprint_history, export_file, export_format, since_date, since_recorded_at=since_recorded_at, directory=directory)
+        s3.Bucket(bucket).upload_file(path, key)
+    finally:
+        if os.path.isfile(path):
+            os.remove(path)
+    return dict(export, key=key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exports a Sprint History file, one row per Board and recorded day')
+    parser.add_argument('history', help='Path of a sprint_history.npz file')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default=CSV_FORMAT)
+    parser.add_argument('--since', help='First date exported')
+    parser.add_argument('--since-recorded-at', type=int, help='Earliest Unix record time exported, eg: the latest_recorded_at of the last export')
+    parser.add_argument('--output', help='Output file, defaults to stdout for csv and ndjson')
+    args = parser.parse_args()
+
+    if args.format == COLUMNAR_FORMAT and not args.output:
+        parser.error('--output is required for the npz format')
+
+    sprint_history = SprintHistory.load(args.history)
+    if args.output:
+        with (open(args.output, 'wb') if args.format == COLUMNAR_FORMAT else open(args.output, 'w', newline='')) as output:
+            export = write_export(sprint_history, output, args.format, args.since, since_recorded_at=args.since_recorded_at)
+    else:
+        export = write_export(sprint_history, sys.stdout, args.format, args.since, since_recorded_at=args.since_recorded_at)
+    print(json.dumps(export), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
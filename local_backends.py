@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import io
+import time
+import uuid
+import hashlib
+import threading
+from collections import Counter
+from botocore.exceptions import ClientError
+from trello import WebHook
+
+
+class FakeTrelloClient(object):
+    """
+    In-memory stand-in for TrelloClient covering the calls made by this service
+    """
+
+    def __init__(self, organization_id='organization', boards=None, latency=0):
+        self.organization_id = organization_id
+        self.boards = boards or {}
+        # Seconds every fetch_json waits, to model Trello round trips
+        self.latency = latency
+        self.cards = {}
+        self.attachments = {}
+        self.webhooks = {}
+        self.webhooks_by_model = {}
+        self.powerups = {}
+        self.calls = Counter()
+        # Time of every fetch_json, eg: to find the busiest rate limit window
+        self.request_times = []
+        self.lock = threading.Lock()
+
+    def add_board(self, board_id, name=None):
+        self.boards[board_id] = {'id': board_id, 'name': name or board_id}
+
+    def enable_powerup(self, board_id, plugin_id, plugin_name, value):
+        self.powerups[board_id] = {'id': plugin_id, 'name': plugin_name, 'value': value}
+
+    def move_card(self, board_id, card_id, id_list):
+        self.cards[board_id][card_id]['idList'] = id_list
+
+    def add_card(self, board_id, card_id, id_list, name, custom_field_items=None, closed=False):
+        self.cards.setdefault(board_id, {})[card_id] = {'id': card_id, 'idList': id_list, 'name': name, 'closed': closed, 'customFieldItems': custom_field_items or []}
+
+    def add_webhook(self, hook_id, desc, id_model, callback_url):
+        webhook = {'id': hook_id, 'desc': desc, 'id_model': id_model, 'callback_url': callback_url}
+        self.webhooks[hook_id] = webhook
+        self.webhooks_by_model.setdefault(id_model, {})[hook_id] = webhook
+
+    def list_hooks(self, token=None):
+        self.calls['list_hooks'] += 1
+        return [WebHook(self, token, webhook['id'], webhook['desc'], webhook['id_model'], webhook['callback_url'], True) for webhook in list(self.webhooks.values())]
+
+    def create_hook(self, callback_url, id_model, desc=None, token=None):
+        self.calls['create_hook'] += 1
+        with self.lock:
+            if any(webhook['callback_url'] == callback_url for webhook in self.webhooks_by_model.get(id_model, {}).values()):
+                raise Exception('Webhook creating failed: A webhook with that callback, model, and token already exists')
+            hook_id = uuid.uuid4().hex[:24]
+            self.add_webhook(hook_id, desc, id_model, callback_url)
+        return WebHook(self, token, hook_id, desc, id_model, callback_url, True)
+
+    def fetch_json(self, uri_path, http_method='GET', headers=None, query_params=None, post_args=None, files=None):
+        parts = uri_path.strip('/').split('/')
+        self.calls[f'{http_method} {parts[0]}'] += 1
+        self.request_times.append(time.monotonic())
+        if self.latency:
+            time.sleep(self.latency)
+
+        if parts[0] == 'webhooks' and http_method == 'DELETE':
+            with self.lock:
+                webhook = self.webhooks.pop(parts[1])
+                del self.webhooks_by_model[webhook['id_model']][webhook['id']]
+            return {}
+
+        if parts[0] == 'cards' and parts[2:3] == ['attachments']:
+            with self.lock:
+                card_attachments = self.attachments.setdefault(parts[1], {})
+                if http_method == 'GET':
+                    return [dict(attachment) for attachment in card_attachments.values()]
+                if http_method == 'DELETE':
+                    card_attachments.pop(parts[3], None)
+                    return {}
+                attachment_id = uuid.uuid4().hex[:24]
+                if files:
+                    file_name, file_object = files['file']
+                    card_attachments[attachment_id] = {'id': attachment_id, 'name': file_name, 'bytes': len(file_object.read())}
+                else:
+                    card_attachments[attachment_id] = {'id': attachment_id, 'name': (post_args or {}).get('name'), 'url': (post_args or {}).get('url')}
+                return dict(card_attachments[attachment_id])
+
+        if parts[0] == 'organizations' and parts[2:] == ['boards']:
+            return [dict(board) for board in self.boards.values()]
+
+        powerup = self.powerups.get(parts[1]) if parts[0] == 'boards' and len(parts) > 1 else None
+
+        if parts[0] == 'boards' and parts[2:] == ['plugins']:
+            return [{'id': powerup['id'], 'name': powerup['name']}] if powerup else []
+
+        if parts[0] == 'boards' and parts[2:] == ['boardPlugins']:
+            return [{'idPlugin': powerup['id']}] if powerup else []
+
+        if parts[0] == 'boards' and parts[2:] == ['pluginData']:
+            return [{'idPlugin': powerup['id'], 'value': powerup['value']}] if powerup else []
+
+        if parts[0] == 'boards' and parts[2:] == []:
+            board = {'id': parts[1]}
+            if (query_params or {}).get('boardPlugins') == 'true':
+                board['boardPlugins'] = [{'idPlugin': powerup['id']}] if powerup else []
+            if (query_params or {}).get('pluginData') == 'true':
+                board['pluginData'] = [{'idPlugin': powerup['id'], 'value': powerup['value']}] if powerup else []
+            return board
+
+        if parts[0] == 'boards' and parts[2:3] == ['cards']:
+            query_params = query_params or {}
+            fields = ['id'] + query_params.get('fields', 'idList,name').split(',')
+            if query_params.get('customFieldItems') == 'true':
+                fields.append('customFieldItems')
+            cards = self.cards.get(parts[1], {}).values()
+            if parts[3:] != ['all']:
+                cards = [card for card in cards if not card['closed']]
+            return [{field: card[field] for field in fields} for card in cards]
+
+        raise NotImplementedError(f'{http_method} {uri_path} is not supported by FakeTrelloClient')
+
+
+class FakeS3Object(object):
+    """
+    Object of FakeS3, every put keeps a new version like a versioned bucket
+    """
+
+    def __init__(self, s3, bucket, key):
+        self.s3 = s3
+        self.bucket_name = bucket
+        self.key = key
+        self.metadata = {}
+        self.content_type = None
+        self.cache_control = None
+        self.e_tag = None
+        self.version_id = None
+
+    def versions(self):
+        return self.s3.objects.get((self.bucket_name, self.key), [])
+
+    def not_found(self, operation):
+        return ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, operation)
+
+    def put(self, Body=b'', ContentType=None, CacheControl=None, Metadata=None, IfMatch=None, IfNoneMatch=None, **kwargs):
+        self.s3.calls['put_object'] += 1
+        body = Body.read() if hasattr(Body, 'read') else Body
+        if isinstance(body, str):
+            body = body.encode()
+        version = {
+            'Body': body,
+            'ContentType': ContentType,
+            'CacheControl': CacheControl,
+            'Metadata': dict(Metadata or {}),
+            'ETag': '"' + hashlib.md5(body).hexdigest() + '"',
+            'VersionId': uuid.uuid4().hex
+        }
+        with self.s3.lock:
+            # Conditional writes are checked against the latest version like S3 does
+            if IfMatch is not None and not self.versions():
+                raise self.not_found('PutObject')
+            if IfMatch is not None and IfMatch != self.versions()[-1]['ETag'] or IfNoneMatch == '*' and self.versions():
+                self.s3.calls['put_object_conflicts'] += 1
+                raise ClientError({'Error': {'Code': 'PreconditionFailed', 'Message': 'At least one of the pre-conditions you specified did not hold'}}, 'PutObject')
+            self.s3.objects.setdefault((self.bucket_name, self.key), []).append(version)
+        return {'ETag': version['ETag'], 'VersionId': version['VersionId']}
+
+    def get(self, **kwargs):
+        self.s3.calls['get_object'] += 1
+        if not self.versions():
+            raise self.not_found('GetObject')
+        version = self.versions()[-1]
+        return dict(version, Body=io.BytesIO(version['Body']), ContentLength=len(version['Body']))
+
+    def load(self):
+        self.s3.calls['head_object'] += 1
+        if not self.versions():
+            raise self.not_found('HeadObject')
+        version = self.versions()[-1]
+        self.metadata = dict(version['Metadata'])
+        self.content_type = version['ContentType']
+        self.cache_control = version['CacheControl']
+        self.e_tag = version['ETag']
+        self.version_id = version['VersionId']
+
+    def delete(self):
+        self.s3.calls['delete_object'] += 1
+        with self.s3.lock:
+            self.s3.objects.pop((self.bucket_name, self.key), None)
+        return {}
+
+
+class FakeS3Bucket(object):
+
+    def __init__(self, s3, name):
+        self.s3 = s3
+        self.name = name
+
+    def download_file(self, key, filename):
+        body = FakeS3Object(self.s3, self.name, key).get()['Body'].read()
+        with open(filename, 'wb') as downloaded_file:
+            downloaded_file.write(body)
+
+    def upload_file(self, filename, key):
+        with open(filename, 'rb') as uploaded_file:
+            FakeS3Object(self.s3, self.name, key).put(Body=uploaded_file)
+
+
+class FakeS3(object):
+    """
+    In-memory stand-in for the boto3 S3 resource covering the calls made by this service
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.calls = Counter()
+        self.lock = threading.Lock()
+
+    def Bucket(self, name):
+        return FakeS3Bucket(self, name)
+
+    def Object(self, bucket, key):
+        return FakeS3Object(self, bucket, key)
+
+
+class FakeSSM(object):
+    """
+    In-memory stand-in for the boto3 SSM client, parameters are returned as stored
+    """
+
+    def __init__(self, parameters=None):
+        self.parameters = dict(parameters or {})
+        self.calls = Counter()
+
+    def get_parameters(self, Names, WithDecryption=False):
+        self.calls['get_parameters'] += 1
+        return {
+            'Parameters': [{'Name': name, 'Value': self.parameters[name]} for name in Names if name in self.parameters],
+            'InvalidParameters': [name for name in Names if name not in self.parameters]
+        }
+
+
+class FakeSQS(object):
+    """
+    In-memory stand-in for the boto3 SQS client covering the Render Queue calls, without visibility timeouts
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.calls = Counter()
+        self.lock = threading.Lock()
+
+    def send_message(self, QueueUrl, MessageBody, MessageAttributes=None, **kwargs):
+        self.calls['send_message'] += 1
+        message_id = uuid.uuid4().hex
+        with self.lock:
+            self.messages.append({
+                'MessageId': message_id,
+                'ReceiptHandle': message_id,
+                'Body': MessageBody,
+                'MessageAttributes': MessageAttributes or {},
+                'Attributes': {'ApproximateReceiveCount': '0'}
+            })
+        return {'MessageId': message_id}
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, **kwargs):
+        self.calls['receive_message'] += 1
+        with self.lock:
+            messages = self.messages[:MaxNumberOfMessages]
+            for message in messages:
+                message['Attributes']['ApproximateReceiveCount'] = str(int(message['Attributes']['ApproximateReceiveCount']) + 1)
+            return {'Messages': [dict(message) for message in messages]}
+
+    def delete_message(self, QueueUrl, ReceiptHandle):
+        self.calls['delete_message'] += 1
+        with self.lock:
+            self.messages = [message for message in self.messages if message['ReceiptHandle'] != ReceiptHandle]
+
+    def change_message_visibility(self, QueueUrl, ReceiptHandle, VisibilityTimeout):
+        self.calls['change_message_visibility'] += 1
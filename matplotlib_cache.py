@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Prebuilt matplotlib config and font cache
+
+The matplotlib-cache Serverless plugin builds it before packaging, with the same matplotlib version that is deployed:
+
+    python matplotlib_cache.py
+"""
+from __future__ import print_function
+import os
+import shutil
+
+
+# Config and font cache shipped with the deployment package
+BUNDLED_MPLCONFIGDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mplconfig')
+
+# Writable copy used by matplotlib, the deployment package is read-only on Lambda
+try:
+    MPLCONFIGDIR = os.getenv('MPLCONFIGDIR', '/tmp/matplotlib')
+except Exception:
+    MPLCONFIGDIR = '/tmp/matplotlib'
+
+# Render a throwaway chart when the container starts
+MATPLOTLIB_WARM_UP = os.getenv('MATPLOTLIB_WARM_UP', 'False').lower() == 'true'
+
+# Minimal rcParams, the chart only uses the Agg backend and the bundled DejaVu Sans font
+MATPLOTLIBRC = """backend: Agg
+font.family: sans-serif
+font.sans-serif: DejaVu Sans
+"""
+
+_warmed_up = False
+
+
+# Point matplotlib at the prebuilt cache
+def configure_matplotlib(bundled_dir=BUNDLED_MPLCONFIGDIR, config_dir=MPLCONFIGDIR):
+    """
+    Copies the bundled config and font cache to a writable directory and sets MPLCONFIGDIR, must run before matplotlib is imported
+    :param bundled_dir: Directory with the prebuilt matplotlibrc and fontlist json
+    :param config_dir: Writable directory matplotlib uses
+    :return: returns the config directory
+    """
+    if not os.path.isdir(config_dir):
+        if os.path.isdir(bundled_dir):
+            shutil.copytree(bundled_dir, config_dir)
+        else:
+            os.makedirs(config_dir)
+    os.environ['MPLCONFIGDIR'] = config_dir
+    return config_dir
+
+
+# Load the Agg backend and fonts once per container
+def warm_up():
+    """
+    Draws a small figure with the Agg backend so that the font and glyph caches are loaded before the first chart
+    :return: returns nothing
+    """
+    global _warmed_up
+    if _warmed_up:
+        return
+
+    import matplotlib.pyplot as plt
+    figure, ax = plt.subplots(figsize=(1, 1))
+    ax.plot([0, 1], [1, 0], '--')
+    ax.bar([0], [1])
+    ax.annotate('0', xy=[0, 1], size=6)
+    ax.set_title('Burndown Chart')
+    figure.canvas.draw()
+    plt.close(figure)
+    _warmed_up = True
+
+
+# Build the cache at package time
+def build_cache(cache_dir=BUNDLED_MPLCONFIGDIR):
+    """
+    Writes the minimal matplotlibrc and a font list holding only the fonts shipped with matplotlib
+    :param cache_dir: Directory bundled with the deployment
+    :return: returns path of the font list json
+    """
+    if os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir)
+    os.makedirs(cache_dir)
+    with open(os.path.join(cache_dir, 'matplotlibrc'), 'w') as matplotlibrc:
+        matplotlibrc.write(MATPLOTLIBRC)
+
+    # matplotlib reads MPLCONFIGDIR on import
+    os.environ['MPLCONFIGDIR'] = cache_dir
+    import matplotlib
+    from matplotlib import font_manager
+
+    # Fonts under the matplotlib data path are stored relative to it and stay valid on Lambda
+    data_path = matplotlib.get_data_path()
+    font_list = font_manager.fontManager
+    font_list.ttflist = [font for font in font_list.ttflist if os.path.abspath(font.fname).startswith(data_path)]
+    font_list.afmlist = [font for font in font_list.afmlist if os.path.abspath(font.fname).startswith(data_path)]
+
+    font_list_path = os.path.join(cache_dir, f'fontlist-v{font_manager.FontManager.__version__}.json')
+    font_manager.json_dump(font_list, font_list_path)
+    return font_list_path
+
+
+if __name__ == '__main__':
+    font_list_path = build_cache()
+    import matplotlib
+    print(f'Built {font_list_path} with matplotlib {matplotlib.__version__}')
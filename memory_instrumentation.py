@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import json
+import resource
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+
+# Turn on tracemalloc snapshots and RSS reporting
+MEMORY_PROFILING = os.getenv('MEMORY_PROFILING', 'False').lower() == 'true'
+
+# Allocation sites listed in the memory report
+MEMORY_PROFILING_TOP_SITES = int(os.getenv('MEMORY_PROFILING_TOP_SITES', '10'))
+
+MB = 1024 * 1024
+
+
+# Resident memory of this process
+def rss_bytes():
+    """
+    Gets the current resident set size
+    :return: returns bytes, the peak RSS where /proc is not available
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except (IOError, OSError):
+        return peak_rss_bytes()
+
+
+# Peak resident memory of this process
+def peak_rss_bytes():
+    """
+    Gets the peak resident set size since the container started
+    :return: returns bytes
+    """
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# tracemalloc and RSS are process wide, only the main thread measures
+def is_main_thread():
+    return threading.current_thread() is threading.main_thread()
+
+
+class MemoryProfiler(object):
+    """
+    Records traced allocations and RSS per stage and per board, disabled it costs nothing.
+    The measures are process wide, so stages and boards are only recorded on the main thread, where nothing else runs
+    while they are measured. Work run on threads is measured as one stage around the whole batch
+    """
+
+    def __init__(self, enabled=MEMORY_PROFILING, top_sites=MEMORY_PROFILING_TOP_SITES):
+        self.enabled = enabled
+        self.top_sites = top_sites
+        self.stages = []
+        self.boards = []
+        # Traced peak of every open stage, a nested stage resets the peak of the stages around it
+        self.peaks = []
+
+    def start(self):
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def measure(self):
+        """
+        Takes the traced and resident memory
+        :return: returns dict of traced, traced_peak, rss and peak_rss bytes
+        """
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        return {'traced': traced, 'traced_peak': traced_peak, 'rss': rss_bytes(), 'peak_rss': peak_rss_bytes()}
+
+    @contextmanager
+    def stage(self, name, board_id=None):
+        """
+        Records the memory a stage keeps allocated and the peaks reached while it ran
+        :param name: Stage name. Eg: 'render'
+        :param board_id: The ID of the Board the stage ran for
+        """
+        if not self.enabled or not is_main_thread():
+            yield
+            return
+
+        before = self.measure()
+        # tracemalloc.reset_peak is only available from Python 3.9
+        if hasattr(tracemalloc, 'reset_peak'):
+            if self.peaks:
+                self.peaks[-1] = max(self.peaks[-1], before['traced_peak'])
+            tracemalloc.reset_peak()
+        self.peaks.append(0)
+        try:
+            yield
+        finally:
+            after = self.measure()
+            traced_peak = max(self.peaks.pop(), after['traced_peak'])
+            if self.peaks:
+                self.peaks[-1] = max(self.peaks[-1], traced_peak)
+            self.stages.append({
+                'stage': name,
+                'board_id': board_id,
+                'allocated_mb': round((after['traced'] - before['traced']) / MB, 3),
+                'traced_peak_mb': round(traced_peak / MB, 3),
+                'rss_mb': round(after['rss'] / MB, 3),
+                'rss_delta_mb': round((after['rss'] - before['rss']) / MB, 3)
+            })
+
+    @contextmanager
+    def board(self, board_id):
+        """
+        Records the RSS after a board was processed and the peak RSS so far
+        :param board_id: The ID of the Board
+        """
+        if not self.enabled or not is_main_thread():
+            yield
+            return
+
+        before = self.measure()
+        try:
+            yield
+        finally:
+            after = self.measure()
+            self.boards.append({
+                'board_id': board_id,
+                'rss_mb': round(after['rss'] / MB, 3),
+                'rss_delta_mb': round((after['rss'] - before['rss']) / MB, 3),
+                'peak_rss_mb': round(after['peak_rss'] / MB, 3)
+            })
+
+    def top_allocation_sites(self, limit=None):
+        """
+        Gets the source lines holding the most traced memory
+        :param limit: Number of sites, defaults to MEMORY_PROFILING_TOP_SITES
+        :return: returns list of dicts with site, size_mb and count
+        """
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ])
+        return [{
+            'site': f'{statistic.traceback[0].filename}:{statistic.traceback[0].lineno}',
+            'size_mb': round(statistic.size / MB, 3),
+            'count': statistic.count
+        } for statistic in snapshot.statistics('lineno')[:limit or self.top_sites]]
+
+    def report(self):
+        """
+        Gets the memory report of the invocation
+        :return: returns report dict
+        """
+        measured = self.measure()
+        return {
+            'rss_mb': round(measured['rss'] / MB, 3),
+            'peak_rss_mb': round(measured['peak_rss'] / MB, 3),
+            'traced_mb': round(measured['traced'] / MB, 3),
+            'stages': self.stages,
+            'boards': self.boards,
+            'top_allocation_sites': self.top_allocation_sites()
+        }
+
+    def log(self):
+        """
+        Prints the memory report as one structured log line and starts a new report
+        :return: returns nothing
+        """
+        if self.enabled:
+            print(json.dumps({'memory': self.report()}))
+            self.stages = []
+            self.boards = []
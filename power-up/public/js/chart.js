@@ -0,0 +1,144 @@
+// Trello API Key the member authorizes, the CHART_DATA_TRELLO_APP_KEY of the Serverless deployment
+var APP_KEY = '<Trello API Key>';
+
+var t = window.TrelloPowerUp.iframe({appKey: APP_KEY, appName: 'Sprint Burndown Chart'});
+
+// Chart data endpoint of the Serverless deployment, eg: https://<api-id>.execute-api.<region>.amazonaws.com/<stage>
+var CHART_DATA_URL = 'https://<api-id>.execute-api.<region>.amazonaws.com/<stage>';
+
+var SVG_NS = 'http://www.w3.org/2000/svg';
+var WIDTH = 560;
+var HEIGHT = 320;
+var PADDING = {top: 24, right: 16, bottom: 56, left: 36};
+
+// Changing size of Popup to match components inside it
+t.render(function() {
+  loadChartData().then(drawChart).catch(function (error) {
+    document.getElementById('chartStatus').textContent = error.message;
+  }).then(function () {
+    t.sizeTo('#content');
+  });
+});
+
+/////////////////////////////////////////////////////////////////////////////////////////////////////////
+/////////////////////////////////////   Chart Data   ////////////////////////////////////////////////////
+/////////////////////////////////////////////////////////////////////////////////////////////////////////
+
+// Read only Trello token of the member, the endpoint checks with it that the member can read the board
+function memberToken() {
+  var api = t.getRestApi();
+  return api.getToken().then(function (token) {
+    return token || api.authorize({scope: 'read'});
+  });
+}
+
+// The browser revalidates its cached copy with If-None-Match, unchanged data comes back as an empty 304
+// The Organization of the board picks the tenant whose sprint history is read
+function loadChartData() {
+  return Promise.all([t.board('id', 'idOrganization'), memberToken()]).then(function (values) {
+    var board = values[0];
+    var query = board.idOrganization ? '?tenant=' + encodeURIComponent(board.idOrganization) : '';
+    return fetch(CHART_DATA_URL + '/boards/' + board.id + '/chart-data' + query, {
+      cache: 'no-cache',
+      headers: {'Authorization': 'Bearer ' + values[1]}
+    });
+  }).then(function (response) {
+    if (response.status === 401 || response.status === 403) {
+      throw new Error('You are not allowed to read the chart of this board');
+    }
+    if (response.status === 404) {
+      throw new Error('No sprint recorded for this board yet');
+    }
+    if (!response.ok) {
+      throw new Error('Chart data unavailable (' + response.status + ')');
+    }
+    return response.json();
+  });
+}
+
+/////////////////////////////////////////////////////////////////////////////////////////////////////////
+/////////////////////////////////////   Chart   /////////////////////////////////////////////////////////
+/////////////////////////////////////////////////////////////////////////////////////////////////////////
+
+function svgElement(name, attributes, text) {
+  var element = document.createElementNS(SVG_NS, name);
+  Object.keys(attributes).forEach(function (attribute) {
+    element.setAttribute(attribute, attributes[attribute]);
+  });
+  if (text !== undefined) {
+    element.textContent = text;
+  }
+  return element;
+}
+
+// Same layout as the server rendered chart, x = 0 is the sprint start before the first day
+function drawChart(data) {
+  var svg = document.getElementById('burndownChart');
+  var points = data.dates.length + 1;
+  var forecast = data.forecast && data.forecast.projected_median ? data.forecast : null;
+  var values = data.ideal.concat(data.tasks_remaining, data.stories_defects_remaining, data.team_size, forecast ? forecast.projected_high : []).filter(function (value) {
+    return value !== null;
+  });
+  var maximum = Math.max.apply(null, values.concat([1]));
+  var step = (WIDTH - PADDING.left - PADDING.right) / points;
+
+  function x(index) {
+    return PADDING.left + step * (index + 0.5);
+  }
+
+  function y(value) {
+    return HEIGHT - PADDING.bottom - (HEIGHT - PADDING.top - PADDING.bottom) * value / maximum;
+  }
+
+  function line(series, color, dashed) {
+    var path = series.map(function (value, index) {
+      return value === null ? null : x(index) + ',' + y(value);
+    }).filter(function (point) {
+      return point !== null;
+    });
+    svg.appendChild(svgElement('polyline', {points: path.join(' '), fill: 'none', stroke: color, 'stroke-width': 1.5, 'stroke-dasharray': dashed ? '4 3' : 'none'}));
+  }
+
+  function bars(series, color, offset) {
+    series.forEach(function (value, index) {
+      if (value) {
+        svg.appendChild(svgElement('rect', {x: x(index + 1) + offset, y: y(value), width: step / 4, height: y(0) - y(value), fill: color}));
+      }
+    });
+  }
+
+  svg.appendChild(svgElement('text', {x: WIDTH / 2, y: 14, 'text-anchor': 'middle', 'font-size': 12}, 'Burndown Chart'));
+  svg.appendChild(svgElement('line', {x1: PADDING.left, x2: WIDTH - PADDING.right, y1: y(0), y2: y(0), stroke: '#d0e2f6'}));
+
+  bars(data.days_ooo, '#ffcef3', -step / 2);
+  bars(data.stories_defects_remaining, '#c5e3f6', -step / 4);
+  bars(data.stories_defects_done, '#17b978', 0);
+  line(data.ideal, '#000000', false);
+  line([data.ideal_tasks_remaining].concat(data.tasks_remaining), '#482ff7', true);
+
+  // Projected tasks remaining band from the latest recorded day, projections are aligned with the dates
+  if (forecast) {
+    var band = [];
+    forecast.projected_high.forEach(function (value, index) {
+      if (value !== null) {
+        band.push(x(index + 1) + ',' + y(value));
+      }
+    });
+    forecast.projected_low.slice().reverse().forEach(function (value, index) {
+      if (value !== null) {
+        band.push(x(forecast.projected_low.length - index) + ',' + y(value));
+      }
+    });
+    svg.appendChild(svgElement('polygon', {points: band.join(' '), fill: '#482ff7', 'fill-opacity': 0.12}));
+    line([null].concat(forecast.projected_median), '#482ff7', true);
+  }
+  if (data.forecast && data.forecast.completion_date) {
+    document.getElementById('chartStatus').textContent = 'Forecast done ' + data.forecast.completion_date + ', ' +
+      Math.round(data.forecast.confidence * 100) + '% by ' + (data.forecast.completion_date_late || 'not in sight') + ', ' +
+      Math.round(data.forecast.on_time_probability * 100) + '% on time';
+  }
+
+  data.dates.forEach(function (date, index) {
+    svg.appendChild(svgElement('text', {x: x(index + 1), y: HEIGHT - PADDING.bottom + 14, 'text-anchor': 'end', 'font-size': 8, transform: 'rotate(-40 ' + x(index + 1) + ' ' + (HEIGHT - PADDING.bottom + 14) + ')'}, date));
+  });
+}
@@ -16,6 +16,17 @@ TrelloPowerUp.initialize({
                 // height: 350
             })
           }
+        },
+        {
+	      icon: BLACK_ROCKET_ICON,
+	 		  text: 'Burndown Chart',
+        callback: function (t, opts) {
+            // Drawn in the browser from the chart data endpoint, no server side render
+            return t.popup({
+                title: 'Sprint Burndown Chart',
+                url: './chart.html'
+            })
+          }
         }
 	 	  ];
     }
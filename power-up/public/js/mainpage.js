@@ -97,6 +97,129 @@ $("#showTeamSizeOnChart").on('change', function() {
 
 ////////////////////////////////////////////////////////////////////////////////////////////////////////
 
+/////////////////////////////////////////////////////////////////////////////////////////////////////////
+//////////////////////////////   Show/Hide Intra-day Progress on Chart   ////////////////////////////////
+/////////////////////////////////////////////////////////////////////////////////////////////////////////
+
+//Setting Show/Hide Intra-day Progress on Chart whenever the page reloads
+t.get('board', 'shared', 'is_show_intraday').then(function (isShowIntraday) {
+  $("#showIntradayOnChart").prop('checked', JSON.parse(isShowIntraday.toLowerCase()));
+});
+
+
+//Setting Trello Env Vars for Show/Hide Intra-day Progress on Chart
+$("#showIntradayOnChart").on('change', function() {
+  if ($(this).is(':checked')) {
+    $(this).attr('value', 'True');
+  } else {
+    $(this).attr('value', 'False');
+  }
+  plugin_data['is_show_intraday'] = $('#showIntradayOnChart').val()
+});
+
+////////////////////////////////////////////////////////////////////////////////////////////////////////
+
+/////////////////////////////////////////////////////////////////////////////////////////////////////////
+//////////////////////////////   Show/Hide Completion Forecast on Chart   ///////////////////////////////
+/////////////////////////////////////////////////////////////////////////////////////////////////////////
+
+//Setting Show/Hide Completion Forecast on Chart whenever the page reloads
+t.get('board', 'shared', 'is_show_forecast').then(function (isShowForecast) {
+  $("#showForecastOnChart").prop('checked', JSON.parse(isShowForecast.toLowerCase()));
+});
+
+
+//Setting Trello Env Vars for Show/Hide Completion Forecast on Chart
+$("#showForecastOnChart").on('change', function() {
+  if ($(this).is(':checked')) {
+    $(this).attr('value', 'True');
+  } else {
+    $(this).attr('value', 'False');
+  }
+  plugin_data['is_show_forecast'] = $('#showForecastOnChart').val()
+});
+
+////////////////////////////////////////////////////////////////////////////////////////////////////////
+
+/////////////////////////////////////////////////////////////////////////////////////////////////////////
+//////////////////////////////   Minutes Between Chart Updates   ////////////////////////////////////////
+/////////////////////////////////////////////////////////////////////////////////////////////////////////
+
+//Setting Minutes Between Chart Updates whenever the page reloads
+t.get('board', 'shared', 'render_throttle_minutes').then(function (renderThrottleMinutes) {
+  $('input[id="renderThrottleMinutesEvent"]').val(renderThrottleMinutes)
+});
+
+
+//Setting Trello Env Vars for Minutes Between Chart Updates
+$('input[id="renderThrottleMinutesEvent"]').change(function() {
+  $('input[id="renderThrottleMinutesEvent"]').val($('input[id="renderThrottleMinutesEvent"]').val())
+  plugin_data['render_throttle_minutes'] = $('input[id="renderThrottleMinutesEvent"]').val()
+});
+
+////////////////////////////////////////////////////////////////////////////////////////////////////////
+
+/////////////////////////////////////////////////////////////////////////////////////////////////////////
+/////////////////////////////////////   Burndown Unit Select    /////////////////////////////////////////
+/////////////////////////////////////////////////////////////////////////////////////////////////////////
+
+//Setting Burndown Unit whenever the page reloads
+t.get('board', 'shared', 'burndown_unit', 'count').then(function (burndownUnit) {
+  $('#burndownUnitSelectEvents').val(burndownUnit).change()
+});
+
+//Adding placeholder to the Burndown Unit DropDown List
+$("#burndownUnitSelectEvents").select2({
+  placeholder: "Select Burndown Unit",
+    minimumResultsForSearch: -1
+});
+
+//Selecting Burndown Unit from DropDown List
+$('#burndownUnitSelectEvents').on('select2:select', function (e) {
+  plugin_data['burndown_unit'] = e.params.data.id
+});
+
+/////////////////////////////////////////////////////////////////////////////////////////////////////////
+
+
+/////////////////////////////////////////////////////////////////////////////////////////////////////////
+/////////////////////////////////   Story Points Custom Field    ////////////////////////////////////////
+/////////////////////////////////////////////////////////////////////////////////////////////////////////
+
+//Adding Number Custom Fields to DropDown options, then setting the saved Custom Field
+t.board('customFields')
+  .then(function (board) {
+  for (var field_index in board['customFields']) {
+    if (board['customFields'][field_index].type == 'number') {
+      var newOption = new Option(board['customFields'][field_index].name, board['customFields'][field_index].id, false, false);
+      $('#storyPointsFieldEvents').append(newOption).trigger('change');
+    }
+  }
+  return t.get('board', 'shared', 'story_points_field');
+})
+  .then(function (storyPointsField) {
+  $('#storyPointsFieldEvents').val(storyPointsField).change()
+});
+
+//Adding placeholder to the DropDown List
+$("#storyPointsFieldEvents").select2({
+    placeholder: "Pick the Story Points Custom Field",
+    allowClear: true
+});
+
+//Picking Story Points Custom Field from DropDown List
+$('#storyPointsFieldEvents').on('select2:select', function (e) {
+  plugin_data['story_points_field'] = e.params.data.id
+});
+
+//Clearing Story Points Custom Field, points are read from the Card names
+$('#storyPointsFieldEvents').on('select2:unselect', function (e) {
+  plugin_data['story_points_field'] = ''
+});
+
+/////////////////////////////////////////////////////////////////////////////////////////////////////////
+
+
 
 /////////////////////////////////////////////////////////////////////////////////////////////////////////
 /////////////////////////////   Stories/Defects and Tasks Remaining List   //////////////////////////////
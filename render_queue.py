@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import json
+import time
+import uuid
+import boto3
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+# Get the Render Queue Settings
+try:
+    RENDER_QUEUE_URL = os.getenv('RENDER_QUEUE_URL')
+except Exception:
+    print('RENDER_QUEUE_URL value missing in Lambda Environment Variable')
+
+RENDER_QUEUE_MAX_RECEIVE_COUNT = int(os.getenv('RENDER_QUEUE_MAX_RECEIVE_COUNT', '3'))
+
+# SQS delays a message by at most 15 minutes
+RENDER_QUEUE_MAX_DELAY_SECONDS = 900
+
+
+# Render Job Message
+def render_job(board_id, powerup_data, sprint_date, tenant=None):
+    """
+    Builds a Render Job for a Board
+    :param board_id: The ID of the Board
+    :param powerup_data: PowerUp Data json string of the Board
+    :param sprint_date: Date the counts snapshot was recorded for
+    :param tenant: Trello Organization ID of the Board, None for the Organization of the deployment
+    :return: returns Render Job dict
+    """
+    return {
+        'board_id': board_id,
+        'tenant': tenant,
+        'powerup_data': powerup_data,
+        'sprint_date': sprint_date,
+        'enqueued_at': time.time()
+    }
+
+
+class RenderQueue(ABC):
+    """
+    Queue of Render Jobs between the ingest stage and the render worker
+    """
+
+    @abstractmethod
+    def enqueue(self, job, delay_seconds=0):
+        """
+        Adds a Render Job to the queue
+        :param job: Render Job dict from render_job()
+        :param delay_seconds: Seconds before the job can be received, at most RENDER_QUEUE_MAX_DELAY_SECONDS
+        :return: returns nothing
+        """
+
+    @abstractmethod
+    def dequeue_batch(self, max_messages=10):
+        """
+        Receives up to max_messages Render Job messages
+        :param max_messages: Maximum number of messages in the batch
+        :return: returns list of messages, each a dict with 'id', 'job' and 'receive_count'
+        """
+
+    @abstractmethod
+    def ack(self, message):
+        """
+        Removes a processed message from the queue
+        :param message: Message returned by dequeue_batch()
+        :return: returns nothing
+        """
+
+    @abstractmethod
+    def fail(self, message):
+        """
+        Returns a failed message to the queue, or dead-letters it once it ran out of receives
+        :param message: Message returned by dequeue_batch()
+        :return: returns nothing
+        """
+
+
+class LocalRenderQueue(RenderQueue):
+    """
+    In-memory Render Queue, pending jobs are deduplicated per board
+    """
+
+    def __init__(self, max_receive_count=RENDER_QUEUE_MAX_RECEIVE_COUNT, clock=time.time):
+        self.max_receive_count = max_receive_count
+        self.clock = clock
+        self.pending = OrderedDict()
+        self.delayed = []
+        self.in_flight = {}
+        self.receive_counts = {}
+        self.dead_letters = []
+
+    def enqueue(self, job, delay_seconds=0):
+        if delay_seconds > 0:
+            self.delayed.append((self.clock() + min(delay_seconds, RENDER_QUEUE_MAX_DELAY_SECONDS), job))
+            return
+        # A newer job for a board already waiting replaces the queued one in place
+        self.pending[job['board_id']] = job
+
+    def dequeue_batch(self, max_messages=10):
+        # Delayed jobs become pending once their delay is over
+        now = self.clock()
+        for available_at, job in [delayed for delayed in self.delayed if delayed[0] <= now]:
+            self.delayed.remove((available_at, job))
+            self.enqueue(job)
+
+        messages = []
+        while self.pending and len(messages) < max_messages:
+            board_id, job = self.pending.popitem(last=False)
+            self.receive_counts[board_id] = self.receive_counts.get(board_id, 0) + 1
+            message = {
+                'id': str(uuid.uuid4()),
+                'job': job,
+                'receive_count': self.receive_counts[board_id]
+            }
+            self.in_flight[message['id']] = message
+            messages.append(message)
+        return messages
+
+    def ack(self, message):
+        self.in_flight.pop(message['id'], None)
+        self.receive_counts.pop(message['job']['board_id'], None)
+
+    def fail(self, message):
+        self.in_flight.pop(message['id'], None)
+        board_id = message['job']['board_id']
+        if message['receive_count'] >= self.max_receive_count:
+            self.receive_counts.pop(board_id, None)
+            self.dead_letters.append(message)
+        elif board_id not in self.pending:
+            self.pending[board_id] = message['job']
+
+    def __len__(self):
+        return len(self.pending)
+
+
+class SqsRenderQueue(RenderQueue):
+    """
+    SQS backed Render Queue, dead-lettering is done by the queue redrive policy
+    """
+
+    def __init__(self, queue_url=RENDER_QUEUE_URL, sqs_client=None):
+        self.queue_url = queue_url
+        self.sqs = sqs_client or boto3.client('sqs')
+
+    def enqueue(self, job, delay_seconds=0):
+        self.sqs.send_message(
+            QueueUrl=self.queue_url,
+            MessageBody=json.dumps(job),
+            DelaySeconds=min(int(delay_seconds), RENDER_QUEUE_MAX_DELAY_SECONDS),
+            MessageAttributes={
+                'board_id': {
+                    'DataType': 'String',
+                    'StringValue': job['board_id']
+                }
+            }
+        )
+
+    def dequeue_batch(self, max_messages=10):
+        response = self.sqs.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=min(max_messages, 10),
+            AttributeNames=['ApproximateReceiveCount'],
+            WaitTimeSeconds=1
+        )
+        return [sqs_message(record) for record in response.get('Messages', [])]
+
+    def ack(self, message):
+        self.sqs.delete_message(
+            QueueUrl=self.queue_url,
+            ReceiptHandle=message['receipt_handle']
+        )
+
+    def fail(self, message):
+        # Message becomes visible again, after maxReceiveCount SQS moves it to the dead-letter queue
+        self.sqs.change_message_visibility(
+            QueueUrl=self.queue_url,
+            ReceiptHandle=message['receipt_handle'],
+            VisibilityTimeout=0
+        )
+
+
+# Convert a SQS Message to a Render Queue Message
+def sqs_message(record):
+    """
+    Converts a SQS message or a Lambda SQS event record into a Render Queue message
+    :param record: SQS message from receive_message or Lambda SQS event record
+    :return: returns message dict
+    """
+    attributes = record.get('Attributes') or record.get('attributes') or {}
+    return {
+        'id': record.get('MessageId') or record.get('messageId'),
+        'receipt_handle': record.get('ReceiptHandle') or record.get('receiptHandle'),
+        'job': json.loads(record.get('Body') or record.get('body')),
+        'receive_count': int(attributes.get('ApproximateReceiveCount', 1))
+    }
+
+
+# Render a batch of messages, once per board
+def render_batch(messages, render):
+    """
+    Renders a batch of Render Job messages, deduplicated per board
+    :param messages: Render Queue messages
+    :param render: Callable taking a Render Job, raises on failure
+    :return: returns tuple of (succeeded messages, failed messages)
+    """
+    latest_by_board = OrderedDict()
+    for message in messages:
+        board_id = message['job']['board_id']
+        latest = latest_by_board.get(board_id)
+        if latest is None or message['job'].get('enqueued_at', 0) >= latest['job'].get('enqueued_at', 0):
+            latest_by_board[board_id] = message
+
+    succeeded = []
+    failed = []
+    for board_id, latest in latest_by_board.items():
+        board_messages = [message for message in messages if message['job']['board_id'] == board_id]
+        try:
+            render(latest['job'])
+            succeeded.extend(board_messages)
+        except Exception as error:
+            print(f'{error}: Error rendering chart for the Trello Board - {board_id}')
+            # Only the latest job is retried, older duplicates are superseded by it
+            failed.append(latest)
+            succeeded.extend(message for message in board_messages if message is not latest)
+
+    return succeeded, failed
+
+
+# Drain the Render Queue
+def drain_render_queue(queue, render, batch_size=10, max_batches=None):
+    """
+    Dequeues and renders Render Jobs in batches until the queue is empty
+    :param queue: RenderQueue instance
+    :param render: Callable taking a Render Job, raises on failure
+    :param batch_size: Number of messages dequeued per batch
+    :param max_batches: Stop after this many batches, None to drain until empty
+    :return: returns dict of processed, failed and batches counts
+    """
+    summary = {'processed': 0, 'failed': 0, 'batches': 0}
+    while max_batches is None or summary['batches'] < max_batches:
+        messages = queue.dequeue_batch(batch_size)
+        if not messages:
+            break
+        summary['batches'] += 1
+        succeeded, failed = render_batch(messages, render)
+        for message in succeeded:
+            queue.ack(message)
+        for message in failed:
+            queue.fail(message)
+        summary['processed'] += len(succeeded)
+        summary['failed'] += len(failed)
+
+    return summary
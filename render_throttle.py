@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import time
+import boto3
+from botocore.exceptions import ClientError
+from render_queue import RENDER_QUEUE_MAX_DELAY_SECONDS
+
+
+# Get the Render Throttle Settings
+try:
+    RENDER_THROTTLE_TABLE = os.getenv('RENDER_THROTTLE_TABLE')
+except Exception:
+    print('RENDER_THROTTLE_TABLE value missing in Lambda Environment Variable')
+
+# Minutes between Chart publishes of a Board when its PowerUp Data does not set them, 0 publishes every render
+RENDER_THROTTLE_MINUTES = float(os.getenv('RENDER_THROTTLE_MINUTES', '0'))
+
+
+class LocalThrottleStore(object):
+    """
+    In-memory stand-in for the durable throttle store, for local runs in one process
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.published_at = {}
+        self.trailing_at = {}
+
+    def claim(self, board_id, window_seconds):
+        """
+        Claims the publish slot of a Board unless its Chart was published within the window
+        :param board_id: The ID of the Board
+        :param window_seconds: Seconds between publishes
+        :return: returns None when claimed, else the Unix time the next publish is due
+        """
+        now = self.clock()
+        published_at = self.published_at.get(board_id)
+        if published_at is not None and published_at > now - window_seconds:
+            return published_at + window_seconds
+        self.published_at[board_id] = now
+        self.trailing_at.pop(board_id, None)
+        return None
+
+    def schedule_trailing(self, board_id, due_at):
+        """
+        Records the trailing publish of the current window, once
+        :param board_id: The ID of the Board
+        :param due_at: Unix time the trailing publish is due
+        :return: returns True when no trailing publish was scheduled yet
+        """
+        if board_id in self.trailing_at:
+            return False
+        self.trailing_at[board_id] = due_at
+        return True
+
+
+class DynamoDbThrottleStore(object):
+    """
+    Durable throttle store, a conditional put claims the publish slot and a conditional update the trailing publish
+    """
+
+    def __init__(self, table_name=RENDER_THROTTLE_TABLE, dynamodb=None):
+        self.table = (dynamodb or boto3.resource('dynamodb')).Table(table_name)
+
+    def claim(self, board_id, window_seconds):
+        now = int(time.time())
+        try:
+            # Putting the whole item drops the trailing publish of the previous window
+            self.table.put_item(
+                Item={'board_id': board_id, 'published_at': now, 'expires_at': now + window_seconds + RENDER_QUEUE_MAX_DELAY_SECONDS},
+                ConditionExpression='attribute_not_exists(board_id) OR published_at <= :cutoff',
+                ExpressionAttributeValues={':cutoff': now - window_seconds}
+            )
+            return None
+        except ClientError as error:
+            if error.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+        item = self.table.get_item(Key={'board_id': board_id}, ConsistentRead=True).get('Item', {})
+        return int(item.get('published_at', now)) + window_seconds
+
+    def schedule_trailing(self, board_id, due_at):
+        try:
+            self.table.update_item(
+                Key={'board_id': board_id},
+                UpdateExpression='SET trailing_at = :due',
+                ConditionExpression='attribute_exists(board_id) AND attribute_not_exists(trailing_at)',
+                ExpressionAttributeValues={':due': int(due_at)}
+            )
+            return True
+        except ClientError as error:
+            if error.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+
+class RenderThrottle(object):
+    """
+    Publishes the Chart of a Board at most once per throttle window. A render inside the window is suppressed and
+    schedules one trailing render for the end of the window, which publishes the latest recorded counts
+    """
+
+    def __init__(self, store, clock=time.time):
+        # None publishes every render
+        self.store = store
+        self.clock = clock
+        self.stats = {'checked': 0, 'published': 0, 'suppressed': 0, 'trailing_scheduled': 0}
+
+    def is_publish_due(self, board_id, throttle_minutes, schedule_trailing=None, trailing=False):
+        """
+        Checks and claims the publish slot of a Board
+        :param board_id: The ID of the Board
+        :param throttle_minutes: Minutes between publishes, 0 publishes every render
+        :param schedule_trailing: Callable taking the delay in seconds that enqueues the trailing render, None when renders cannot be delayed
+        :param trailing: The render is a trailing render. SQS delays it by at most 15 minutes, arriving before the end of a longer window it is delayed again
+        :return: returns True when the Chart is published now
+        """
+        if self.store is None or not throttle_minutes or throttle_minutes <= 0:
+            return True
+
+        self.stats['checked'] += 1
+        due_at = self.store.claim(board_id, int(throttle_minutes * 60))
+        if due_at is None:
+            self.stats['published'] += 1
+            return True
+
+        self.stats['suppressed'] += 1
+        if schedule_trailing is not None and (trailing or self.store.schedule_trailing(board_id, due_at)):
+            schedule_trailing(max(1, int(due_at - self.clock()) + 1))
+            self.stats['trailing_scheduled'] += 1
+        return False
+
+    def report(self):
+        return dict(self.stats)
+
+
+# Build the Render Throttle for this container
+def render_throttle():
+    """
+    Creates the Render Throttle backed by DynamoDB. Without RENDER_THROTTLE_TABLE every container would keep its own
+    windows, so Charts are not throttled
+    :return: returns RenderThrottle
+    """
+    if RENDER_THROTTLE_TABLE:
+        return RenderThrottle(DynamoDbThrottleStore(RENDER_THROTTLE_TABLE))
+    if RENDER_THROTTLE_MINUTES > 0:
+        print('RENDER_THROTTLE_TABLE value missing in Lambda Environment Variable, Charts are not throttled')
+    return RenderThrottle(None)
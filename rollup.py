@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import numpy as np
+from sprint_history import NOT_RECORDED, to_day, to_date_strings
+from chart_data import compact
+
+
+# Render the Organization rollup Chart at the end of every completed scheduled sweep
+ROLLUP_CHART = os.getenv('ROLLUP_CHART', 'False').lower() == 'true'
+
+# Chart Bucket key prefix of the rollup Charts, one per Organization
+ROLLUP_CHART_PREFIX = 'organizations/'
+
+
+# Business days between two days
+def business_days(first_day, last_day):
+    """
+    Gets the Monday to Friday days of a range
+    :param first_day: First day number, days since 1970-01-01
+    :param last_day: Last day number, included
+    :return: returns array of day numbers
+    """
+    days = np.arange(first_day, last_day + 1, dtype='<i4')
+    return days[np.is_busday(days.astype('datetime64[D]'))]
+
+
+# Forward fill the gaps of every row
+def forward_fill(matrix):
+    """
+    Replaces NaN cells with the last value before them in the same row, leading NaN cells are kept
+    :param matrix: 2D float array
+    :return: returns filled copy of the matrix
+    """
+    columns = np.arange(matrix.shape[1])
+    last_valid = np.where(np.isnan(matrix), 0, columns)
+    np.maximum.accumulate(last_valid, axis=1, out=last_valid)
+    return matrix[np.arange(matrix.shape[0])[:, None], last_valid]
+
+
+# Total of every day
+def column_totals(matrix):
+    """
+    Sums the Boards of every day, a day no Board reports for is NaN
+    :param matrix: Boards x days float array
+    :return: returns array of day totals
+    """
+    totals = np.nansum(matrix, axis=0)
+    totals[np.isnan(matrix).all(axis=0)] = np.nan
+    return totals
+
+
+# Convert a total series to json values
+def series(values):
+    return [None if np.isnan(value) else compact(value) for value in values.tolist()]
+
+
+class RollupMatrix(object):
+    """
+    Current Sprints of many Boards aligned on a common business day axis as Boards x days matrices
+    """
+
+    def __init__(self, sprint_history, board_ids, as_of_day):
+        self.as_of_day = as_of_day
+        self.board_ids = []
+        days = []
+        sprint_lengths = []
+        ideal_tasks_remaining = []
+
+        # Only the slices of the current Sprints are gathered per Board, everything else is computed on the columns.
+        # A Sprint that ended before the day is left out, eg: a Board that stopped recording months ago
+        for board_id in board_ids:
+            sprint, sprint_days = sprint_history.current_sprint(board_id)
+            if sprint is None or not len(sprint_days) or sprint_days['date'][-1] < as_of_day:
+                continue
+            days.append(sprint_days)
+            sprint_lengths.append(len(sprint_days))
+            ideal_tasks_remaining.append(float(sprint['ideal_tasks_remaining']))
+            self.board_ids.append(board_id)
+
+        if not self.board_ids:
+            self.axis = np.zeros(0, dtype='<i4')
+            self.shape = (0, 0)
+            return
+
+        self.days = np.concatenate(days)
+        self.axis = business_days(int(self.days['date'].min()), int(self.days['date'].max()))
+        self.shape = (len(self.board_ids), len(self.axis))
+
+        # Board row, Sprint length, day index within the Sprint and ideal Tasks of every gathered day
+        sprint_lengths = np.array(sprint_lengths)
+        rows = np.repeat(np.arange(len(self.board_ids)), sprint_lengths)
+        sprint_starts = np.repeat(np.cumsum(sprint_lengths) - sprint_lengths, sprint_lengths)
+        sprint_day_indexes = np.arange(len(self.days)) - sprint_starts
+
+        # Days recorded on a weekend have no column
+        columns = np.searchsorted(self.axis, self.days['date'])
+        on_axis = (columns < len(self.axis)) & (self.axis[np.minimum(columns, len(self.axis) - 1)] == self.days['date'])
+        self.rows = rows[on_axis]
+        self.columns = columns[on_axis]
+        self.days = self.days[on_axis]
+        self.sprint_day_indexes = sprint_day_indexes[on_axis]
+        self.sprint_lengths = np.repeat(sprint_lengths, sprint_lengths)[on_axis]
+        self.ideal_tasks_remaining = np.repeat(ideal_tasks_remaining, sprint_lengths)[on_axis]
+
+        # A Board takes part from the first to the last day of its Sprint, whatever day of the week it starts on
+        first_columns = np.full(len(self.board_ids), len(self.axis), dtype='<i4')
+        last_columns = np.full(len(self.board_ids), -1, dtype='<i4')
+        np.minimum.at(first_columns, self.rows, self.columns)
+        np.maximum.at(last_columns, self.rows, self.columns)
+        axis_columns = np.arange(len(self.axis))
+        self.in_sprint = (axis_columns >= first_columns[:, None]) & (axis_columns <= last_columns[:, None])
+
+    def scatter(self, values):
+        """
+        Places one value per Sprint day in its Board row and day column
+        :param values: array aligned with the gathered Sprint days
+        :return: returns Boards x days float array, NaN where a Board has no value
+        """
+        matrix = np.full(self.shape, np.nan)
+        matrix[self.rows, self.columns] = values
+        return matrix
+
+    def recorded(self, column):
+        """
+        Gets a day column of every Board, a day that was not recorded keeps the Board's previous count up to the as of day
+        :param column: Day column of the Sprint History. Eg: tasks_remaining
+        :return: returns Boards x days float array
+        """
+        values = self.days[column].astype(float)
+        values[values == NOT_RECORDED] = np.nan
+        matrix = forward_fill(self.scatter(values))
+        matrix[~self.in_sprint] = np.nan
+        matrix[:, self.axis > self.as_of_day] = np.nan
+        return matrix
+
+    def ideal(self):
+        """
+        Gets the ideal Tasks Remaining of every Board at the end of each Sprint day
+        :return: returns Boards x days float array
+        """
+        return self.scatter(self.ideal_tasks_remaining * (self.sprint_lengths - self.sprint_day_indexes - 1) / self.sprint_lengths)
+
+
+# Organization rollup of the current Sprints
+def rollup_series(sprint_history, board_ids, as_of_date):
+    """
+    Aggregates the Sprints of the Boards running on a day on a common business day axis. A Board counts from the first
+    to the last day of its own Sprint, and a day it did not record keeps its previous counts
+    :param sprint_history: SprintHistory of the Boards
+    :param board_ids: list of Board IDs, eg: the enabled Boards of an Organization
+    :param as_of_date: Date string of the rollup, counts are carried up to it. Eg: today
+    :return: returns series dict with dates, totals per day and the Boards reporting per day, None without running Sprints
+    """
+    matrix = RollupMatrix(sprint_history, board_ids, to_day(as_of_date))
+    if not matrix.board_ids:
+        return None
+
+    tasks_remaining = matrix.recorded('tasks_remaining')
+
+    return {
+        'boards': len(matrix.board_ids),
+        'dates': to_date_strings(matrix.axis),
+        'reporting_boards': (~np.isnan(tasks_remaining)).sum(axis=0).tolist(),
+        'stories_defects_remaining': series(column_totals(matrix.recorded('stories_defects_remaining'))),
+        'stories_defects_done': series(column_totals(matrix.recorded('stories_defects_done'))),
+        'tasks_remaining': series(column_totals(tasks_remaining)),
+        'ideal': series(column_totals(matrix.ideal())),
+        'team_size': series(column_totals(matrix.recorded('team_size'))),
+        'days_ooo': series(column_totals(matrix.scatter(matrix.days['days_ooo'].astype(float))))
+    }
+
+
+# Chart Bucket name of an Organization rollup Chart
+def rollup_chart_id(organization_id):
+    return f'{ROLLUP_CHART_PREFIX}{organization_id}'
@@ -1,560 +1,267 @@
 #!/usr/bin/env python
 from __future__ import print_function
-import os
-import re
 import json
-import boto3
-import requests
 import datetime
-import pytz
-import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from trello import TrelloClient
-from trello import Organization
-from trello import Board
-from trello import List
-from difflib import SequenceMatcher
-from botocore.exceptions import ClientError
-
-
-# Get the SSM Parameter Keys
-try:
-    TRELLO_API_KEY_SSM_PARAMETER_KEY = os.getenv('TRELLO_API_KEY_SSM_PARAMETER_KEY')
-except Exception:
-    TRELLO_API_KEY_SSM_PARAMETER_KEY = '/Serverless/Trello/ApiKey'
-
-try:
-    TRELLO_TOKEN_SSM_PARAMETER_KEY = os.getenv('TRELLO_TOKEN_SSM_PARAMETER_KEY')
-except Exception:
-    TRELLO_TOKEN_SSM_PARAMETER_KEY = '/Serverless/Trello/Token'
-
-try:
-    TRELLO_ORGANIZATION_ID = os.getenv('TRELLO_ORGANIZATION_ID')
-except Exception:
-    print('Trello Organization ID missing in Lambda Environment Variable')
-
-try:
-    CALLBACK_URL = os.getenv('CALLBACK_URL')
-except Exception:
-    print('CALLBACK_URL value missing in Lambda Environment Variable')
-
-try:
-    POWERUP_NAME = os.getenv('POWERUP_NAME')
-except Exception:
-    print('Power-Up Name value missing in Lambda Environment Variable')
-
-try:
-    DEPLOYMENT_BUCKET = os.getenv('DEPLOYMENT_BUCKET')
-except Exception:
-    print('Deployment Bucket Name value missing in Lambda Environment Variable')
-
-# Setting Time Zone to CST
-cst_timezone = pytz.timezone('US/Central')
-
-# Setting Current Date and Day
-current_day = datetime.datetime.now(cst_timezone).strftime("%A")
-current_date = datetime.datetime.now(cst_timezone).strftime("%Y-%m-%d")
-
-# Setting Sprint Data and Chart Attachement Response Data File names
-sprint_data_file_name = 'sprint_data.json'
-
-# Boto3 SSM module
-ssm = boto3.client('ssm')
-
-# Get ssm parameter values
-TRELLO_API_KEY = format(
-    ssm.get_parameter(
-        Name=TRELLO_API_KEY_SSM_PARAMETER_KEY,
-        WithDecryption=True
-        )['Parameter']['Value']
-    )
-
-TRELLO_TOKEN = format(
-    ssm.get_parameter(
-        Name=TRELLO_TOKEN_SSM_PARAMETER_KEY,
-        WithDecryption=True
-        )['Parameter']['Value']
-    )
-
-
-# Get Our PowerUp ID from the Board
-def get_plugin_id(client, board_id):
+from collections import OrderedDict
+from burndown_engine import DEPLOYMENT_BUCKET, cst_timezone, set_current_date, clients, tenants, memory, get_powerup_data, process_boards, publish_rollup_chart, merge_report, run_concurrently, success, RateLimitedClient
+from card_counts import COUNT_UNIT
+from sprint_history import history_key, download_history, upload_history
+from board_registry import download_registry, upload_registry, reconcile_registry
+from backfill import current_sprint_dates, backfill_boards
+from sweep_coordinator import SWEEP_WORKER_FUNCTION, SWEEP_SHARD_SIZE, SWEEP_MAX_CONCURRENCY, LambdaShardInvoker, sweep
+from sweep_checkpoint import Deadline, order_by_staleness, new_cursor, download_cursor, upload_cursor, run_with_checkpoints, continue_sweep
+from tenants import interleave, group_by_tenant
+from rollup import ROLLUP_CHART
+from webhook_reconciler import RateLimiter
+from trello_budget import SharedRateLimiter
+
+
+# Process the Boards of many tenants
+def process_tenant_boards(entries, process):
     """
-    Gets Our PowerUp ID from the Board
-    :param client: Trello client Object
-    :param board_id: The ID of the Board
-    :return: returns Plugin/PowerUp Value
+    Processes the Boards of every tenant concurrently, each tenant with its own Trello token and rate limit budget
+    :param entries: list of [organization_id, board_id] pairs
+    :param process: Function called with (organization_id, board_ids), returns a process_boards report
+    :return: returns process_boards report of all Boards
     """
-    plugins =  client.fetch_json(
-        f"boards/{board_id}/plugins",
-        http_method="GET",
-        headers = {
-                "Accept": "application/json"
-        },
-    )
-
-    for plugin in plugins:
-        if plugin['name'] == POWERUP_NAME:
-            return plugin['id']
-
-
-# Get all Enabled PowerUps from the Board
-def enabled_powerups(client, board_id):
+    groups = group_by_tenant(entries)
+    report = {'boards': len(entries), 'processed': [], 'skipped': [], 'rendered': [], 'enqueued': [], 'suppressed': [], 'failed': {}}
+    # Tenants are processed on threads, where process_boards records no stages, their memory is measured for the whole batch
+    with memory.stage('tenants'):
+        tenant_reports = run_concurrently(lambda organization_id: process(organization_id, groups[organization_id]), list(groups), max(1, len(groups)))
+    for organization_id, tenant_report, error in tenant_reports:
+        if error is not None:
+            print(f'{error}: Error processing the Boards of the Trello Organization - {organization_id}')
+            tenant_report = {'processed': [], 'skipped': [], 'rendered': [], 'enqueued': [], 'suppressed': [], 'failed': {board_id: str(error) for board_id in groups[organization_id]}}
+        merge_report(report, tenant_report)
+    return report
+
+
+# Publish the rollup Chart of every tenant
+def publish_rollups(s3, sweep_tenants, enabled_boards):
     """
-    Gets Enabled Plugin/PowerUp from the board
-    :param client: Trello client Object
-    :param board_id: The ID of the Board
-    :return: returns Enabled Plugin/PowerUp Data
+    Publishes one portfolio Chart per tenant from the Sprint History the sweep recorded
+    :param s3: Boto3 S3 resource
+    :param sweep_tenants: OrderedDict of Tenant by Organization ID
+    :param enabled_boards: dict of PowerUp Data by Board ID, by Organization ID
+    :return: returns dict of rollup Chart URLs by Organization ID, None when no Board has a current Sprint
     """
-    return client.fetch_json(
-        f"boards/{board_id}/boardPlugins",
-        http_method="GET",
-        headers = {
-                "Accept": "application/json"
-            }
-    )
-
-
-# Get PowerUp Data that is required for monitoring the Board
-def get_powerup_data(client, board_id):
-    """
-    Get PowerUp Data from the board
-    :param client: Trello client Object
-    :param board_id: The ID of the Board
-    :return: returns PowerUp Data for monitoring boards
-    """
-    # Get Enabled PowerUps in the Board
-    enabled_powerups_data = enabled_powerups(client, board_id)
-    plugin_id = get_plugin_id(client, board_id)
-
-    for enabled_powerup in enabled_powerups_data:
-        # Check if our PowerUp Enabled or Not
-        if plugin_id == enabled_powerup['idPlugin']:
-            plugin_data = client.fetch_json(
-                f"boards/{board_id}/pluginData",
-                http_method="GET",
-                headers = {
-                        "Accept": "application/json"
-                },
-                query_params={
-                    'idPlugin': plugin_id
-                }
-            )
-
-            return plugin_data[0]['value']
-
-
-# Get Stories and Tasks Counts
-def get_counts(client, board_id, monitor_lists, done_list, start_day):
-    """
-    Get List data
-    :param client: Trello client Object
-    :param board_id: Trello Board ID
-    :param monitor_lists: Trello monitor lists from PowerUp Data
-    :param start_day: Start day of the Sprint. Eg: Monday
-    :return: returns count of User Stories/Defects remaining and completed
-    """
-    stories_defects_remaining = 0
-    stories_defects_done = 0
-    tasks_remaining = 0
-    ideal_tasks_remaining = 0
-
-    board_object = Board(client, board_id=board_id)
-    board_cards = board_object.get_cards()
-
-    for monitor_list in monitor_lists:
-        for board_card in board_cards:
-            if board_card.idList == monitor_list:
-                if board_card.name[:2] in 'T ':
-                    tasks_remaining += 1
-                elif board_card.name[:2] in ('U ', 'D ', 'C '):
-                    stories_defects_remaining += 1
-    else:
-        for board_card in board_cards:
-            if board_card.idList == done_list:
-                if board_card.name[:2] in ('U ', 'D ', 'C '):
-                    stories_defects_done += 1
-                if current_day == start_day:
-                    if board_card.name[:2] in 'T ':
-                        ideal_tasks_remaining += 1
-
-    if current_day == start_day:
-        ideal_tasks_remaining += tasks_remaining
-
-    return stories_defects_remaining, stories_defects_done, tasks_remaining, ideal_tasks_remaining
-
-
-# Get Sprint Dates
-def get_sprint_dates(start_day, total_sprint_days, board_id):
-    """
-    Gets Sprint dates based on the Start day and Total Sprint days
-    :param start_day: Start day of the Sprint. Eg: Monday
-    :param total_sprint_days: Total days of a Sprint. Value starts from 0. So if Sprint has 5 days then total_sprint_days=4
-    :param board_id: The ID of the Board
-    :return: returns list of Sprint dates
-    """
-    sprint_dates = []
-    start_date = datetime.datetime.now(cst_timezone)
-    if current_day == start_day:
-        sprint_dates.append(start_date.strftime("%Y-%m-%d"))
-        business_days_to_add = total_sprint_days
-        current_datetime = start_date
-        while business_days_to_add > 0:
-            current_datetime += datetime.timedelta(days=1)
-            weekday = current_datetime.weekday()
-            if weekday >= 5: # sunday = 6
-                continue
-            business_days_to_add -= 1
-            sprint_dates.append(current_datetime.strftime("%Y-%m-%d"))
-    else:
-        for key, value in json.load(open('/tmp/' + sprint_data_file_name, 'r'))[board_id].items():
-            if key != 'ideal_tasks_remaining':
-                try:
-                    sprint_dates.append(key)
-                except Exception as error:
-                    print(error)
-                    continue
-
-    return sprint_dates
-
-
-# Create/Update Sprint Data
-def update_sprint_data(start_day, board_id, sprint_dates, stories_defects_remaining, stories_defects_done, tasks_remaining, ideal_tasks_remaining, team_size):
-    """
-    Create/Update Sprint Data to Json file
-    :param start_day: Start day of the Sprint. Eg: Monday
-    :param board_id: The ID of the Board
-    :param sprint_dates: List of current sprint dates
-    :param stories_defects_remaining: Userstories or Defects remaining count
-    :param stories_defects_done: Userstories or Defects done count
-    :param tasks_remaining: Tasks remaining count
-    :param ideal_tasks_remaining: Ideal tasks remaining count
-    :param team_size: Total Team Size in the Current Sprint
-    :return: returns Sprint Json Data
-    """
-    sprint_data = {}
-
-    # Create Sprint data json file
-    if os.path.isfile('/tmp/' + sprint_data_file_name):
-        sprint_data = json.load(open('/tmp/' + sprint_data_file_name, 'r'))
-    else:
-        with open('/tmp/' + sprint_data_file_name, "w") as sprint_data_file:
-            json.dump({}, sprint_data_file)
-        sprint_data_file.close()
-
-    # Update Sprint Data in json file
-    if current_day == start_day:
-        sprint_data.update({ board_id: {} })
-        for sprint_date in sprint_dates:
-            sprint_data[board_id].update( { 'ideal_tasks_remaining': 0, sprint_date: { 'stories_defects_remaining': 0, 'stories_defects_done': 0 } } )
-        sprint_data[board_id].update( {
-                'ideal_tasks_remaining': ideal_tasks_remaining,
-                current_date: {
-                'stories_defects_remaining': stories_defects_remaining,
-                'stories_defects_done': stories_defects_done,
-                'tasks_remaining': tasks_remaining,
-                'team_size': team_size
-                }
-            }
-        )
-    else:
-        sprint_data[board_id].update( {
-                current_date: {
-                'stories_defects_remaining': stories_defects_remaining,
-                'stories_defects_done': stories_defects_done,
-                'tasks_remaining': tasks_remaining,
-                'team_size': team_size
-                }
-            }
-        )
-    with open('/tmp/' + sprint_data_file_name, "w") as sprint_data_file:
-        json.dump(sprint_data, sprint_data_file)
-    sprint_data_file.close()
-
-    return sprint_data
-
-
-# Create Sprint Burndown Chart
-def create_chart(sprint_data, total_sprint_days, board_id, team_members, team_members_days_ooo, is_show_team_size):
-    """
-    Creates Sprint Burndown Chart
-    :param sprint_data: The Sprint Data
-    :param total_sprint_days: Total Sprint Days in the Current Sprint without Weekends Eg: 5 (Multiples of 5)
-    :param board_id: The ID of the Board
-    :param team_members: Team members on Team for Sprint
-    :param team_members_days_ooo: Team Members Days Out of Office
-    :param is_show_team_size: To enable Team Size in Sprint Burndown Chart
-    :return: returns nothing
-    """
-    sprint_dates_list = [""]
-    stories_defects_remaining_list = [0]
-    stories_defects_done_list = [0]
-    tasks_remaining_list = []
-    team_size_list = [0]
-
-    ideal_tasks_remaining = sprint_data[board_id]['ideal_tasks_remaining']
-
-    tasks_remaining_list.append(ideal_tasks_remaining)
-
-    for key, value in sprint_data[board_id].items():
-        if key != 'ideal_tasks_remaining':
-            sprint_dates_list.append(key)
-            stories_defects_remaining_list.append(value['stories_defects_remaining'])
-            stories_defects_done_list.append(value['stories_defects_done'])
-            if value.get('tasks_remaining') or value.get('tasks_remaining') == 0:
-                tasks_remaining_list.append(value['tasks_remaining'])
-            if value.get('team_size') or value.get('team_size') == 0:
-                team_size_list.append(value['team_size'])
-
-    team_size_list[0] = team_size_list[1]
-
-    f, ax = plt.subplots()
-
-    x_axis = [item for item in range(0, total_sprint_days + 1)]
-    x_axis_label = sprint_dates_list
-
-    y_axis_labels = [0]
-    ideal_line_list = [0]
-    ax.axhline(y=0,color='#d0e2f6',linewidth=.5, zorder=0)
-    for index in range(0, total_sprint_days):
-        y_axis_label = y_axis_labels[index] + round((max(tasks_remaining_list)/total_sprint_days) + 0.5)
-        ideal_line = ideal_line_list[index] + (ideal_tasks_remaining/total_sprint_days)
-        y_axis_labels.append(y_axis_label)
-        ideal_line_list.append(ideal_line)
-        ax.axhline(y=y_axis_labels[index + 1],color='#d0e2f6',linewidth=.5, zorder=0)
-
-    ax.set_xticks(x_axis)
-    ax.set_xticklabels(x_axis_label,rotation=40,ha='right')
-    ax.set_yticks(y_axis_labels)
-    ax.set_yticklabels(y_axis_labels)
-
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    ax.spines['bottom'].set_visible(False)
-    ax.spines['left'].set_visible(False)
-
-    plt.tick_params(
-        axis='both',       # changes apply to the x-axis
-        which='both',      # both major and minor ticks are affected
-        bottom=False,      # ticks along the bottom edge are off
-        left=False,        # ticks along the top edge are off
-        labelbottom=True,
-        labelsize=6,
-        pad=4
-    )
-
-    if is_show_team_size:
-        plt.fill_between(np.arange(len(team_size_list)), 0, team_size_list, color='#ff9f68', alpha=0.5, lw=0)
-        p6, = plt.plot(np.arange(len(team_size_list)),team_size_list,'k--',color='#ff9f68', label='line 1',zorder=1)
-        for index in range(0, len(team_size_list)):
-            plt.annotate(xy=[index, team_size_list[index]], s=str(team_size_list[index]), color='#ff9f68', size=6, ha='center', va='bottom', textcoords="offset points", xytext=(2, 3))
-
-    p3 = plt.bar(np.arange(len(stories_defects_remaining_list)), stories_defects_remaining_list, color='#c5e3f6',width=-.25,align='edge',zorder=2)
-    p4 = plt.bar(np.arange(len(stories_defects_done_list)), stories_defects_done_list, color='#17b978',width=.25,align='edge', zorder=2)
-    p5 = plt.bar(np.arange(len(team_members_days_ooo)) -.5, team_members_days_ooo, color='#ffcef3',width=.25,align='edge', zorder=2)
-    p1, = plt.plot(x_axis,[element for element in reversed(ideal_line_list)],'k',label='line 3',linewidth=.7, zorder=4)
-    p2, = plt.plot(np.arange(len(tasks_remaining_list)),tasks_remaining_list,'--',color='#482ff7', label='line 1', zorder=5)
-
-    def autolabel(rects):
-        """Attach a text label above each bar in *rects*, displaying its height."""
-        for rect in rects:
-            height = rect.get_height()
-            if height != 0:
-                ax.annotate('{}'.format(height),
-                            xy=(rect.get_x() + rect.get_width() / 2, height /2),
-                            xytext=(0, -3),  # 3 points vertical offset
-                            textcoords="offset points",
-                            ha='center', va='bottom', size=6)
-
-    autolabel(p3)
-    autolabel(p4)
-    autolabel(p5)
-
-    for index in range(0, len(tasks_remaining_list)):
-        plt.annotate(xy=[index, tasks_remaining_list[index]], s=str(tasks_remaining_list[index]), color='#482ff7', size=6, ha='center', va='bottom', textcoords="offset points", xytext=(2, 3))
-
-    plt.title("Burndown Chart")
-
-    on_team_for_sprint = ['On Team for Sprint', '\n']
-
-    on_team_for_sprint.extend(team_members)
-
-    plt.text(.02, 0.1, "\n".join(on_team_for_sprint), fontsize=5, transform=plt.gcf().transFigure)
-    plt.subplots_adjust(left=0.2)
-
-    if is_show_team_size:
-        plt.legend([p1,p2,p3, p4, p5, p6], ["Ideal Tasks Remaining","Tasks Remaining","Stories/Defects Remaining", "Stories/Defects Done", "Team Members Days OOO","Team Size"], loc=1, borderaxespad=0,fontsize=6).get_frame().set_alpha(0.5)
-    else:
-        plt.legend([p1,p2,p3, p4, p5], ["Ideal Tasks Remaining","Tasks Remaining","Stories/Defects Remaining", "Stories/Defects Done", "Team Members Days OOO"], loc=1, borderaxespad=0,fontsize=6).get_frame().set_alpha(0.5)
-
-    plt.savefig('/tmp/' + current_date + '_Sprint_Burndown_Chart_' + board_id, dpi=150)
-
-
-# Delete previously attached Chart from the card
-def delete_chart(client, card_id):
-    """
-    Deletes already existing Sprint Burndown chart
-    :param client: Trello client Object
-    :param card_id: The ID of the Card
-    :return: returns None
-    """
-    try:
-        card_attachments = client.fetch_json(
-            f"cards/{card_id}/attachments",
-            http_method="GET",
-            headers = {
-                    "Accept": "application/json"
-                }
-        )
-        for card_attachment in card_attachments:
-            if current_date in card_attachment['name']:
-                client.fetch_json(
-                        f"cards/{card_id}/attachments/{card_attachment['id']}",
-                        http_method="DELETE",
-                        headers = {
-                                "Accept": "application/json"
-                        }
-                    )
-    except Exception as error:
-        print(error)
-        pass
-
-
-# Attach Chart to the Card
-def attach_chart(client, card_id, board_id):
-    """
-    Attaches Sprint Burndown chart to a card
-    :param client: Trello client Object
-    :param card_id: The ID of the Card
-    :param board_id: The ID of the Board
-    :return: returns None
-    """
-    image_path = '/tmp/' + current_date + '_Sprint_Burndown_Chart_' + board_id + '.png'
-    try:
-        attachment_response = client.fetch_json(
-            f"cards/{card_id}/attachments",
-            http_method="POST",
-            files = {
-                'file': (current_date + '_Sprint_Burndown_Chart.png', open(image_path, 'rb')),
-            },
-            headers = {
-                    "Accept": "application/json"
-            }
-        )
-
-        # Delete Chart locally
-        os.remove(image_path)
-    except Exception as error:
-        print(error)
-        pass
-
-
-# Success Status Method
-def success():
-    """
-    Success Status Method
-    :return: returns Success Status Code
-    """
-    return {"statusCode": 200}
+    rollups = {}
+    for organization_id, tenant in sweep_tenants.items():
+        try:
+            published = publish_rollup_chart(tenant, list(enabled_boards[organization_id]), download_history(s3, DEPLOYMENT_BUCKET, prefix=tenant.prefix), s3)
+            rollups[organization_id] = published and published['url']
+        except Exception as error:
+            print(f'{error}: Error publishing the rollup Chart of the Trello Organization - {organization_id}')
+    return rollups
 
 
 def trelloSprintBurndown(event, context):
     """
-    Scheduled Event to update Sprint Burndown Chart in Trello
-    :param event: Event data
+    Scheduled Event to update Sprint Burndown Chart in Trello. Boards with the oldest Chart go first, the Boards of
+    every tenant take turns, and before the invocation runs out of time the sweep cursor is saved and the sweep continues
+    in a new invocation
+    :param event: Event data, {"sweep_id": "..."} when continuing a sweep
     :param context: This object provides methods and properties that provide information about the invocation, function and execution environment
     :return: returns status
     """
-    # Connect to Trello
-    client = TrelloClient(
-            api_key=TRELLO_API_KEY,
-            token=TRELLO_TOKEN
-    )
+    # The date of this invocation, a warm container outlives midnight
+    current_day = set_current_date()[0]
 
+    memory.start()
 
     # S3 Client
-    s3 = boto3.resource('s3')
+    s3 = clients.s3()
+
+    event = event or {}
+
+    def save_cursor(cursor):
+        upload_cursor(s3, DEPLOYMENT_BUCKET, cursor)
 
     if current_day not in ('Saturday', 'Sunday'):
-        # Get Organizations Boards
-        boards = Organization(client, TRELLO_ORGANIZATION_ID).all_boards()
+        sweep_tenants = OrderedDict((tenant.organization_id, tenant) for tenant in tenants.all())
+        board_registries = OrderedDict((organization_id, download_registry(s3, DEPLOYMENT_BUCKET, tenant.prefix)) for organization_id, tenant in sweep_tenants.items())
+
+        if event.get('sweep_id'):
+            # Continue a sweep from its cursor, unless a newer scheduled run replaced it
+            cursor = download_cursor(s3, DEPLOYMENT_BUCKET)
+            if cursor is None or cursor['sweep_id'] != event['sweep_id']:
+                print(f"Sweep {event['sweep_id']} was replaced by a newer sweep")
+                return success()
+            # Cursors saved before tenants hold the Board IDs of the Organization of the deployment
+            cursor['remaining'] = [entry if isinstance(entry, list) else [tenants.default_tenant.organization_id, entry] for entry in cursor['remaining']]
+        else:
+            board_queues = []
+            for organization_id, tenant in sweep_tenants.items():
+                board_registry = board_registries[organization_id]
+
+                # Get Boards with the PowerUp enabled, the Organization is only scanned when the Registry is due
+                if board_registry.needs_reconcile():
+                    reconcile_registry(RateLimitedClient(tenant.clients.trello(), tenant.rate_limiter), board_registry, organization_id, tenant.powerup_name)
+                    upload_registry(s3, DEPLOYMENT_BUCKET, board_registry, tenant.prefix)
+
+                # Boards skipped by an earlier run that ran out of time are the stalest and come first
+                board_ids = order_by_staleness([board_id for board_id, powerup_data in board_registry.enabled_boards()], download_history(s3, DEPLOYMENT_BUCKET, prefix=tenant.prefix))
+                board_queues.append([[organization_id, board_id] for board_id in board_ids])
+
+            # Tenants take turns, so every batch holds Boards of every Organization and a large one does not hold back the others
+            cursor = new_cursor(interleave(board_queues))
+
+            # Continuations of an older sweep stop once they see the new cursor
+            save_cursor(cursor)
+
+        # Boards that disabled the PowerUp, or whose Organization left the tenant config, since the sweep started are dropped
+        enabled_boards = {organization_id: dict(board_registry.enabled_boards()) for organization_id, board_registry in board_registries.items()}
+        cursor['remaining'] = [[organization_id, board_id] for organization_id, board_id in cursor['remaining'] if board_id in enabled_boards.get(organization_id, {})]
+
+        report = {'sweep_id': cursor['sweep_id'], 'continuations': cursor['continuations'], 'tenants': len(sweep_tenants), 'boards': len(cursor['remaining']), 'processed': [], 'skipped': [], 'rendered': [], 'enqueued': [], 'suppressed': [], 'failed': {}}
+
+        if SWEEP_WORKER_FUNCTION and len(cursor['remaining']) > SWEEP_SHARD_SIZE:
+            # Fan out the Boards of every tenant to concurrent shard workers, the tenants split the worker concurrency
+            invoker = LambdaShardInvoker(SWEEP_WORKER_FUNCTION, clients.lambda_client())
+            max_concurrency = max(1, SWEEP_MAX_CONCURRENCY // len(group_by_tenant(cursor['remaining'])))
+            deadline = Deadline(context)
+            not_run = set()
+
+            def sweep_tenant(organization_id, board_ids):
+                tenant_report = sweep(board_ids, enabled_boards[organization_id], invoker, s3, DEPLOYMENT_BUCKET, max_concurrency=max_concurrency, tenant=sweep_tenants[organization_id], deadline=deadline)
+                not_run.update((organization_id, board_id) for board_id in tenant_report['remaining'])
+                return tenant_report
+
+            merge_report(report, process_tenant_boards(cursor['remaining'], sweep_tenant))
+
+            # Shards that were not started before the deadline are left in the cursor for a continuation
+            remaining = [entry for entry in cursor['remaining'] if tuple(entry) in not_run]
+            cursor['completed'] += len(cursor['remaining']) - len(remaining)
+            cursor['remaining'] = remaining
+            save_cursor(cursor)
+
+            report['remaining'] = len(cursor['remaining'])
+            is_out_of_time = bool(cursor['remaining'])
+            if is_out_of_time:
+                report['continued'] = continue_sweep(clients.lambda_client(), context.function_name, cursor, save_cursor)
+        else:
+            # Record, render and attach the Charts batch by batch until the deadline
+            batch_reports, is_out_of_time = run_with_checkpoints(cursor, lambda batch: process_tenant_boards(batch, lambda organization_id, board_ids: process_boards(board_ids, {
+                'tenant': sweep_tenants[organization_id],
+                's3': s3,
+                'powerup_data': enabled_boards[organization_id],
+                'throttle': False
+            })), save_cursor, Deadline(context))
+
+            for batch_report in batch_reports:
+                merge_report(report, batch_report)
+
+            report['remaining'] = len(cursor['remaining'])
+            if is_out_of_time:
+                report['continued'] = continue_sweep(clients.lambda_client(), context.function_name, cursor, save_cursor)
+
+        # The invocation that finishes the sweep publishes the rollup of the whole Organization once
+        if ROLLUP_CHART and not is_out_of_time:
+            report['rollups'] = publish_rollups(s3, sweep_tenants, enabled_boards)
+
+        print(json.dumps({'boards': report, 'clients': tenants.report()}))
+
+        memory.log()
+
+    # Return Success
+    return success()
+
+
+def sweepShardSprintBurndown(event, context):
+    """
+    Shard worker of the scheduled sweep, processes the Boards of one shard
+    :param event: Shard payload from sweep_coordinator.sweep with sweep_id, shard, tenant, board_ids, powerup_data, history_key and trello_rate_limit_requests
+    :param context: This object provides methods and properties that provide information about the invocation, function and execution environment
+    :return: returns dict of shard, history_key and the process_boards report
+    """
+    set_current_date()
+
+    memory.start()
 
-        for board in boards:
-            # Download Sprint data and Card Attachment data files from S3
-            try:
-                s3.Bucket(DEPLOYMENT_BUCKET).download_file(sprint_data_file_name, '/tmp/' + sprint_data_file_name)
-            except Exception as error:
-                print(error)
-                pass
+    tenant = tenants.get(event.get('tenant'))
 
-            # Get PowerUp Data
-            powerup_data = get_powerup_data(client, board.id)
+    # A budget shared through TRELLO_BUDGET_TABLE already holds the shards together, without it the shard gets its split of the budget
+    rate_limiter = tenant.rate_limiter if isinstance(tenant.rate_limiter, SharedRateLimiter) else RateLimiter(event.get('trello_rate_limit_requests') or tenant.rate_limit_requests)
 
-            # Check PowerUp Data exists
-            if powerup_data is not None:
-                try:
-                    sprint_start_day = json.loads(powerup_data)['sprint_start_day']
-                    total_sprint_days = int(json.loads(powerup_data)['total_sprint_days'])
+    # The Sprint History of the shard Boards is written to the shard key and merged by the coordinator
+    report = process_boards(event['board_ids'], {
+        'tenant': tenant,
+        'powerup_data': event.get('powerup_data') or {},
+        'history_key': event['history_key'],
+        'rate_limiter': rate_limiter,
+        'throttle': False
+    })
 
-                    # Get monitor lists
-                    monitor_lists = json.loads(powerup_data)['selected_list']
+    print(json.dumps({'sweep_id': event.get('sweep_id'), 'shard': event.get('shard'), 'tenant': tenant.organization_id, 'boards': report, 'clients': tenant.clients.report()}))
 
-                    # Get Done lists
-                    done_list = json.loads(powerup_data)['selected_done_list']
+    memory.log()
 
-                    # Get counts of Stories/Tasks
-                    stories_defects_remaining, stories_defects_done, tasks_remaining, ideal_tasks_remaining = get_counts(client, board.id, monitor_lists, done_list, sprint_start_day)
+    return {'shard': event.get('shard'), 'history_key': event['history_key'], 'report': report}
 
-                    print(f'Board ID: {board.id}')
-                    print(f'Stories Remaining: {stories_defects_remaining}')
-                    print(f'Stories Done: {stories_defects_done}')
-                    print(f'Tasks Remaining: {tasks_remaining}')
-                    print(f'Ideal Tasks Remaining: {ideal_tasks_remaining}')
 
-                    # Current Sprint Dates
-                    sprint_dates = get_sprint_dates(sprint_start_day, (total_sprint_days - 1), board.id)
+def backfillSprintBurndown(event, context):
+    """
+    Rebuilds missing days of the current Sprint from the Trello Action history
+    :param event: Event data, optional 'board_ids' list of Boards to backfill, defaults to the Enabled Board Registry, and optional
+                  'tenant' Organization ID of the Boards, defaults to the Organization of the deployment. Eg: {"board_ids": ["5ea..."]}
+    :param context: This object provides methods and properties that provide information about the invocation, function and execution environment
+    :return: returns status
+    """
+    # The date of this invocation, a warm container outlives midnight
+    current_date = set_current_date()[1]
+
+    tenant = tenants.get((event or {}).get('tenant'))
 
-                    print(f'Start Date: {sprint_dates[0]} End Date: {sprint_dates[len(sprint_dates)-1]}')
+    # Connect to Trello with the credentials of the tenant
+    client = RateLimitedClient(tenant.clients.trello(), tenant.rate_limiter)
 
-                    team_members = json.loads(powerup_data)['team_member_list']
+    # S3 Client
+    s3 = tenant.clients.s3()
 
-                    is_show_team_size = eval(json.loads(powerup_data).get('is_show_team_size', 'False'))
+    # Download Sprint History from S3
+    sprint_history = download_history(s3, DEPLOYMENT_BUCKET, prefix=tenant.prefix)
 
-                    team_members_days_ooo = json.loads(powerup_data)['team_members_days_ooo']
+    board_ids = (event or {}).get('board_ids') or [board_id for board_id, powerup_data in download_registry(s3, DEPLOYMENT_BUCKET, tenant.prefix).enabled_boards()]
 
-                    team_members_days_ooo = team_members_days_ooo.split(",")
+    boards = []
+    for board_id in board_ids:
+        # Get PowerUp Data
+        powerup_data = get_powerup_data(client, board_id, tenant.powerup_name)
 
-                    team_members_days_ooo_list = [0]
-                    for ooo_per_day in team_members_days_ooo:
-                        team_members_days_ooo_list.append(float(ooo_per_day.split("-")[1]))
+        # Check PowerUp Data exists
+        if powerup_data is not None:
+            powerup_data = json.loads(powerup_data)
 
-                    team_size = len(team_members)
+            sprint_dates = current_sprint_dates(powerup_data['sprint_start_day'], int(powerup_data['total_sprint_days']), datetime.datetime.now(cst_timezone).date())
 
-                    # Update sprint data
-                    sprint_data = update_sprint_data(sprint_start_day, board.id, sprint_dates, stories_defects_remaining, stories_defects_done, tasks_remaining, ideal_tasks_remaining, team_size)
+            # Board enabled the PowerUp mid-Sprint
+            if sprint_history.sprint_dates(board_id)[:1] != sprint_dates[:1]:
+                sprint_history.start_sprint(board_id, sprint_dates, 0)
 
-                    # Create Sprint Burndown Chart
-                    create_chart(sprint_data, total_sprint_days, board.id, team_members, team_members_days_ooo_list, is_show_team_size)
+            boards.append({
+                'board_id': board_id,
+                'monitor_lists': powerup_data['selected_list'],
+                'done_list': powerup_data['selected_done_list'],
+                'sprint_dates': sprint_dates,
+                'missing_dates': sprint_history.missing_dates(board_id, current_date),
+                'unit': powerup_data.get('burndown_unit', COUNT_UNIT),
+                'story_points_field': powerup_data.get('story_points_field'),
+                'team_size': len(powerup_data['team_member_list'])
+            })
 
-                    attachment_card_id = json.loads(powerup_data)['selected_card_for_attachment']
+    backfilled_counts = backfill_boards(client, boards, current_date)
 
-                    # Delete previously attached Chart from the card
-                    delete_chart(client, attachment_card_id)
+    for board in boards:
+        for sprint_date, (stories_defects_remaining, stories_defects_done, tasks_remaining, tasks_done) in sorted(backfilled_counts.get(board['board_id'], {}).items()):
+            if sprint_date == board['sprint_dates'][0]:
+                sprint_history.start_sprint(board['board_id'], board['sprint_dates'], tasks_remaining + tasks_done)
+            sprint_history.record(board['board_id'], sprint_date, stories_defects_remaining, stories_defects_done, tasks_remaining, board['team_size'])
 
-                    # Attach Chart to Card
-                    attach_chart(client, attachment_card_id, board.id)
+        print(f'Board ID: {board["board_id"]} Backfilled Dates: {sorted(backfilled_counts.get(board["board_id"], {}))}')
 
-                    # Upload Sprint data and Card Attachment data files from S3
-                    try:
-                        s3.Object(DEPLOYMENT_BUCKET, sprint_data_file_name).put(Body=open('/tmp/' + sprint_data_file_name, 'rb'))
-                    except Exception as error:
-                        print(error)
-                        pass
+    # Upload Sprint History to S3
+    upload_history(s3, DEPLOYMENT_BUCKET, sprint_history, key=history_key(tenant.prefix))
 
-                    # Return Success
-                    success()
-                except Exception as error:
-                    print(error)
-                    continue
+    # Return Success
+    return success()
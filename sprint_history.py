@@ -0,0 +1,586 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import json
+import time
+import uuid
+import random
+import shutil
+import numpy as np
+from botocore.exceptions import ClientError
+
+
+# Setting Sprint History and legacy Sprint Data file names
+sprint_history_file_name = 'sprint_history.npz'
+legacy_sprint_data_file_name = 'sprint_data.json'
+
+# Value stored in a day column until the day has been recorded
+NOT_RECORDED = -1
+
+# Intra-day samples falling in the same interval replace each other, bounding raw samples per day
+SAMPLE_INTERVAL_SECONDS = int(os.getenv('SAMPLE_INTERVAL_SECONDS', '900'))
+
+# Conditional writes of a file shared by concurrent invocations, every lost write merges the stored file first
+CONDITIONAL_WRITE_ATTEMPTS = int(os.getenv('CONDITIONAL_WRITE_ATTEMPTS', '8'))
+
+# Longest wait before writing again after the first lost write, doubled after every further one
+CONDITIONAL_WRITE_BACKOFF_SECONDS = float(os.getenv('CONDITIONAL_WRITE_BACKOFF_SECONDS', '0.05'))
+
+# One row per Sprint of a Board
+SPRINT_DTYPE = np.dtype([
+    ('start_date', '<i4'),
+    ('total_sprint_days', '<i2'),
+    ('ideal_tasks_remaining', '<f4'),
+    ('offset', '<i4'),
+])
+
+# One row per Sprint day of a Board, dates are days since 1970-01-01.
+# Counts are floats so that story point burndowns keep fractional points, recorded_at is the Unix time of the last record
+DAY_DTYPE = np.dtype([
+    ('date', '<i4'),
+    ('stories_defects_remaining', '<f4'),
+    ('stories_defects_done', '<f4'),
+    ('tasks_remaining', '<f4'),
+    ('team_size', '<i2'),
+    ('days_ooo', '<f4'),
+    ('recorded_at', '<i8'),
+])
+
+# Raw intra-day samples of a Board, only the latest recorded day is kept
+SAMPLE_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('date', '<i4'),
+    ('stories_defects_remaining', '<f4'),
+    ('stories_defects_done', '<f4'),
+    ('tasks_remaining', '<f4'),
+])
+
+
+# Convert a structured array to a dtype by field name
+def with_fields(array, dtype):
+    """
+    Converts a structured array written with fewer fields, the missing fields are NOT_RECORDED
+    :param array: Structured array
+    :param dtype: Structured dtype holding every field of the array
+    :return: returns structured array of dtype
+    """
+    if array.dtype.names == dtype.names:
+        return array.astype(dtype)
+    converted = np.full(len(array), NOT_RECORDED, dtype=dtype)
+    for name in array.dtype.names:
+        converted[name] = array[name]
+    return converted
+
+
+# Convert a date string to a day number
+def to_day(date_string):
+    """
+    Converts a date string to days since 1970-01-01
+    :param date_string: Date string. Eg: 2020-05-04
+    :return: returns day number
+    """
+    return int(np.datetime64(date_string, 'D').astype(np.int64))
+
+
+# Convert day numbers to date strings
+def to_date_strings(days):
+    """
+    Converts day numbers to date strings
+    :param days: Array of days since 1970-01-01
+    :return: returns list of date strings. Eg: ['2020-05-04']
+    """
+    return np.datetime_as_string(np.asarray(days, dtype='<i4').astype('datetime64[D]')).tolist()
+
+
+class SprintHistory(object):
+    """
+    Append-only columnar Sprint History, every Sprint of every Board is kept
+    """
+
+    def __init__(self):
+        self.boards = {}
+        self.samples = {}
+        # ETag of the stored file the history was downloaded from, None when it was not stored yet
+        self.e_tag = None
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a Sprint History file, every Board is a slice of the shared sprints and days columns
+        :param path: Path of the Sprint History file
+        :return: returns SprintHistory
+        """
+        history = cls()
+        if not os.path.isfile(path):
+            return history
+
+        with np.load(path) as archive:
+            board_ids = archive['board_ids']
+            sprint_ends = np.cumsum(archive['board_sprint_counts'])
+            day_ends = np.cumsum(archive['board_day_counts'])
+            # Files written before the count columns were floats, or before recorded_at, are converted on load
+            sprints = archive['sprints'].astype(SPRINT_DTYPE)
+            days = with_fields(archive['days'], DAY_DTYPE)
+            if 'samples' in archive.files:
+                sample_ends = np.cumsum(archive['board_sample_counts'])
+                samples = archive['samples'].astype(SAMPLE_DTYPE)
+            else:
+                sample_ends = np.zeros(len(board_ids), dtype='<i4')
+                samples = np.zeros(0, dtype=SAMPLE_DTYPE)
+
+        sprint_start = day_start = sample_start = 0
+        for board_id, sprint_end, day_end, sample_end in zip(board_ids.tolist(), sprint_ends.tolist(), day_ends.tolist(), sample_ends.tolist()):
+            history.boards[board_id] = (sprints[sprint_start:sprint_end], days[day_start:day_end])
+            if sample_end > sample_start:
+                history.samples[board_id] = samples[sample_start:sample_end]
+            sprint_start, day_start, sample_start = sprint_end, day_end, sample_end
+
+        return history
+
+    @classmethod
+    def from_legacy(cls, sprint_data):
+        """
+        Converts the legacy nested Sprint Data json into a Sprint History
+        :param sprint_data: Sprint Data dict keyed by Board ID and date
+        :return: returns SprintHistory
+        """
+        history = cls()
+        for board_id, board_data in sprint_data.items():
+            sprint_dates = sorted(key for key in board_data if key != 'ideal_tasks_remaining')
+            if not sprint_dates:
+                continue
+            history.start_sprint(board_id, sprint_dates, board_data.get('ideal_tasks_remaining', 0))
+            for sprint_date in sprint_dates:
+                value = board_data[sprint_date]
+                if 'tasks_remaining' in value:
+                    history.record(
+                        board_id,
+                        sprint_date,
+                        value['stories_defects_remaining'],
+                        value['stories_defects_done'],
+                        value['tasks_remaining'],
+                        value.get('team_size', NOT_RECORDED)
+                    )
+        return history
+
+    def board_ids(self):
+        """
+        Lists the Boards stored in the Sprint History
+        :return: returns list of Board IDs
+        """
+        return sorted(self.boards)
+
+    def board(self, board_id):
+        """
+        Gets the sprints and days arrays of a Board
+        :param board_id: The ID of the Board
+        :return: returns tuple of (sprints, days) structured arrays
+        """
+        if board_id not in self.boards:
+            self.boards[board_id] = (np.zeros(0, dtype=SPRINT_DTYPE), np.zeros(0, dtype=DAY_DTYPE))
+        return self.boards[board_id]
+
+    def start_sprint(self, board_id, sprint_dates, ideal_tasks_remaining):
+        """
+        Appends a new Sprint to the Board, unless it already is the current Sprint
+        :param board_id: The ID of the Board
+        :param sprint_dates: List of Sprint dates
+        :param ideal_tasks_remaining: Ideal tasks remaining count
+        :return: returns nothing
+        """
+        sprints, days = self.board(board_id)
+        start_date = to_day(sprint_dates[0])
+
+        if len(sprints) and sprints['start_date'][-1] == start_date:
+            sprints['ideal_tasks_remaining'][-1] = ideal_tasks_remaining
+            return
+
+        sprint = np.zeros(1, dtype=SPRINT_DTYPE)
+        sprint['start_date'] = start_date
+        sprint['total_sprint_days'] = len(sprint_dates)
+        sprint['ideal_tasks_remaining'] = ideal_tasks_remaining
+        sprint['offset'] = len(days)
+
+        sprint_days = np.full(len(sprint_dates), NOT_RECORDED, dtype=DAY_DTYPE)
+        sprint_days['date'] = [to_day(sprint_date) for sprint_date in sprint_dates]
+        sprint_days['days_ooo'] = 0
+
+        self.boards[board_id] = (np.concatenate([sprints, sprint]), np.concatenate([days, sprint_days]))
+
+    def current_sprint(self, board_id):
+        """
+        Gets the current Sprint of a Board
+        :param board_id: The ID of the Board
+        :return: returns tuple of (sprint row, days view of the Sprint), or (None, None) without Sprints
+        """
+        sprints, days = self.board(board_id)
+        if not len(sprints):
+            return None, None
+        sprint = sprints[-1]
+        return sprint, days[sprint['offset']:sprint['offset'] + sprint['total_sprint_days']]
+
+    def sprint_dates(self, board_id):
+        """
+        Gets the dates of the current Sprint of a Board
+        :param board_id: The ID of the Board
+        :return: returns list of Sprint date strings
+        """
+        sprint, days = self.current_sprint(board_id)
+        if sprint is None:
+            return []
+        return to_date_strings(days['date'])
+
+    def missing_dates(self, board_id, until_date):
+        """
+        Gets the days of the current Sprint up to a date that have not been recorded
+        :param board_id: The ID of the Board
+        :param until_date: Last date string to include. Eg: today
+        :return: returns list of date strings
+        """
+        sprint, days = self.current_sprint(board_id)
+        if sprint is None:
+            return []
+        missing = days[(days['date'] <= to_day(until_date)) & (days['stories_defects_remaining'] == NOT_RECORDED)]
+        return to_date_strings(missing['date'])
+
+    def record(self, board_id, sprint_date, stories_defects_remaining, stories_defects_done, tasks_remaining, team_size, timestamp=None):
+        """
+        Records the counts of a day in the current Sprint, the last record of a day is its end-of-day value
+        :param board_id: The ID of the Board
+        :param sprint_date: Date string of the day
+        :param stories_defects_remaining: Userstories or Defects remaining count
+        :param stories_defects_done: Userstories or Defects done count
+        :param tasks_remaining: Tasks remaining count
+        :param team_size: Total Team Size in the Current Sprint
+        :param timestamp: Unix time of the counts, also kept as an intra-day sample when given
+        :return: returns nothing
+        """
+        sprint, days = self.current_sprint(board_id)
+        if sprint is None:
+            raise KeyError(f'No Sprint started for the Trello Board - {board_id}')
+
+        day = to_day(sprint_date)
+        if day > days['date'][-1]:
+            # Days recorded after the planned end extend the current Sprint, which is always the last one
+            sprints, all_days = self.board(board_id)
+            extra_day = np.full(1, NOT_RECORDED, dtype=DAY_DTYPE)
+            extra_day['date'] = day
+            extra_day['days_ooo'] = 0
+            sprints['total_sprint_days'][-1] += 1
+            self.boards[board_id] = (sprints, np.concatenate([all_days, extra_day]))
+            sprint, days = self.current_sprint(board_id)
+
+        index = np.searchsorted(days['date'], day)
+        if index >= len(days) or days['date'][index] != day:
+            raise KeyError(f'{sprint_date} is not a Sprint date for the Trello Board - {board_id}')
+
+        days[index] = (days['date'][index], stories_defects_remaining, stories_defects_done, tasks_remaining, team_size, days['days_ooo'][index], int(time.time()) if timestamp is None else timestamp)
+
+        if timestamp is not None:
+            self.add_sample(board_id, day, timestamp, stories_defects_remaining, stories_defects_done, tasks_remaining)
+
+    def add_sample(self, board_id, day, timestamp, stories_defects_remaining, stories_defects_done, tasks_remaining):
+        """
+        Adds an intra-day sample, downsampling incrementally as it arrives.
+        Samples of earlier days are dropped since their end-of-day value is already in the day columns,
+        and a sample in the same interval as the previous one replaces it.
+        :param board_id: The ID of the Board
+        :param day: Day number of the sample
+        :param timestamp: Unix time of the sample
+        :param stories_defects_remaining: Userstories or Defects remaining count
+        :param stories_defects_done: Userstories or Defects done count
+        :param tasks_remaining: Tasks remaining count
+        :return: returns nothing
+        """
+        samples = self.samples.get(board_id, np.zeros(0, dtype=SAMPLE_DTYPE))
+        sample = (timestamp, day, stories_defects_remaining, stories_defects_done, tasks_remaining)
+
+        if len(samples) and samples['date'][-1] != day:
+            samples = samples[:0]
+
+        if len(samples) and samples['timestamp'][-1] // SAMPLE_INTERVAL_SECONDS == timestamp // SAMPLE_INTERVAL_SECONDS:
+            samples[-1] = sample
+        else:
+            samples = np.concatenate([samples, np.array([sample], dtype=SAMPLE_DTYPE)])
+
+        self.samples[board_id] = samples
+
+    def intraday_samples(self, board_id, sprint_date):
+        """
+        Gets the raw intra-day samples of a day
+        :param board_id: The ID of the Board
+        :param sprint_date: Date string of the day
+        :return: returns samples structured array, empty once the day is no longer the latest recorded day
+        """
+        samples = self.samples.get(board_id, np.zeros(0, dtype=SAMPLE_DTYPE))
+        return samples[samples['date'] == to_day(sprint_date)]
+
+    def last_updated(self, board_id):
+        """
+        Gets when the counts of a Board were last recorded
+        :param board_id: The ID of the Board
+        :return: returns Unix time of the latest sample, the start of the last recorded day without samples, or 0
+        """
+        samples = self.samples.get(board_id)
+        if samples is not None and len(samples):
+            return int(samples['timestamp'][-1])
+        sprints, days = self.boards.get(board_id, (None, np.zeros(0, dtype=DAY_DTYPE)))
+        recorded_days = days['date'][days['stories_defects_remaining'] != NOT_RECORDED]
+        if len(recorded_days):
+            return int(recorded_days[-1]) * 86400
+        return 0
+
+    def set_days_ooo(self, board_id, days_ooo):
+        """
+        Sets the Team Members Days Out of Office of every day in the current Sprint
+        :param board_id: The ID of the Board
+        :param days_ooo: List of days out of office per Sprint day
+        :return: returns nothing
+        """
+        sprint, days = self.current_sprint(board_id)
+        if sprint is None:
+            return
+        count = min(len(days), len(days_ooo))
+        days['days_ooo'][:count] = days_ooo[:count]
+
+    def subset(self, board_ids):
+        """
+        Gets a Sprint History holding only some Boards, eg: the Boards of one shard of a sweep
+        :param board_ids: list of Board IDs
+        :return: returns SprintHistory sharing the arrays of those Boards
+        """
+        history = SprintHistory()
+        for board_id in board_ids:
+            if board_id in self.boards:
+                history.boards[board_id] = self.boards[board_id]
+            if board_id in self.samples:
+                history.samples[board_id] = self.samples[board_id]
+        return history
+
+    def merge(self, other):
+        """
+        Merges the Boards of another Sprint History day by day, the later recorded value of a day is kept. Days recorded
+        by webhooks while a shard worker ran are not lost when the shard Sprint History is merged
+        :param other: SprintHistory, eg: written by a shard worker
+        :return: returns nothing
+        """
+        for board_id, board in other.boards.items():
+            self.boards[board_id] = board if board_id not in self.boards else merge_board(self.boards[board_id], board)
+        for board_id, samples in other.samples.items():
+            self.samples[board_id] = merge_samples(self.samples.get(board_id), samples)
+
+    def save(self, path):
+        """
+        Writes the Sprint History file
+        :param path: Path of the Sprint History file
+        :return: returns nothing
+        """
+        board_ids = self.board_ids()
+        boards = [self.boards[board_id] for board_id in board_ids]
+        samples = [self.samples.get(board_id, np.zeros(0, dtype=SAMPLE_DTYPE)) for board_id in board_ids]
+
+        with open(path + '.tmp', 'wb') as history_file:
+            np.savez_compressed(
+                history_file,
+                board_ids=np.array(board_ids, dtype=str),
+                board_sprint_counts=np.array([len(sprints) for sprints, days in boards], dtype='<i4'),
+                board_day_counts=np.array([len(days) for sprints, days in boards], dtype='<i4'),
+                sprints=np.concatenate([sprints for sprints, days in boards] or [np.zeros(0, dtype=SPRINT_DTYPE)]),
+                days=np.concatenate([days for sprints, days in boards] or [np.zeros(0, dtype=DAY_DTYPE)]),
+                board_sample_counts=np.array([len(board_samples) for board_samples in samples], dtype='<i4'),
+                samples=np.concatenate(samples or [np.zeros(0, dtype=SAMPLE_DTYPE)])
+            )
+        os.replace(path + '.tmp', path)
+
+
+# Merge two copies of the Sprints of a Board
+def merge_board(board, other):
+    """
+    Merges two copies of the sprints and days of a Board. The copy with the later current Sprint, or the longer one when
+    both have the same current Sprint, gives the Sprints, and every day of a Sprint in both takes the later recorded row
+    :param board: Tuple of (sprints, days) structured arrays
+    :param other: Tuple of (sprints, days) structured arrays
+    :return: returns merged tuple of (sprints, days)
+    """
+    def current_sprint_key(sprints):
+        return (int(sprints['start_date'][-1]), int(sprints['total_sprint_days'][-1])) if len(sprints) else (NOT_RECORDED, 0)
+
+    if current_sprint_key(other[0]) > current_sprint_key(board[0]):
+        board, other = other, board
+    sprints, days = board[0].copy(), board[1].copy()
+    other_sprints, other_days = other
+
+    for start_date, offset, total_sprint_days in zip(sprints['start_date'].tolist(), sprints['offset'].tolist(), sprints['total_sprint_days'].tolist()):
+        matches = np.flatnonzero(other_sprints['start_date'] == start_date)
+        if not len(matches):
+            continue
+        other_sprint = other_sprints[matches[-1]]
+        other_sprint_days = other_days[other_sprint['offset']:other_sprint['offset'] + other_sprint['total_sprint_days']]
+        if not len(other_sprint_days):
+            continue
+        sprint_days = days[offset:offset + total_sprint_days]
+
+        # Rows of the same date, the other copy wins where it was recorded later
+        index = np.minimum(np.searchsorted(other_sprint_days['date'], sprint_days['date']), len(other_sprint_days) - 1)
+        newer = (other_sprint_days['date'][index] == sprint_days['date']) & (other_sprint_days['recorded_at'][index] > sprint_days['recorded_at'])
+        sprint_days[newer] = other_sprint_days[index[newer]]
+
+    return sprints, days
+
+
+# Merge two copies of the intra-day samples of a Board
+def merge_samples(samples, other):
+    """
+    Merges intra-day samples the way add_sample keeps them: only the latest day, and the last sample per interval
+    :param samples: Samples structured array, or None
+    :param other: Samples structured array
+    :return: returns merged samples structured array
+    """
+    if samples is None or not len(samples):
+        return other
+    if not len(other):
+        return samples
+    merged = np.concatenate([samples, other])
+    merged = merged[merged['date'] == merged['date'].max()]
+    merged = merged[np.argsort(merged['timestamp'], kind='stable')]
+    intervals = merged['timestamp'] // SAMPLE_INTERVAL_SECONDS
+    return merged[np.append(intervals[1:] != intervals[:-1], True)]
+
+
+# S3 key of the Sprint History of a tenant
+def history_key(prefix=''):
+    return prefix + sprint_history_file_name
+
+
+# Download Sprint History from S3
+def download_history(s3, bucket, directory='/tmp/', prefix=''):
+    """
+    Downloads the Sprint History, converting the legacy Sprint Data json if no history exists yet
+    :param s3: Boto3 S3 resource
+    :param bucket: S3 Bucket name
+    :param directory: Local directory for the downloaded files
+    :param prefix: S3 prefix of the tenant, see tenants.tenant_prefix
+    :return: returns SprintHistory
+    """
+    # Every download gets its own file, shard workers running in one process download at the same time
+    download_id = uuid.uuid4().hex
+
+    # Only a missing file falls back, any other error would have the empty history uploaded over the stored one
+    try:
+        return load_history_file(s3, bucket, history_key(prefix), directory + download_id + '_' + sprint_history_file_name)
+    except ClientError as error:
+        if not is_not_found(error):
+            raise
+        print(error)
+
+    # Only the Organization of the deployment has a legacy Sprint Data file
+    if prefix:
+        return SprintHistory()
+
+    try:
+        s3.Bucket(bucket).download_file(legacy_sprint_data_file_name, directory + download_id + '_' + legacy_sprint_data_file_name)
+        with open(directory + download_id + '_' + legacy_sprint_data_file_name, 'r') as sprint_data_file:
+            return SprintHistory.from_legacy(json.load(sprint_data_file))
+    except ClientError as error:
+        if not is_not_found(error):
+            raise
+        print(error)
+    finally:
+        if os.path.isfile(directory + download_id + '_' + legacy_sprint_data_file_name):
+            os.remove(directory + download_id + '_' + legacy_sprint_data_file_name)
+
+    return SprintHistory()
+
+
+# Check an S3 error is a missing object
+def is_not_found(error):
+    return error.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound')
+
+
+# Check an S3 error is a conditional write that lost to another writer
+def is_write_conflict(error):
+    return is_not_found(error) or error.response['Error']['Code'] in ('409', '412', 'ConditionalRequestConflict', 'PreconditionFailed')
+
+
+# Conditions of an S3 write over a downloaded file
+def write_conditions(e_tag):
+    """
+    Gets the put arguments that only write over the file that was downloaded
+    :param e_tag: ETag of the downloaded file, None when it was not stored yet
+    :return: returns dict of put arguments
+    """
+    return {'IfNoneMatch': '*'} if e_tag is None else {'IfMatch': e_tag}
+
+
+# Wait before writing a file again that another writer changed
+def write_conflict_backoff(attempt):
+    """
+    Sleeps a random share of the backoff, so writers that lost to each other do not retry together
+    :param attempt: Number of the write that was lost, 0 for the first
+    :return: returns nothing
+    """
+    time.sleep(random.uniform(0, CONDITIONAL_WRITE_BACKOFF_SECONDS * 2 ** attempt))
+
+
+# Download one Sprint History file from S3
+def load_history_file(s3, bucket, key, path):
+    """
+    Downloads and loads a Sprint History file, the local copy is removed once loaded
+    :param s3: Boto3 S3 resource
+    :param bucket: S3 Bucket name
+    :param key: S3 key of the Sprint History file
+    :param path: Local path for the downloaded file
+    :return: returns SprintHistory with the ETag of the file
+    """
+    try:
+        # The ETag comes with the body it belongs to, a later write cannot slip between them
+        response = s3.Object(bucket, key).get()
+        with open(path, 'wb') as history_file:
+            shutil.copyfileobj(response['Body'], history_file)
+        history = SprintHistory.load(path)
+        history.e_tag = response['ETag']
+        return history
+    finally:
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+# Upload Sprint History to S3
+def upload_history(s3, bucket, history, directory='/tmp/', key=sprint_history_file_name, attempts=CONDITIONAL_WRITE_ATTEMPTS):
+    """
+    Saves and uploads the Sprint History over the file it was downloaded from. When another invocation wrote the file
+    since, the stored file is downloaded and merged into the history, and the upload is tried again
+    :param s3: Boto3 S3 resource
+    :param bucket: S3 Bucket name
+    :param history: SprintHistory to upload, it holds the merged days and the new ETag once uploaded
+    :param directory: Local directory for the saved file
+    :param key: S3 key of the Sprint History file, eg: the key of a shard
+    :param attempts: Conditional writes before the conflict is raised
+    :return: returns SprintHistory as uploaded
+    """
+    for attempt in range(attempts):
+        # Every upload saves its own file, invocations running in one process upload at the same time
+        path = directory + uuid.uuid4().hex + '_' + os.path.basename(key)
+        history.save(path)
+        try:
+            with open(path, 'rb') as history_file:
+                response = s3.Object(bucket, key).put(Body=history_file, **write_conditions(history.e_tag))
+            history.e_tag = response['ETag']
+            return history
+        except ClientError as error:
+            if not is_write_conflict(error) or attempt == attempts - 1:
+                raise
+        finally:
+            os.remove(path)
+
+        # The days recorded by the other writer are kept, the later recorded value of a day wins
+        print(f'Sprint History {key} changed since it was downloaded, merging it before writing again')
+        write_conflict_backoff(attempt)
+        try:
+            stored = load_history_file(s3, bucket, key, directory + uuid.uuid4().hex + '_' + os.path.basename(key))
+        except ClientError as error:
+            if not is_not_found(error):
+                raise
+            stored = SprintHistory()
+        history.merge(stored)
+        history.e_tag = stored.e_tag
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import json
+import time
+import uuid
+from botocore.exceptions import ClientError
+
+
+# Boards processed between two checks of the remaining invocation time
+SWEEP_BATCH_SIZE = int(os.getenv('SWEEP_BATCH_SIZE', '20'))
+
+# Milliseconds kept free before the Lambda timeout to save the cursor and continue the sweep
+SWEEP_DEADLINE_RESERVE_MS = int(os.getenv('SWEEP_DEADLINE_RESERVE_MS', '30000'))
+
+# Invocations a sweep may continue in before the rest is left to the next scheduled run
+SWEEP_MAX_CONTINUATIONS = int(os.getenv('SWEEP_MAX_CONTINUATIONS', '5'))
+
+# Sweep cursor in the deployment bucket
+SWEEP_CURSOR_KEY = 'sweep_cursor.json'
+
+
+# Order Boards by the age of their Chart
+def order_by_staleness(board_ids, sprint_history):
+    """
+    Orders Boards so that the ones updated longest ago come first, Boards never updated lead
+    :param board_ids: list of Board IDs
+    :param sprint_history: SprintHistory of all Boards
+    :return: returns list of Board IDs
+    """
+    return sorted(board_ids, key=sprint_history.last_updated)
+
+
+# Start a Sweep Cursor
+def new_cursor(board_ids):
+    """
+    Creates the cursor of a new sweep
+    :param board_ids: list of Board IDs or [organization_id, board_id] entries in processing order
+    :return: returns cursor dict
+    """
+    return {
+        'sweep_id': uuid.uuid4().hex,
+        'started_at': time.time(),
+        'remaining': list(board_ids),
+        'completed': 0,
+        'continuations': 0
+    }
+
+
+# Download the Sweep Cursor
+def download_cursor(s3, bucket):
+    """
+    Reads the cursor of the latest sweep
+    :param s3: Boto3 S3 resource
+    :param bucket: S3 Bucket name
+    :return: returns cursor dict, None without a cursor
+    """
+    try:
+        return json.loads(s3.Object(bucket, SWEEP_CURSOR_KEY).get()['Body'].read())
+    except ClientError as error:
+        if error.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+
+
+# Upload the Sweep Cursor
+def upload_cursor(s3, bucket, cursor):
+    """
+    Writes the cursor of the sweep, a newer sweep replaces the cursor of an older one
+    :param s3: Boto3 S3 resource
+    :param bucket: S3 Bucket name
+    :param cursor: cursor dict
+    :return: returns nothing
+    """
+    s3.Object(bucket, SWEEP_CURSOR_KEY).put(Body=json.dumps(cursor).encode())
+
+
+class Deadline(object):
+    """
+    Remaining time of the invocation, unlimited without a Lambda context
+    """
+
+    def __init__(self, context, reserve_ms=SWEEP_DEADLINE_RESERVE_MS):
+        self.context = context
+        self.reserve_ms = reserve_ms
+
+    def remaining_ms(self):
+        if self.context is None:
+            return float('inf')
+        return self.context.get_remaining_time_in_millis()
+
+    def has_time_for(self, estimate_ms):
+        """
+        Checks that work taking estimate_ms still finishes before the reserve
+        :param estimate_ms: Expected milliseconds of the work
+        :return: returns True when it fits
+        """
+        return self.remaining_ms() - estimate_ms > self.reserve_ms
+
+
+# Process the Boards of a cursor until the deadline
+def run_with_checkpoints(cursor, process_batch, save_cursor, deadline, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Processes the remaining Boards of the cursor batch by batch and saves the cursor after every batch,
+    a batch is only started when the slowest batch so far still fits before the deadline reserve
+    :param cursor: cursor dict, updated in place
+    :param process_batch: Function processing a list of cursor entries, returns a process_boards report
+    :param save_cursor: Function persisting the cursor
+    :param deadline: Deadline of the invocation
+    :param batch_size: Boards per batch
+    :return: returns tuple of (list of batch reports, True when Boards are left for a continuation)
+    """
+    reports = []
+    slowest_batch_ms = 0
+    while cursor['remaining']:
+        if not deadline.has_time_for(slowest_batch_ms):
+            return reports, True
+
+        batch = cursor['remaining'][:batch_size]
+        started = time.time()
+        reports.append(process_batch(batch))
+        slowest_batch_ms = max(slowest_batch_ms, (time.time() - started) * 1000)
+
+        cursor['remaining'] = cursor['remaining'][len(batch):]
+        cursor['completed'] += len(batch)
+        save_cursor(cursor)
+
+    return reports, False
+
+
+# Continue the sweep in a new invocation
+def continue_sweep(lambda_client, function_name, cursor, save_cursor, max_continuations=SWEEP_MAX_CONTINUATIONS):
+    """
+    Invokes the function again asynchronously for the remaining Boards of the cursor
+    :param lambda_client: Boto3 Lambda client
+    :param function_name: Name of the running function, from the Lambda context
+    :param cursor: cursor dict
+    :param save_cursor: Function persisting the cursor
+    :param max_continuations: Invocations a sweep may continue in
+    :return: returns True when a continuation was invoked, False when the rest is left to the next scheduled run
+    """
+    if cursor['continuations'] >= max_continuations:
+        print(f"Sweep {cursor['sweep_id']} stopped after {cursor['continuations']} continuations, {len(cursor['remaining'])} Boards left for the next run")
+        return False
+
+    cursor['continuations'] += 1
+    save_cursor(cursor)
+    lambda_client.invoke(
+        FunctionName=function_name,
+        InvocationType='Event',
+        Payload=json.dumps({'sweep_id': cursor['sweep_id']}).encode()
+    )
+    return True
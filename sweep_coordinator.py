@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import json
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from sprint_history import history_key, download_history, upload_history, load_history_file
+from webhook_reconciler import TRELLO_RATE_LIMIT_REQUESTS
+from burndown_engine import merge_report
+
+
+# Lambda function processing one shard of the scheduled sweep, the sweep runs in one invocation without it
+try:
+    SWEEP_WORKER_FUNCTION = os.getenv('SWEEP_WORKER_FUNCTION')
+except Exception:
+    print('SWEEP_WORKER_FUNCTION value missing in Lambda Environment Variable')
+
+# Boards per shard, a shard has to finish within the worker timeout
+SWEEP_SHARD_SIZE = int(os.getenv('SWEEP_SHARD_SIZE', '50'))
+
+# Invocations of a shard before it is reported as failed
+SWEEP_SHARD_ATTEMPTS = int(os.getenv('SWEEP_SHARD_ATTEMPTS', '2'))
+
+# Shard workers running at the same time
+SWEEP_MAX_CONCURRENCY = int(os.getenv('SWEEP_MAX_CONCURRENCY', '10'))
+
+# Timeout of the shard worker, a shard is only started when the coordinator has time left to wait for it
+SWEEP_WORKER_TIMEOUT_MS = int(os.getenv('SWEEP_WORKER_TIMEOUT_MS', '300000'))
+
+# S3 prefix of the Sprint History files written by shard workers
+SWEEP_HISTORY_PREFIX = 'sprint_history_shards/'
+
+
+class ShardError(Exception):
+    """
+    A shard worker invocation failed
+    """
+    pass
+
+
+# Split Boards into shards
+def shard_boards(board_ids, shard_size=SWEEP_SHARD_SIZE):
+    """
+    Splits the Boards of a sweep into shards of at most shard_size Boards
+    :param board_ids: list of Board IDs
+    :param shard_size: Boards per shard
+    :return: returns list of Board ID lists
+    """
+    return [board_ids[index:index + shard_size] for index in range(0, len(board_ids), shard_size)]
+
+
+# S3 key of the Sprint History of a shard
+def shard_history_key(sweep_id, shard):
+    return f'{SWEEP_HISTORY_PREFIX}{sweep_id}/shard-{shard}.npz'
+
+
+class ShardInvoker(ABC):
+    """
+    Runs the worker of one shard and returns its result
+    """
+
+    @abstractmethod
+    def invoke(self, payload):
+        """
+        Processes one shard
+        :param payload: Shard payload with sweep_id, shard, tenant, board_ids, powerup_data, history_key and trello_rate_limit_requests
+        :return: returns worker result dict
+        """
+
+
+class LocalShardInvoker(ShardInvoker):
+    """
+    Calls the worker in this process, the payload goes through json like a Lambda invocation
+    """
+
+    def __init__(self, worker):
+        self.worker = worker
+
+    def invoke(self, payload):
+        return json.loads(json.dumps(self.worker(json.loads(json.dumps(payload)), None)))
+
+
+class LambdaShardInvoker(ShardInvoker):
+    """
+    Invokes the worker Lambda function synchronously and waits for its result
+    """
+
+    def __init__(self, function_name, lambda_client):
+        self.function_name = function_name
+        self.lambda_client = lambda_client
+
+    def invoke(self, payload):
+        response = self.lambda_client.invoke(
+            FunctionName=self.function_name,
+            InvocationType='RequestResponse',
+            Payload=json.dumps(payload).encode()
+        )
+        result = json.loads(response['Payload'].read() or 'null')
+        if response.get('FunctionError'):
+            raise ShardError(f"{(result or {}).get('errorType')}: {(result or {}).get('errorMessage')}")
+        return result
+
+
+# Invoke every shard, retrying failed ones
+def fan_out(payloads, invoker, attempts=SWEEP_SHARD_ATTEMPTS, max_concurrency=SWEEP_MAX_CONCURRENCY, deadline=None, on_result=None, worker_timeout_ms=SWEEP_WORKER_TIMEOUT_MS):
+    """
+    Invokes a worker per shard concurrently, a failed shard is invoked again after the shards waiting before it.
+    A shard is only started while the deadline has time for a whole worker invocation
+    :param payloads: list of shard payloads
+    :param invoker: ShardInvoker
+    :param attempts: Invocations of a shard before it is reported as failed
+    :param max_concurrency: Shard workers running at the same time
+    :param deadline: sweep_checkpoint.Deadline of the coordinator, None for no deadline
+    :param on_result: Function called with (shard, result) as every shard finishes
+    :param worker_timeout_ms: Timeout of the shard worker
+    :return: returns tuple of (results by shard index, errors by failed shard index, invocations, shards not run for lack of time)
+    """
+    results = {}
+    errors = {}
+    invocations = 0
+
+    pending = deque((shard, 1) for shard in range(len(payloads)))
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(payloads)))) as executor:
+        while pending or in_flight:
+            while pending and len(in_flight) < max_concurrency and (deadline is None or deadline.has_time_for(worker_timeout_ms)):
+                shard, attempt = pending.popleft()
+                in_flight[executor.submit(invoker.invoke, payloads[shard])] = (shard, attempt)
+                invocations += 1
+            if not in_flight:
+                break
+
+            done, not_done = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                shard, attempt = in_flight.pop(future)
+                try:
+                    results[shard] = future.result()
+                except Exception as error:
+                    print(f'{error}: Error processing shard {shard} attempt {attempt}')
+                    errors[shard] = str(error)
+                    if attempt < attempts:
+                        pending.append((shard, attempt + 1))
+                    continue
+                errors.pop(shard, None)
+                if on_result is not None:
+                    on_result(shard, results[shard])
+
+    # Shards left waiting are run by a continuation of the sweep, not reported as failed
+    not_run = sorted(shard for shard, attempt in pending)
+    for shard in not_run:
+        errors.pop(shard, None)
+
+    return results, errors, invocations, not_run
+
+
+# Scheduled sweep over many Lambda invocations
+def sweep(board_ids, powerup_data, invoker, s3, bucket, shard_size=SWEEP_SHARD_SIZE, attempts=SWEEP_SHARD_ATTEMPTS, max_concurrency=SWEEP_MAX_CONCURRENCY, tenant=None, deadline=None):
+    """
+    Splits the Boards into shards processed by concurrent workers. Workers write the Sprint History of
+    their Boards to their own key, which is merged into the latest Sprint History as soon as the shard finishes,
+    so a coordinator running out of time only leaves the shards it did not start for a continuation.
+    :param board_ids: list of Board IDs of one tenant
+    :param powerup_data: PowerUp Data json per Board ID
+    :param invoker: ShardInvoker
+    :param s3: Boto3 S3 resource
+    :param bucket: S3 Bucket of the Sprint History
+    :param shard_size: Boards per shard
+    :param attempts: Invocations of a shard before it is reported as failed
+    :param max_concurrency: Shard workers running at the same time
+    :param tenant: Tenant of the Boards, None for the Organization of the deployment
+    :param deadline: sweep_checkpoint.Deadline of the coordinator, None for no deadline
+    :return: returns process_boards style report with shards, invocations, failed_shards and the remaining Board IDs of shards not run
+    """
+    sweep_id = uuid.uuid4().hex
+    shards = shard_boards(board_ids, shard_size)
+    prefix = '' if tenant is None else tenant.prefix
+
+    # Workers share the rate limit of the Trello token, each one gets its part of it
+    rate_limit_requests = TRELLO_RATE_LIMIT_REQUESTS if tenant is None else tenant.rate_limit_requests
+    trello_rate_limit_requests = max(1, rate_limit_requests // max(1, min(max_concurrency, len(shards))))
+
+    payloads = [{
+        'sweep_id': sweep_id,
+        'shard': shard,
+        'tenant': None if tenant is None else tenant.organization_id,
+        'board_ids': shard_board_ids,
+        'powerup_data': {board_id: powerup_data.get(board_id) for board_id in shard_board_ids if board_id in powerup_data},
+        'history_key': shard_history_key(sweep_id, shard),
+        'trello_rate_limit_requests': trello_rate_limit_requests
+    } for shard, shard_board_ids in enumerate(shards)]
+
+    report = {'boards': len(board_ids), 'shards': len(shards), 'invocations': 0, 'processed': [], 'skipped': [], 'rendered': [], 'enqueued': [], 'suppressed': [], 'failed': {}, 'failed_shards': {}, 'remaining': []}
+
+    # Merge the Sprint History of a shard into the latest Sprint History. The write is conditional on the ETag it was
+    # downloaded with, when a webhook wrote the Sprint History in between, upload_history merges it and writes again
+    def merge_shard(shard, result):
+        if not result['report']['processed']:
+            return
+        key = result['history_key']
+        try:
+            sprint_history = download_history(s3, bucket, prefix=prefix)
+            sprint_history.merge(load_history_file(s3, bucket, key, '/tmp/' + sweep_id + '_' + os.path.basename(key)))
+            upload_history(s3, bucket, sprint_history, key=history_key(prefix))
+            s3.Object(bucket, key).delete()
+        except Exception as error:
+            print(f'{error}: Error merging the Sprint History of shard {shard}')
+            report['failed_shards'][shard] = f'Sprint History not merged: {error}'
+
+    results, errors, report['invocations'], not_run = fan_out(payloads, invoker, attempts, max_concurrency, deadline, merge_shard)
+
+    for shard in sorted(results):
+        merge_report(report, results[shard]['report'])
+    for shard, error in errors.items():
+        report['failed_shards'][shard] = error
+        for board_id in shards[shard]:
+            report['failed'][board_id] = f'Shard {shard} failed: {error}'
+    for shard in not_run:
+        report['remaining'].extend(shards[shard])
+
+    return report
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from client_registry import ClientRegistry
+from webhook_reconciler import TRELLO_RATE_LIMIT_REQUESTS
+from trello_budget import tenant_rate_limiter
+
+
+try:
+    TRELLO_ORGANIZATION_ID = os.getenv('TRELLO_ORGANIZATION_ID')
+except Exception:
+    print('Trello Organization ID missing in Lambda Environment Variable')
+
+# SSM Parameter holding the json list of the additional Organizations, only TRELLO_ORGANIZATION_ID is served without it
+TENANTS_SSM_PARAMETER_KEY = os.getenv('TENANTS_SSM_PARAMETER_KEY')
+
+# Card the Organization rollup Chart of TRELLO_ORGANIZATION_ID is linked from, the Chart is published without a link when it is not set
+ROLLUP_CARD_ID = os.getenv('ROLLUP_CARD_ID')
+
+# Seconds between checks of the tenant config for added or changed Organizations
+TENANTS_TTL_SECONDS = float(os.getenv('TENANTS_TTL_SECONDS', '300'))
+
+# S3 prefix of the Registry and Sprint History of every Organization but TRELLO_ORGANIZATION_ID
+TENANT_DATA_PREFIX = 'tenants/'
+
+# Trello Organization IDs
+ORGANIZATION_ID_PATTERN = re.compile(r'^[0-9a-fA-F]{24}$')
+
+
+class UnknownTenant(Exception):
+    """
+    The Organization is not in the tenant config
+    """
+    pass
+
+
+# S3 prefix of an Organization
+def tenant_prefix(organization_id, default_organization_id=TRELLO_ORGANIZATION_ID):
+    """
+    Gets the S3 prefix of the data of an Organization, the Organization of the deployment keeps the bucket root
+    :param organization_id: Trello Organization ID, None for the Organization of the deployment
+    :param default_organization_id: TRELLO_ORGANIZATION_ID
+    :return: returns S3 key prefix. Eg: tenants/5ea.../
+    """
+    if not organization_id or organization_id == default_organization_id:
+        return ''
+    return f'{TENANT_DATA_PREFIX}{organization_id}/'
+
+
+# Webhook callback URL of an Organization
+def tenant_callback_url(callback_url, organization_id, default_organization_id=TRELLO_ORGANIZATION_ID):
+    """
+    Gets the callback URL of the webhooks of an Organization, the tenant query parameter tells the handler whose webhook it is
+    :param callback_url: CALLBACK_URL of the deployment
+    :param organization_id: Trello Organization ID
+    :param default_organization_id: TRELLO_ORGANIZATION_ID
+    :return: returns callback URL. Eg: .../prod/trello?tenant=5ea...
+    """
+    if not organization_id or organization_id == default_organization_id:
+        return callback_url
+    return f'{callback_url}?tenant={organization_id}'
+
+
+class Tenant(object):
+    """
+    One Organization served by the deployment, with its own pooled clients, PowerUp name, rate limit budget and S3 prefix
+    """
+
+    def __init__(self, organization_id, clients, powerup_name, rate_limit_requests=TRELLO_RATE_LIMIT_REQUESTS, default_organization_id=TRELLO_ORGANIZATION_ID, rollup_card_id=None):
+        self.organization_id = organization_id
+        self.clients = clients
+        self.powerup_name = powerup_name
+        self.rate_limit_requests = rate_limit_requests
+        self.rollup_card_id = rollup_card_id
+        # Trello limits every token on its own. With TRELLO_BUDGET_TABLE the budget is shared by the containers of every
+        # function, without it each container spends the whole budget on its own
+        self.rate_limiter = tenant_rate_limiter(organization_id, rate_limit_requests)
+        self.prefix = tenant_prefix(organization_id, default_organization_id)
+        self.default_organization_id = default_organization_id
+
+    def callback_url(self, callback_url):
+        return tenant_callback_url(callback_url, self.organization_id, self.default_organization_id)
+
+
+class TenantRegistry(object):
+    """
+    Tenants of the deployment: the Organization of TRELLO_ORGANIZATION_ID with the clients of the container,
+    and the Organizations listed in the SSM tenant config, each with a ClientRegistry created on first use
+    """
+
+    def __init__(self, default_clients, powerup_name, organization_id=TRELLO_ORGANIZATION_ID, parameter_key=TENANTS_SSM_PARAMETER_KEY, ttl_seconds=TENANTS_TTL_SECONDS, rollup_card_id=ROLLUP_CARD_ID):
+        self.default_clients = default_clients
+        self.powerup_name = powerup_name
+        self.organization_id = organization_id
+        self.parameter_key = parameter_key
+        self.ttl_seconds = ttl_seconds
+        self.default_tenant = Tenant(organization_id, default_clients, powerup_name, default_organization_id=organization_id, rollup_card_id=rollup_card_id)
+        self.tenants = OrderedDict()
+        self.configs = {}
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def load_config(self):
+        """
+        Reads the tenant config from SSM. Eg: [{"organization_id": "5ea...", "api_key_parameter": "/Serverless/Trello/5ea.../ApiKey",
+        "token_parameter": "/Serverless/Trello/5ea.../Token", "powerup_name": "Sprint Burndown", "rate_limit_requests": 100, "rollup_card_id": "5eb..."}]
+        :return: returns list of tenant config dicts
+        """
+        if not self.parameter_key:
+            return []
+        parameters = self.default_clients.ssm().get_parameters(Names=[self.parameter_key], WithDecryption=True)['Parameters']
+        if not parameters:
+            print(f'Tenant config {self.parameter_key} missing in Parameter Store')
+            return []
+        return json.loads(parameters[0]['Value'])
+
+    def refresh(self):
+        """
+        Checks the tenant config at most every ttl_seconds. Tenants whose config did not change keep their clients and budget
+        :return: returns nothing
+        """
+        with self.lock:
+            if self.checked_at is not None and time.time() - self.checked_at < self.ttl_seconds:
+                return
+            tenants = OrderedDict()
+            configs = {}
+            for config in self.load_config():
+                organization_id = config['organization_id']
+                if organization_id == self.organization_id:
+                    print(f'Tenant {organization_id} is the Organization of the deployment, its config entry is ignored')
+                    continue
+                if self.configs.get(organization_id) == config:
+                    tenants[organization_id] = self.tenants[organization_id]
+                else:
+                    tenants[organization_id] = Tenant(
+                        organization_id,
+                        ClientRegistry(config['api_key_parameter'], config['token_parameter'], aws_clients=self.default_clients.aws_clients),
+                        config.get('powerup_name') or self.powerup_name,
+                        int(config.get('rate_limit_requests') or TRELLO_RATE_LIMIT_REQUESTS),
+                        self.organization_id,
+                        config.get('rollup_card_id')
+                    )
+                configs[organization_id] = config
+            self.tenants = tenants
+            self.configs = configs
+            self.checked_at = time.time()
+
+    def all(self):
+        """
+        Lists the tenants, the Organization of the deployment first
+        :return: returns list of Tenant
+        """
+        self.refresh()
+        return ([self.default_tenant] if self.organization_id else []) + list(self.tenants.values())
+
+    def get(self, organization_id):
+        """
+        Gets the tenant of an Organization
+        :param organization_id: Trello Organization ID, None or empty for the Organization of the deployment
+        :return: returns Tenant
+        """
+        if not organization_id or organization_id == self.organization_id:
+            return self.default_tenant
+        self.refresh()
+        if organization_id not in self.tenants:
+            raise UnknownTenant(f'Trello Organization {organization_id} is not in the tenant config')
+        return self.tenants[organization_id]
+
+    def report(self):
+        """
+        Gets the client instrumentation of every tenant in use
+        :return: returns dict of ClientRegistry reports by Organization ID
+        """
+        return {tenant.organization_id: tenant.clients.report() for tenant in [self.default_tenant] + list(self.tenants.values())}
+
+
+# Fair order of the Boards of many tenants
+def interleave(queues):
+    """
+    Takes one item of every queue in turn, so a large tenant does not hold back the others
+    :param queues: list of lists, eg: the Boards of every tenant in processing order
+    :return: returns list of items. Eg: [a1, b1, c1, a2, c2, a3]
+    """
+    items = []
+    for index in range(max([len(queue) for queue in queues] or [0])):
+        items.extend(queue[index] for queue in queues if index < len(queue))
+    return items
+
+
+# Split tenant Board entries by tenant
+def group_by_tenant(entries):
+    """
+    Groups [organization_id, board_id] entries, eg: a batch of the sweep cursor
+    :param entries: list of [organization_id, board_id] pairs
+    :return: returns OrderedDict of Board ID lists by Organization ID, in order of first appearance
+    """
+    groups = OrderedDict()
+    for organization_id, board_id in entries:
+        groups.setdefault(organization_id, []).append(board_id)
+    return groups
@@ -0,0 +1,85 @@
+import pytest
+from botocore.exceptions import ClientError
+from board_registry import download_registry, upload_registry
+from local_backends import FakeS3
+from sprint_history import SprintHistory, history_key, download_history, upload_history
+
+BUCKET = 'deployment-bucket'
+SPRINT_DATES = ['2020-06-01', '2020-06-02', '2020-06-03']
+
+
+def recorded(history, board_id, sprint_date):
+    sprint, days = history.current_sprint(board_id)
+    day = days[SPRINT_DATES.index(sprint_date)]
+    return [day['stories_defects_remaining'], day['tasks_remaining']]
+
+
+def record(history, board_id, sprint_date, remaining, timestamp):
+    if history.current_sprint(board_id)[0] is None:
+        history.start_sprint(board_id, SPRINT_DATES, 10)
+    history.record(board_id, sprint_date, remaining, 0, remaining, 3, timestamp)
+
+
+def test_concurrent_history_writers_keep_every_day(tmp_path):
+    s3 = FakeS3()
+    upload_history(s3, BUCKET, SprintHistory(), str(tmp_path) + '/', history_key())
+
+    # Both invocations download the same Sprint History before either writes it
+    first = download_history(s3, BUCKET, str(tmp_path) + '/')
+    second = download_history(s3, BUCKET, str(tmp_path) + '/')
+    record(first, 'board-a', '2020-06-01', 5, 1000)
+    record(second, 'board-b', '2020-06-01', 7, 1001)
+    record(second, 'board-a', '2020-06-01', 4, 1002)
+
+    upload_history(s3, BUCKET, first, str(tmp_path) + '/', history_key())
+    upload_history(s3, BUCKET, second, str(tmp_path) + '/', history_key())
+
+    stored = download_history(s3, BUCKET, str(tmp_path) + '/')
+    assert s3.calls['put_object_conflicts'] == 1
+    assert recorded(stored, 'board-a', '2020-06-01') == [4, 4]
+    assert recorded(stored, 'board-b', '2020-06-01') == [7, 7]
+    # The writer that merged holds what it stored
+    assert second.e_tag == stored.e_tag
+
+
+def test_first_history_write_does_not_overwrite_a_stored_history(tmp_path):
+    s3 = FakeS3()
+    first = SprintHistory()
+    record(first, 'board-a', '2020-06-01', 5, 1000)
+    upload_history(s3, BUCKET, first, str(tmp_path) + '/', history_key())
+
+    # Downloaded while nothing was stored
+    second = SprintHistory()
+    record(second, 'board-b', '2020-06-02', 3, 1001)
+    upload_history(s3, BUCKET, second, str(tmp_path) + '/', history_key())
+
+    assert sorted(download_history(s3, BUCKET, str(tmp_path) + '/').board_ids()) == ['board-a', 'board-b']
+
+
+def test_history_write_conflicts_are_raised_once_out_of_attempts(tmp_path):
+    s3 = FakeS3()
+    upload_history(s3, BUCKET, SprintHistory(), str(tmp_path) + '/', history_key())
+    with pytest.raises(ClientError):
+        upload_history(s3, BUCKET, SprintHistory(), str(tmp_path) + '/', history_key(), attempts=1)
+
+
+def test_concurrent_registry_writers_keep_every_change():
+    s3 = FakeS3()
+    registry = download_registry(s3, BUCKET)
+    registry.enable('board-a', '{"a": 1}')
+    registry.enable('board-b', '{"b": 1}')
+    upload_registry(s3, BUCKET, registry)
+
+    first = download_registry(s3, BUCKET)
+    second = download_registry(s3, BUCKET)
+    first.enable('board-c', '{"c": 1}')
+    second.disable('board-a')
+    second.enable('board-b', '{"b": 2}')
+
+    upload_registry(s3, BUCKET, first)
+    upload_registry(s3, BUCKET, second)
+
+    stored = download_registry(s3, BUCKET)
+    assert sorted(stored.boards) == ['board-b', 'board-c']
+    assert stored.boards['board-b']['powerup_data'] == '{"b": 2}'
+    assert stored.e_tag == second.e_tag
@@ -0,0 +1,90 @@
+import json
+import random
+import tracemalloc
+import pytest
+import burndown_engine
+from chart_publisher import ATTACHMENT_MODE
+from local_backends import FakeTrelloClient, FakeS3
+from memory_instrumentation import MemoryProfiler
+
+MONITOR_LISTS = ['todo', 'doing']
+DONE_LIST = 'done'
+BOARD_COUNT = 3
+
+# Bounds of a small batch, far above what it uses so that only a leak or a runaway stage fails them
+MAX_STAGE_TRACED_PEAK_MB = 64
+MAX_PEAK_RSS_MB = 1024
+
+
+def powerup_data():
+    return json.dumps({
+        'sprint_start_day': burndown_engine.current_day,
+        'total_sprint_days': '10',
+        'selected_list': MONITOR_LISTS,
+        'selected_done_list': DONE_LIST,
+        'team_member_list': ['Alice', 'Bob'],
+        'team_members_days_ooo': '1-0,2-0,3-0,4-0,5-0,6-0,7-0,8-0,9-0,10-0',
+        'selected_card_for_attachment': 'card'
+    })
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    memory = MemoryProfiler(enabled=True)
+    monkeypatch.setattr(burndown_engine, 'memory', memory)
+    monkeypatch.setattr(burndown_engine, 'DEPLOYMENT_BUCKET', 'deployment-bucket')
+    memory.start()
+    yield memory
+    tracemalloc.stop()
+
+
+@pytest.fixture
+def client():
+    random_generator = random.Random(0)
+    client = FakeTrelloClient()
+    for board_index in range(BOARD_COUNT):
+        board_id = '%024x' % board_index
+        client.add_board(board_id)
+        for card_index in range(50):
+            client.add_card(board_id, f'{board_id}-{card_index}', random_generator.choice(MONITOR_LISTS + [DONE_LIST]), f'{random_generator.choice(["U", "D", "T"])} Card {card_index}')
+    return client
+
+
+def test_process_boards_records_memory_stages_within_bounds(memory, client):
+    board_ids = list(client.boards)
+    report = burndown_engine.process_boards(board_ids, {
+        'client': client,
+        's3': FakeS3(),
+        'powerup_data': {board_id: powerup_data() for board_id in board_ids},
+        'render': 'inline',
+        'publish': ATTACHMENT_MODE,
+        'throttle': False,
+        'raise_errors': True
+    })
+
+    assert sorted(report['rendered']) == sorted(board_ids)
+    memory_report = memory.report()
+
+    # Boards are counted on threads and measured as one stage, renders run on the main thread once per Board
+    stages = [(stage['stage'], stage['board_id']) for stage in memory_report['stages']]
+    assert stages.count(('counts', None)) == 1
+    assert stages.count(('download_history', None)) == 1
+    assert stages.count(('upload_history', None)) == 1
+    assert sorted(board_id for stage, board_id in stages if stage == 'render') == sorted(board_ids)
+    assert [board['board_id'] for board in memory_report['boards']] == [board_id for stage, board_id in stages if stage == 'render']
+
+    for stage in memory_report['stages']:
+        assert 0 <= stage['traced_peak_mb'] <= MAX_STAGE_TRACED_PEAK_MB, stage
+    assert memory_report['peak_rss_mb'] <= MAX_PEAK_RSS_MB
+    assert memory_report['top_allocation_sites']
+
+
+def test_stages_are_not_recorded_on_worker_threads(memory):
+    def record(item):
+        with memory.stage('worker', item), memory.board(item):
+            return item
+
+    results = burndown_engine.run_concurrently(record, ['a', 'b'], 2)
+    assert [result for item, result, error in results] == ['a', 'b']
+    assert memory.stages == []
+    assert memory.boards == []
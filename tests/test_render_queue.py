@@ -0,0 +1,96 @@
+import pytest
+import burndown_engine
+from render_queue import RenderQueue, LocalRenderQueue, RENDER_QUEUE_MAX_DELAY_SECONDS, render_job
+from local_backends import FakeTrelloClient, FakeS3
+
+
+class Clock(object):
+
+    def __init__(self, now=1.6e9):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def job(board_id, powerup_data='{}'):
+    return render_job(board_id, powerup_data, '2020-06-01')
+
+
+def test_render_queue_is_abstract():
+    with pytest.raises(TypeError):
+        RenderQueue()
+
+
+def test_pending_jobs_are_deduplicated_per_board():
+    queue = LocalRenderQueue()
+    queue.enqueue(job('board-a', 'first'))
+    queue.enqueue(job('board-b'))
+    queue.enqueue(job('board-a', 'second'))
+
+    messages = queue.dequeue_batch()
+    assert len(queue) == 0
+    assert [message['job']['board_id'] for message in messages] == ['board-a', 'board-b']
+    # The newer job replaced the queued one in place
+    assert messages[0]['job']['powerup_data'] == 'second'
+
+
+def test_dequeue_batch_receives_at_most_max_messages():
+    queue = LocalRenderQueue()
+    for board_index in range(5):
+        queue.enqueue(job(f'board-{board_index}'))
+
+    assert len(queue.dequeue_batch(max_messages=3)) == 3
+    assert len(queue.dequeue_batch(max_messages=3)) == 2
+
+
+def test_delayed_jobs_are_received_once_their_delay_is_over():
+    clock = Clock()
+    queue = LocalRenderQueue(clock=clock)
+    queue.enqueue(job('board-a'), delay_seconds=60)
+
+    assert queue.dequeue_batch() == []
+    clock.now += 59
+    assert queue.dequeue_batch() == []
+    clock.now += 1
+    assert [message['job']['board_id'] for message in queue.dequeue_batch()] == ['board-a']
+
+
+def test_delays_are_capped_at_the_sqs_maximum():
+    clock = Clock()
+    queue = LocalRenderQueue(clock=clock)
+    queue.enqueue(job('board-a'), delay_seconds=RENDER_QUEUE_MAX_DELAY_SECONDS * 2)
+
+    clock.now += RENDER_QUEUE_MAX_DELAY_SECONDS
+    assert len(queue.dequeue_batch()) == 1
+
+
+def test_failed_jobs_are_retried_then_dead_lettered():
+    queue = LocalRenderQueue(max_receive_count=3)
+    queue.enqueue(job('board-a'))
+
+    for receive_count in range(1, 4):
+        messages = queue.dequeue_batch()
+        assert [message['receive_count'] for message in messages] == [receive_count]
+        queue.fail(messages[0])
+
+    assert queue.dequeue_batch() == []
+    assert [message['job']['board_id'] for message in queue.dead_letters] == ['board-a']
+    assert queue.in_flight == {}
+
+
+def test_acked_jobs_start_counting_receives_again():
+    queue = LocalRenderQueue(max_receive_count=2)
+    queue.enqueue(job('board-a'))
+    queue.fail(queue.dequeue_batch()[0])
+    queue.ack(queue.dequeue_batch()[0])
+
+    queue.enqueue(job('board-a'))
+    assert queue.dequeue_batch()[0]['receive_count'] == 1
+    assert queue.dead_letters == []
+
+
+def test_queue_render_requires_a_render_queue(monkeypatch):
+    monkeypatch.setattr(burndown_engine, 'RENDER_QUEUE_URL', None)
+    with pytest.raises(ValueError):
+        burndown_engine.process_boards(['board-a'], {'render': 'queue', 'client': FakeTrelloClient(), 's3': FakeS3()})
@@ -0,0 +1,66 @@
+from trello_budget import LocalBudgetStore, SharedRateLimiter, tenant_rate_limiter
+from webhook_reconciler import RateLimiter
+
+
+class Clock(object):
+
+    def __init__(self, now=1.6e9):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def limiter(store, clock, requests=10):
+    return SharedRateLimiter('organization', store, requests=requests, seconds=10, clock=clock, sleep=clock.sleep)
+
+
+def test_containers_share_one_budget():
+    clock = Clock()
+    store = LocalBudgetStore()
+    containers = [limiter(store, clock), limiter(store, clock)]
+
+    for index in range(10):
+        containers[index % 2].acquire()
+    assert clock.now == 1.6e9
+
+    # The budget of the window is spent, the next request waits until its requests left the window
+    containers[0].acquire()
+    assert clock.now >= 1.6e9 + 10
+    assert containers[0].report()['acquired'] == 6
+
+
+def test_no_window_holds_more_than_the_budget():
+    clock = Clock(1.6e9 + 0.5)
+    store = LocalBudgetStore()
+    containers = [limiter(store, clock, requests=100) for _ in range(3)]
+
+    sent = []
+    for index in range(1000):
+        containers[index % 3].acquire()
+        sent.append(clock.now)
+        clock.now += 0.01
+
+    busiest = max(sum(1 for other in sent if start <= other < start + 10) for start in sent)
+    assert busiest <= 100
+    # The sustained rate stays close to the budget
+    assert sent[-1] - sent[0] < 120
+
+
+def test_tenants_share_nothing():
+    clock = Clock()
+    store = LocalBudgetStore()
+    first = SharedRateLimiter('first', store, requests=1, seconds=10, clock=clock, sleep=clock.sleep)
+    second = SharedRateLimiter('second', store, requests=1, seconds=10, clock=clock, sleep=clock.sleep)
+
+    first.acquire()
+    second.acquire()
+    assert clock.now == 1.6e9
+
+
+def test_budget_without_store_is_kept_per_container():
+    assert isinstance(tenant_rate_limiter('organization', 10), RateLimiter)
+    assert isinstance(tenant_rate_limiter('organization', 10, store=LocalBudgetStore()), SharedRateLimiter)
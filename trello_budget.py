@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import time
+import threading
+import boto3
+from botocore.exceptions import ClientError
+from webhook_reconciler import TRELLO_RATE_LIMIT_REQUESTS, TRELLO_RATE_LIMIT_SECONDS, RateLimiter
+
+
+# Get the Trello Budget Settings
+try:
+    TRELLO_BUDGET_TABLE = os.getenv('TRELLO_BUDGET_TABLE')
+except Exception:
+    print('TRELLO_BUDGET_TABLE value missing in Lambda Environment Variable')
+
+# Buckets a rate limit window is counted in. A bucket is read once by every busy container, more buckets spend the
+# budget more evenly for more reads
+TRELLO_BUDGET_BUCKETS = int(os.getenv('TRELLO_BUDGET_BUCKETS', '10'))
+
+
+class LocalBudgetStore(object):
+    """
+    In-memory stand-in for the durable budget store, for local runs in one process
+    """
+
+    def __init__(self):
+        self.requests = {}
+        self.lock = threading.Lock()
+
+    def add(self, key, bucket, max_requests, expires_at):
+        """
+        Counts a request in a bucket unless the bucket already holds max_requests
+        :param key: Budget key, the Trello Organization ID of the tenant
+        :param bucket: Number of the bucket
+        :param max_requests: Requests the bucket may hold
+        :param expires_at: Unix time the count can be dropped
+        :return: returns True when the request was counted
+        """
+        with self.lock:
+            if self.requests.get((key, bucket), 0) >= max_requests:
+                return False
+            self.requests[(key, bucket)] = self.requests.get((key, bucket), 0) + 1
+            return True
+
+    def count(self, key, bucket):
+        """
+        Gets the requests counted in a bucket
+        :param key: Budget key, the Trello Organization ID of the tenant
+        :param bucket: Number of the bucket
+        :return: returns request count
+        """
+        with self.lock:
+            return self.requests.get((key, bucket), 0)
+
+
+class DynamoDbBudgetStore(object):
+    """
+    Durable budget store, a conditional counter per tenant and bucket. The low-level client is thread safe, the
+    requests of a batch count concurrently
+    """
+
+    def __init__(self, table_name=TRELLO_BUDGET_TABLE, dynamodb=None):
+        self.table_name = table_name
+        self.dynamodb = dynamodb or boto3.client('dynamodb')
+
+    def add(self, key, bucket, max_requests, expires_at):
+        try:
+            self.dynamodb.update_item(
+                TableName=self.table_name,
+                Key={'budget_key': {'S': f'{key}#{bucket}'}},
+                UpdateExpression='ADD requests :one SET expires_at = :expires_at',
+                ConditionExpression='attribute_not_exists(requests) OR requests < :max_requests',
+                ExpressionAttributeValues={':one': {'N': '1'}, ':max_requests': {'N': str(max_requests)}, ':expires_at': {'N': str(int(expires_at))}}
+            )
+            return True
+        except ClientError as error:
+            if error.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+    def count(self, key, bucket):
+        item = self.dynamodb.get_item(TableName=self.table_name, Key={'budget_key': {'S': f'{key}#{bucket}'}}, ConsistentRead=True).get('Item', {})
+        return int(item.get('requests', {}).get('N', '0'))
+
+
+class SharedRateLimiter(object):
+    """
+    Rate limiter of a tenant shared by every container through a budget store, blocks until a request fits.
+    Requests are counted in buckets, a fraction of the rate limit window, and a bucket only takes what the buckets of
+    the window before it left of the budget, so no window of the rate limit holds more than the budget
+    """
+
+    def __init__(self, key, store, requests=TRELLO_RATE_LIMIT_REQUESTS, seconds=TRELLO_RATE_LIMIT_SECONDS, buckets=TRELLO_BUDGET_BUCKETS, clock=time.time, sleep=time.sleep):
+        self.key = key
+        self.store = store
+        self.requests = requests
+        self.seconds = seconds
+        self.buckets = buckets
+        self.bucket_seconds = seconds / buckets
+        self.clock = clock
+        self.sleep = sleep
+        # Bucket -> requests of the closed buckets of the window, each is read once
+        self.closed = {}
+        self.lock = threading.Lock()
+        self.stats = {'acquired': 0, 'waits': 0}
+
+    def window_requests(self, bucket):
+        """
+        Gets the requests counted in the buckets of the window before a bucket
+        :param bucket: Number of the current bucket
+        :return: returns request count
+        """
+        with self.lock:
+            for closed in list(self.closed):
+                if closed < bucket - self.buckets:
+                    del self.closed[closed]
+            for closed in range(bucket - self.buckets, bucket):
+                if closed not in self.closed:
+                    self.closed[closed] = self.store.count(self.key, closed)
+            return sum(self.closed.values())
+
+    def acquire(self):
+        while True:
+            now = self.clock()
+            bucket = int(now // self.bucket_seconds)
+            max_requests = self.requests - self.window_requests(bucket)
+            if max_requests > 0 and self.store.add(self.key, bucket, max_requests, (bucket + self.buckets + 1) * self.bucket_seconds):
+                # A request counted as the bucket closed is dropped, the next bucket may already have read the count
+                if int(self.clock() // self.bucket_seconds) == bucket:
+                    with self.lock:
+                        self.stats['acquired'] += 1
+                    return
+                continue
+            with self.lock:
+                self.stats['waits'] += 1
+            self.sleep(max(0.0, (bucket + 1) * self.bucket_seconds - now))
+
+    def report(self):
+        with self.lock:
+            return dict(self.stats)
+
+
+# Build the Trello rate limiter of a tenant
+def tenant_rate_limiter(organization_id, requests, store=None):
+    """
+    Creates the rate limiter of a tenant. With TRELLO_BUDGET_TABLE the budget is shared by every container, without it
+    every container has the whole budget of the tenant to itself
+    :param organization_id: Trello Organization ID of the tenant
+    :param requests: Requests of the tenant per TRELLO_RATE_LIMIT_SECONDS
+    :param store: Budget store, defaults to the DynamoDB table of TRELLO_BUDGET_TABLE
+    :return: returns SharedRateLimiter, or RateLimiter of this container
+    """
+    if store is None and TRELLO_BUDGET_TABLE:
+        store = DynamoDbBudgetStore(TRELLO_BUDGET_TABLE)
+    if store is None:
+        print(f'TRELLO_BUDGET_TABLE value missing in Lambda Environment Variable, the Trello budget of {organization_id} is kept per container')
+        return RateLimiter(requests)
+    return SharedRateLimiter(organization_id or 'default', store, requests)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import time
+import boto3
+from collections import OrderedDict
+from botocore.exceptions import ClientError
+
+
+# Get the Webhook Dedup Settings
+try:
+    WEBHOOK_DEDUP_TABLE = os.getenv('WEBHOOK_DEDUP_TABLE')
+except Exception:
+    print('WEBHOOK_DEDUP_TABLE value missing in Lambda Environment Variable')
+
+# Seconds a processed Action is remembered
+WEBHOOK_DEDUP_TTL_SECONDS = int(os.getenv('WEBHOOK_DEDUP_TTL_SECONDS', '86400'))
+
+# Seconds an Action being processed stays claimed, a little over the function timeout. An invocation that times out
+# or runs out of memory never completes its claim, the retry of the Action is processed once the claim expires
+WEBHOOK_DEDUP_IN_PROGRESS_SECONDS = int(os.getenv('WEBHOOK_DEDUP_IN_PROGRESS_SECONDS', '150'))
+WEBHOOK_DEDUP_LRU_SIZE = int(os.getenv('WEBHOOK_DEDUP_LRU_SIZE', '4096'))
+
+
+class LruCache(object):
+    """
+    Bounded set of recently seen keys, the least recently used key is evicted first
+    """
+
+    def __init__(self, max_size=WEBHOOK_DEDUP_LRU_SIZE):
+        self.max_size = max_size
+        self.keys = OrderedDict()
+
+    def __contains__(self, key):
+        if key in self.keys:
+            self.keys.move_to_end(key)
+            return True
+        return False
+
+    def add(self, key):
+        self.keys[key] = True
+        self.keys.move_to_end(key)
+        while len(self.keys) > self.max_size:
+            self.keys.popitem(last=False)
+
+    def discard(self, key):
+        self.keys.pop(key, None)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class LocalDedupStore(object):
+    """
+    In-memory stand-in for the durable dedup store
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.expires_at = {}
+
+    def claim(self, key, ttl_seconds):
+        """
+        Records a key unless it is already recorded and not expired
+        :param key: Action ID
+        :param ttl_seconds: Seconds the key is kept
+        :return: returns True when the key was not seen before
+        """
+        now = self.clock()
+        if self.expires_at.get(key, 0) > now:
+            return False
+        self.expires_at[key] = now + ttl_seconds
+        return True
+
+    def complete(self, key, ttl_seconds):
+        """
+        Keeps a claimed key for the TTL of a processed Action
+        :param key: Action ID
+        :param ttl_seconds: Seconds the key is kept
+        :return: returns nothing
+        """
+        self.expires_at[key] = self.clock() + ttl_seconds
+
+    def release(self, key):
+        self.expires_at.pop(key, None)
+
+
+class DynamoDbDedupStore(object):
+    """
+    Durable dedup store, a conditional put claims a key and DynamoDB TTL expires it
+    """
+
+    def __init__(self, table_name=WEBHOOK_DEDUP_TABLE, dynamodb=None):
+        self.table = (dynamodb or boto3.resource('dynamodb')).Table(table_name)
+
+    def claim(self, key, ttl_seconds):
+        now = int(time.time())
+        try:
+            self.table.put_item(
+                Item={'action_id': key, 'expires_at': now + ttl_seconds},
+                ConditionExpression='attribute_not_exists(action_id) OR expires_at < :now',
+                ExpressionAttributeValues={':now': now}
+            )
+            return True
+        except ClientError as error:
+            if error.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+    def complete(self, key, ttl_seconds):
+        self.table.update_item(
+            Key={'action_id': key},
+            UpdateExpression='SET expires_at = :expires_at',
+            ExpressionAttributeValues={':expires_at': int(time.time()) + ttl_seconds}
+        )
+
+    def release(self, key):
+        self.table.delete_item(Key={'action_id': key})
+
+
+class WebhookDeduplicator(object):
+    """
+    Detects repeated Webhook Actions. An Action is claimed for in_progress_seconds while it is processed, and kept for
+    ttl_seconds once it completes. An in-container LRU answers repeats of completed Actions without calling the durable store
+    """
+
+    def __init__(self, store, lru_size=WEBHOOK_DEDUP_LRU_SIZE, ttl_seconds=WEBHOOK_DEDUP_TTL_SECONDS, in_progress_seconds=WEBHOOK_DEDUP_IN_PROGRESS_SECONDS):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.in_progress_seconds = in_progress_seconds
+        self.lru = LruCache(lru_size)
+        self.stats = {'checked': 0, 'lru_hits': 0, 'store_hits': 0, 'completed': 0}
+
+    def is_duplicate(self, action_id):
+        """
+        Checks and claims an Action ID
+        :param action_id: Trello Action ID of the Webhook Payload
+        :return: returns True when the Action was already processed or is being processed
+        """
+        self.stats['checked'] += 1
+        if action_id in self.lru:
+            self.stats['lru_hits'] += 1
+            return True
+
+        # Only completed Actions enter the LRU, a claim in progress elsewhere may still expire and be retried
+        if not self.store.claim(action_id, self.in_progress_seconds):
+            self.stats['store_hits'] += 1
+            return True
+        return False
+
+    def complete(self, action_id):
+        """
+        Marks a claimed Action as processed, its repeats are dropped for ttl_seconds
+        :param action_id: Trello Action ID of the Webhook Payload
+        :return: returns nothing
+        """
+        self.store.complete(action_id, self.ttl_seconds)
+        self.lru.add(action_id)
+        self.stats['completed'] += 1
+
+    def release(self, action_id):
+        """
+        Forgets an Action ID so that a retry of a failed Action is processed
+        :param action_id: Trello Action ID of the Webhook Payload
+        :return: returns nothing
+        """
+        self.lru.discard(action_id)
+        try:
+            self.store.release(action_id)
+        except Exception as error:
+            print(error)
+            pass
+
+    def hit_rate(self):
+        """
+        Gets the share of checked Actions that were duplicates
+        :return: returns hit rate between 0 and 1
+        """
+        if not self.stats['checked']:
+            return 0.0
+        return (self.stats['lru_hits'] + self.stats['store_hits']) / self.stats['checked']
+
+    def report(self):
+        return dict(self.stats, hit_rate=round(self.hit_rate(), 4), lru_size=len(self.lru))
+
+
+# Build the Webhook Deduplicator for this container
+def webhook_deduplicator():
+    """
+    Creates the Webhook Deduplicator, backed by DynamoDB when WEBHOOK_DEDUP_TABLE is set
+    :return: returns WebhookDeduplicator
+    """
+    if WEBHOOK_DEDUP_TABLE:
+        return WebhookDeduplicator(DynamoDbDedupStore(WEBHOOK_DEDUP_TABLE))
+    return WebhookDeduplicator(LocalDedupStore())
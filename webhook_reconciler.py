@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+import time
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+
+# Trello allows 100 requests per 10 seconds per token
+TRELLO_RATE_LIMIT_REQUESTS = int(os.getenv('TRELLO_RATE_LIMIT_REQUESTS', '100'))
+TRELLO_RATE_LIMIT_SECONDS = float(os.getenv('TRELLO_RATE_LIMIT_SECONDS', '10'))
+
+WEBHOOK_RECONCILER_MAX_WORKERS = int(os.getenv('WEBHOOK_RECONCILER_MAX_WORKERS', '10'))
+
+# Stale webhooks are only reported unless deleting them is turned on
+WEBHOOK_DELETE_STALE = os.getenv('WEBHOOK_DELETE_STALE', 'False').lower() == 'true'
+
+# Old callback URLs of this service on other API hosts, comma separated, whose webhooks are stale
+STALE_CALLBACK_URLS = [url.strip() for url in os.getenv('STALE_CALLBACK_URLS', '').split(',') if url.strip()]
+
+# Seconds the webhook index is reused by warm invocations before listing webhooks again
+WEBHOOK_INDEX_TTL_SECONDS = float(os.getenv('WEBHOOK_INDEX_TTL_SECONDS', '900'))
+
+
+class RateLimiter(object):
+    """
+    Thread safe sliding window limiter, blocks until a request fits in the window
+    """
+
+    def __init__(self, requests=TRELLO_RATE_LIMIT_REQUESTS, seconds=TRELLO_RATE_LIMIT_SECONDS, clock=time.monotonic, sleep=time.sleep):
+        self.requests = requests
+        self.seconds = seconds
+        self.clock = clock
+        self.sleep = sleep
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.sent = [sent_at for sent_at in self.sent if now - sent_at < self.seconds]
+                if len(self.sent) < self.requests:
+                    self.sent.append(now)
+                    return
+                wait = self.seconds - (now - self.sent[0])
+            self.sleep(wait)
+
+
+class WebhookIndex(object):
+    """
+    Set index of existing webhooks keyed by (callback_url, id_model)
+    """
+
+    def __init__(self, webhooks):
+        self.webhooks = defaultdict(list)
+        for webhook in webhooks:
+            self.webhooks[(webhook.callback_url, webhook.id_model)].append(webhook)
+        self.loaded_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def has_hook(self, callback_url, id_model):
+        return bool(self.webhooks.get((callback_url, id_model)))
+
+    def add(self, webhook):
+        with self.lock:
+            self.webhooks[(webhook.callback_url, webhook.id_model)].append(webhook)
+
+    def remove(self, webhook):
+        key = (webhook.callback_url, webhook.id_model)
+        with self.lock:
+            self.webhooks[key] = [existing for existing in self.webhooks.get(key, []) if existing.id != webhook.id]
+            if not self.webhooks[key]:
+                del self.webhooks[key]
+
+    def all(self):
+        return [webhook for webhooks in self.webhooks.values() for webhook in webhooks]
+
+
+# Webhook indexes by Trello Token reused across warm invocations of the container, tenants have their own tokens
+_webhook_indexes = {}
+
+
+# Get the cached Webhook Index
+def get_webhook_index(client, token, refresh=False):
+    """
+    Gets the Webhook Index of a token, listing webhooks only when the cached one is missing or expired
+    :param client: Trello client Object
+    :param token: Trello Token the webhooks belong to
+    :param refresh: Always list the webhooks again
+    :return: returns WebhookIndex
+    """
+    webhook_index = _webhook_indexes.get(token)
+    if refresh or webhook_index is None or time.monotonic() - webhook_index.loaded_at > WEBHOOK_INDEX_TTL_SECONDS:
+        webhook_index = _webhook_indexes[token] = WebhookIndex(client.list_hooks(token))
+    return webhook_index
+
+
+# Check if a webhook points at an old stage of this service
+def is_stale_callback(webhook_callback_url, callback_url, stale_callback_urls=STALE_CALLBACK_URLS):
+    """
+    Checks if a webhook callback is this service under an old stage of its own API host, or one of the old callback
+    URLs. Other hosts may be other deployments sharing the token, eg: dev and prod, or other services
+    :param webhook_callback_url: Callback URL of the existing webhook
+    :param callback_url: Current CALLBACK_URL
+    :param stale_callback_urls: Old callback URLs without the tenant query parameter
+    :return: returns True when only the stage differs, eg: .../dev/trello for .../prod/trello, or the URL is an old one
+    """
+    if webhook_callback_url == callback_url:
+        return False
+    webhook_url = urlparse(webhook_callback_url)
+    url = urlparse(callback_url)
+    # The tenant query parameter tells apart the webhooks of Organizations sharing a token
+    if webhook_url.query != url.query:
+        return False
+    if webhook_url._replace(query='').geturl() in stale_callback_urls:
+        return True
+    if webhook_url.netloc != url.netloc:
+        return False
+    webhook_path = webhook_url.path.strip('/').split('/')
+    path = url.path.strip('/').split('/')
+    return len(webhook_path) == len(path) and webhook_path[1:] == path[1:]
+
+
+# Compute the difference between the boards and their webhooks
+def plan_webhooks(index, boards, callback_url, stale_callback_urls=STALE_CALLBACK_URLS, delete_stale=WEBHOOK_DELETE_STALE):
+    """
+    Computes which webhooks to create and delete for the boards
+    :param index: WebhookIndex
+    :param boards: list of (board_id, board_name) tuples
+    :param callback_url: Current CALLBACK_URL
+    :param stale_callback_urls: Old callback URLs whose webhooks are stale
+    :param delete_stale: Delete stale webhooks, otherwise they are only reported
+    :return: returns dict of 'create' boards, 'stale', 'delete_stale' and 'delete_duplicate' webhooks and 'unchanged' count
+    """
+    plan = {'create': [], 'stale': [], 'delete_stale': [], 'delete_duplicate': [], 'unchanged': 0}
+
+    for board_id, board_name in boards:
+        if index.has_hook(callback_url, board_id):
+            plan['unchanged'] += 1
+        else:
+            plan['create'].append((board_id, board_name))
+
+    for (webhook_callback_url, id_model), webhooks in list(index.webhooks.items()):
+        if webhook_callback_url == callback_url:
+            plan['delete_duplicate'].extend(webhooks[1:])
+        elif is_stale_callback(webhook_callback_url, callback_url, stale_callback_urls):
+            plan['stale'].extend(webhooks)
+
+    if delete_stale:
+        plan['delete_stale'] = plan['stale']
+
+    return plan
+
+
+# Delete a webhook
+def delete_hook(client, webhook):
+    """
+    Deletes a webhook
+    :param client: Trello client Object
+    :param webhook: Trello WebHook Object
+    :return: returns delete response
+    """
+    return client.fetch_json(
+        f"webhooks/{webhook.id}",
+        http_method="DELETE",
+        headers={
+            "Accept": "application/json"
+        }
+    )
+
+
+# Reconcile webhooks of the boards
+def reconcile_webhooks(client, boards, callback_url, token, dry_run=False, rate_limiter=None, max_workers=WEBHOOK_RECONCILER_MAX_WORKERS, delete_stale=WEBHOOK_DELETE_STALE, stale_callback_urls=STALE_CALLBACK_URLS):
+    """
+    Creates missing webhooks and deletes duplicate ones, and stale ones when turned on, concurrently within the rate limit
+    :param client: Trello client Object
+    :param boards: list of (board_id, board_name) tuples
+    :param callback_url: Current CALLBACK_URL
+    :param token: Trello Token the webhooks belong to
+    :param dry_run: Only report the differences
+    :param rate_limiter: RateLimiter shared by the requests
+    :param max_workers: Requests in flight at the same time
+    :param delete_stale: Delete stale webhooks, otherwise they are only reported
+    :param stale_callback_urls: Old callback URLs whose webhooks are stale
+    :return: returns diff report dict with the planned and failed changes
+    """
+    index = get_webhook_index(client, token, refresh=True)
+    plan = plan_webhooks(index, boards, callback_url, stale_callback_urls, delete_stale)
+
+    report = {
+        'boards': len(boards),
+        'unchanged': plan['unchanged'],
+        'created': [board_id for board_id, board_name in plan['create']],
+        'stale': [webhook.id for webhook in plan['stale']],
+        'deleted_stale': [webhook.id for webhook in plan['delete_stale']],
+        'deleted_duplicate': [webhook.id for webhook in plan['delete_duplicate']],
+        'failed': [],
+        'dry_run': dry_run
+    }
+    if dry_run:
+        return report
+
+    rate_limiter = rate_limiter or RateLimiter()
+
+    def create(board):
+        board_id, board_name = board
+        rate_limiter.acquire()
+        try:
+            webhook = client.create_hook(callback_url, board_id, f'{board_name} Trello Board Webhook', token)
+            if webhook:
+                index.add(webhook)
+                return None
+            return board_id
+        except Exception as error:
+            print(f' {error}: Error creating webhook for the Trello Board - {board_name}')
+            return board_id
+
+    def delete(webhook):
+        rate_limiter.acquire()
+        try:
+            delete_hook(client, webhook)
+            index.remove(webhook)
+            return None
+        except Exception as error:
+            print(f' {error}: Error deleting webhook - {webhook.id}')
+            return webhook.id
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        failed = list(executor.map(create, plan['create']))
+        failed += list(executor.map(delete, plan['delete_stale'] + plan['delete_duplicate']))
+
+    report['failed'] = [item for item in failed if item is not None]
+    return report
+
+
+# Make sure a single board has a webhook
+def ensure_board_hook(client, board_id, board_name, callback_url, token):
+    """
+    Creates the webhook of a board unless the cached Webhook Index already has it
+    :param client: Trello client Object
+    :param board_id: The ID of the Board
+    :param board_name: Name of the Board
+    :param callback_url: Current CALLBACK_URL
+    :param token: Trello Token the webhooks belong to
+    :return: returns created WebHook, None when it already existed
+    """
+    index = get_webhook_index(client, token)
+    if index.has_hook(callback_url, board_id):
+        return None
+    webhook = client.create_hook(callback_url, board_id, f'{board_name} Trello Board Webhook', token)
+    if webhook:
+        index.add(webhook)
+    return webhook